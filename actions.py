@@ -1,14 +1,36 @@
 class Action:
-    pass
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        # Actions are shared singletons, so nothing may change them after creation.
+        raise AttributeError(f"{type(self).__name__} is immutable")
 
 
 class EscapeAction(Action):
-    pass
+    __slots__ = ()
 
 
 class MovementAction(Action):
+    __slots__ = ("dx", "dy")
+
     def __init__(self, dx: int, dy: int):
         super().__init__()
 
-        self.dx = dx
-        self.dy = dy
\ No newline at end of file
+        object.__setattr__(self, "dx", dx)
+        object.__setattr__(self, "dy", dy)
+
+    def __repr__(self) -> str:
+        return f"MovementAction(dx={self.dx}, dy={self.dy})"
+
+
+# Preallocated actions, handed out by the keymap instead of building new ones per key.
+ESCAPE = EscapeAction()
+
+MOVE_UP = MovementAction(dx=0, dy=-1)
+MOVE_DOWN = MovementAction(dx=0, dy=1)
+MOVE_LEFT = MovementAction(dx=-1, dy=0)
+MOVE_RIGHT = MovementAction(dx=1, dy=0)
+MOVE_UP_LEFT = MovementAction(dx=-1, dy=-1)
+MOVE_UP_RIGHT = MovementAction(dx=1, dy=-1)
+MOVE_DOWN_LEFT = MovementAction(dx=-1, dy=1)
+MOVE_DOWN_RIGHT = MovementAction(dx=1, dy=1)
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tracemalloc
+from typing import Dict, List
+
+import numpy as np
+
+from headless import HeadlessGame
+
+# Allocation budgets for one turn of steady-state play.  Seeded headless
+# games are played under tracemalloc and every phase of a turn is measured:
+#   peak      most bytes the phase had allocated at once
+#   retained  bytes still allocated when it returned, its result included
+# The worst turn is compared with allocbudget.json.  test_allocbudget.py runs
+# the check under pytest, one test per phase, and the script exits non-zero
+# when a phase goes over:
+#
+#   python3 -m pytest test_allocbudget.py   what CI runs
+#   python3 allocbudget.py                  the same check, as a table
+#   python3 allocbudget.py --update fov     store new budgets for the named phases
+#
+# Budgets are raised one phase at a time, never all at once: --update prints
+# each change so the commit that needs it can say why that phase grew.
+#
+# Turns that change floor are skipped: building a floor is meant to allocate.
+#
+# Peaks move with the Python and numpy releases as much as with the code, so
+# allocbudget.json records both versions it was measured with; the pytest
+# check skips on any other numpy or Python x.y, and CI pins the same ones.
+
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "allocbudget.json")
+SEEDS = (1, 2, 3)
+TURNS = 300
+WARMUP = 20  # turns before measuring, so caches and interned strings settle
+SLACK = 0.10  # measurements may exceed the budget by this fraction
+SLACK_BYTES = 512  # and by this many bytes, for phases with tiny budgets
+
+STEPS = [(0, -1), (0, 1), (-1, 0), (1, 0), (0, 0)]
+
+
+def versions() -> Dict[str, str]:
+    return {"python": platform.python_version(), "numpy": np.__version__}
+
+
+def mismatch(stored: dict) -> List[str]:
+    """
+    How this interpreter differs from the one the budgets were measured on.
+    """
+    here = versions()
+    differs = []
+    if stored.get("python", "").rsplit(".", 1)[0] != here["python"].rsplit(".", 1)[0]:
+        differs.append(f"Python {stored.get('python')}, this is {here['python']}")
+    if stored.get("numpy") != here["numpy"]:
+        differs.append(f"numpy {stored.get('numpy')}, this is {here['numpy']}")
+    return differs
+
+
+def _phases(game: HeadlessGame, step) -> List[tuple]:
+    # one turn split the way take_turn + a redraw run it
+    return [
+        ("move", lambda: game.move_player(*step) if step != (0, 0) else None),
+        ("enemies", game.enemy_turns),
+        ("fov", game.recompute_fov),
+        ("compose", game.compose),
+        ("status", game.status_lines),
+        ("frame", game.frame),
+    ]
+
+
+def measure(seeds=SEEDS, turns: int = TURNS) -> Dict[str, Dict[str, int]]:
+    """
+    Play `turns` turns per seed and return the worst peak and retained bytes per phase.
+    """
+    worst: Dict[str, Dict[str, int]] = {}
+    tracemalloc.start()
+    try:
+        for seed in seeds:
+            game = HeadlessGame(seed=seed)
+            rng = random.Random(seed)
+            for turn in range(turns):
+                game.player.hp = game.player.max_hp  # keep playing, dying is not the point
+                step = rng.choice(STEPS)
+                level = game.level
+                samples = []
+                for name, phase in _phases(game, step):
+                    before = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    result = phase()
+                    current, peak = tracemalloc.get_traced_memory()
+                    samples.append((name, peak - before, current - before))
+                    del result
+                if turn < WARMUP or game.level != level or game.over is not None:
+                    continue
+                for name, peak, retained in samples:
+                    entry = worst.setdefault(name, {"peak": 0, "retained": 0})
+                    entry["peak"] = max(entry["peak"], peak)
+                    entry["retained"] = max(entry["retained"], retained)
+    finally:
+        tracemalloc.stop()
+    return worst
+
+
+def check(measured: Dict[str, Dict[str, int]], budgets: Dict[str, Dict[str, int]]) -> List[str]:
+    over = []
+    for name, limits in budgets.items():
+        for key, limit in limits.items():
+            value = measured.get(name, {}).get(key, 0)
+            if value > limit * (1 + SLACK) + SLACK_BYTES:
+                over.append(f"{name} {key}: {value} bytes, budget {limit}")
+    return over
+
+
+def report(measured: Dict[str, Dict[str, int]], budgets: Dict[str, Dict[str, int]]) -> None:
+    print(f"{'phase':<8} {'peak':>9} {'budget':>9} {'retained':>9} {'budget':>9}")
+    for name, values in measured.items():
+        limits = budgets.get(name, {})
+        print(f"{name:<8} {values['peak']:>9} {limits.get('peak', '-'):>9} "
+              f"{values['retained']:>9} {limits.get('retained', '-'):>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check per-turn allocations against stored budgets.")
+    parser.add_argument("--update", nargs="+", metavar="PHASE",
+                        help="store the measurements as the new budgets of these phases")
+    parser.add_argument("--turns", type=int, default=TURNS, help="turns per seed")
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH, encoding="utf-8") as f:
+        stored = json.load(f)
+    measured = measure(turns=args.turns)
+    if args.update:
+        unknown = set(args.update) - set(measured)
+        if unknown:
+            parser.error(f"unknown phase(s) {', '.join(sorted(unknown))}; phases are {', '.join(measured)}")
+        for name in args.update:
+            old = stored["phases"].get(name, {})
+            for key, value in measured[name].items():
+                if old.get(key) != value:
+                    print(f"{name} {key}: {old.get(key, '-')} -> {value} bytes")
+            stored["phases"][name] = measured[name]
+        stored.update(versions())
+        with open(BUDGET_PATH, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2)
+            f.write("\n")
+        print(f"budgets written to {os.path.basename(BUDGET_PATH)}")
+        sys.exit(0)
+
+    for line in mismatch(stored):
+        print(f"note: budgets were measured on {line}")
+    report(measured, stored["phases"])
+    over = check(measured, stored["phases"])
+    for line in over:
+        print(f"OVER BUDGET: {line}")
+    sys.exit(1 if over else 0)
@@ -0,0 +1,459 @@
+import os
+import select
+import sys
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+# A stand-in for the part of curses that better_game.py uses, drawn with
+# plain ANSI escapes.  Windows write into one back buffer; refresh() diffs it
+# against what is on the terminal and sends the changes as one string with a
+# single os.write: a cursor jump only where a run of changes starts, an SGR
+# only where the attribute changes.  Works without curses (Windows without
+# windows-curses, minimal containers) and can emit 24-bit colour.
+#
+# Key codes, colour numbers and color_pair() values match curses, so code
+# written against curses works unchanged with `import ansiterm as curses`.
+#
+#   python3 ansiterm.py [frames]   benchmark against curses in a pseudo-terminal
+
+KEY_DOWN = 258
+KEY_UP = 259
+KEY_LEFT = 260
+KEY_RIGHT = 261
+KEY_HOME = 262
+KEY_END = 360
+KEY_NPAGE = 338
+KEY_PPAGE = 339
+
+COLOR_BLACK, COLOR_RED, COLOR_GREEN, COLOR_YELLOW = 0, 1, 2, 3
+COLOR_BLUE, COLOR_MAGENTA, COLOR_CYAN, COLOR_WHITE = 4, 5, 6, 7
+
+A_NORMAL = 0
+A_COLOR = 0xFF00
+A_REVERSE = 0x40000
+A_BOLD = 0x200000
+
+# RGB used for the eight basic colours in truecolor mode
+RGB = {
+    COLOR_BLACK: (0, 0, 0), COLOR_RED: (205, 49, 49), COLOR_GREEN: (13, 188, 121),
+    COLOR_YELLOW: (229, 229, 16), COLOR_BLUE: (36, 114, 200), COLOR_MAGENTA: (188, 63, 188),
+    COLOR_CYAN: (17, 168, 205), COLOR_WHITE: (229, 229, 229),
+}
+
+# Unchanged cells shorter than this between two changed runs are rewritten
+# rather than jumped over; a cursor jump costs about this many bytes.
+JUMP_COST = 6
+
+_ESCAPES = {
+    b"\x1b[A": KEY_UP, b"\x1b[B": KEY_DOWN, b"\x1b[C": KEY_RIGHT, b"\x1b[D": KEY_LEFT,
+    b"\x1bOA": KEY_UP, b"\x1bOB": KEY_DOWN, b"\x1bOC": KEY_RIGHT, b"\x1bOD": KEY_LEFT,
+    b"\x1b[H": KEY_HOME, b"\x1b[F": KEY_END, b"\x1b[1~": KEY_HOME, b"\x1b[4~": KEY_END,
+    b"\x1b[5~": KEY_PPAGE, b"\x1b[6~": KEY_NPAGE,
+}
+
+Color = Union[int, Tuple[int, int, int]]
+
+
+class error(Exception):
+    pass
+
+
+_pairs: Dict[int, Tuple[Color, Color]] = {0: (-1, -1)}
+_sgr: Dict[Tuple[Optional[int], int], str] = {}
+_screen: Optional["Screen"] = None
+truecolor = os.environ.get("COLORTERM", "") in ("truecolor", "24bit")
+
+
+def has_colors() -> bool:
+    return True
+
+
+def start_color() -> None:
+    pass
+
+
+def use_default_colors() -> None:
+    pass
+
+
+def init_pair(pair: int, fg: Color, bg: Color) -> None:
+    """
+    Like curses.init_pair, but there is no limit on pairs and a colour may
+    also be an (r, g, b) tuple.
+    """
+    _pairs[pair] = (fg, bg)
+    _sgr.clear()
+
+
+def color_pair(pair: int) -> int:
+    return pair << 8
+
+
+def pair_number(attr: int) -> int:
+    return (attr & A_COLOR) >> 8
+
+
+def curs_set(visibility: int) -> None:
+    if _screen is not None:
+        _screen.out.append("\x1b[?25h" if visibility else "\x1b[?25l")
+
+
+def _color_code(color: Color, base: int) -> str:
+    # base is 30 for foreground, 40 for background
+    if isinstance(color, tuple) or (truecolor and color >= 0):
+        r, g, b = color if isinstance(color, tuple) else RGB[color % 8]
+        return f"{base + 8};2;{r};{g};{b}"
+    if color < 0:
+        return str(base + 9)
+    if color < 8:
+        return str(base + color)
+    return f"{base + 8};5;{color}"
+
+
+def _attr_codes(attr: int) -> Tuple[str, str, bool, bool]:
+    fg, bg = _pairs.get(pair_number(attr), (-1, -1))
+    return _color_code(fg, 30), _color_code(bg, 40), bool(attr & A_BOLD), bool(attr & A_REVERSE)
+
+
+def _sgr_change(old: Optional[int], new: int) -> str:
+    """
+    The shortest SGR taking the terminal from attribute `old` to `new`: only
+    the parts that differ, or a full reset when bold or reverse must go off.
+    """
+    key = (old, new)
+    sgr = _sgr.get(key)
+    if sgr is None:
+        fg, bg, bold, reverse = _attr_codes(new)
+        if old is None:
+            codes = ["0", fg, bg]
+        else:
+            old_fg, old_bg, old_bold, old_reverse = _attr_codes(old)
+            if (old_bold and not bold) or (old_reverse and not reverse):
+                codes = ["0", fg, bg]
+                old_bold = old_reverse = False
+            else:
+                codes = [code for code, was in ((fg, old_fg), (bg, old_bg)) if code != was]
+            bold = bold and not old_bold
+            reverse = reverse and not old_reverse
+        if bold:
+            codes.append("1")
+        if reverse:
+            codes.append("7")
+        sgr = _sgr[key] = f"\x1b[{';'.join(codes)}m" if codes else ""
+    return sgr
+
+
+class Screen:
+    """
+    The terminal: what is on it (front) and what the next refresh should show (back).
+    """
+
+    def __init__(self, fd_in: int, fd_out: int):
+        self.fd_in = fd_in
+        self.fd_out = fd_out
+        try:
+            size = os.get_terminal_size(fd_out)
+            self.height, self.width = size.lines, size.columns
+        except OSError:
+            self.height, self.width = 40, 120
+        # one list of characters and one of attributes per row, so writing a
+        # string is a slice assignment rather than a loop over its cells
+        self.chars: List[List[str]] = [[" "] * self.width for _ in range(self.height)]
+        self.attrs: List[List[int]] = [[A_NORMAL] * self.width for _ in range(self.height)]
+        # what the terminal shows; None marks a cell whose contents are unknown
+        self.shown_chars: List[List[Optional[str]]] = [[None] * self.width for _ in range(self.height)]
+        self.shown_attrs: List[List[Optional[int]]] = [[None] * self.width for _ in range(self.height)]
+        self.out: List[str] = []
+        self.attr: Optional[int] = None  # attribute the terminal is drawing with, if known
+        self.cursor: Tuple[Optional[int], Optional[int]] = (None, None)
+        self.pending = b""
+        self.bytes_written = 0
+
+    def flush(self) -> None:
+        out = self.out
+        attr = self.attr
+        cy, cx = self.cursor
+        width = self.width
+        for y in range(self.height):
+            chars, attrs = self.chars[y], self.attrs[y]
+            shown_chars, shown_attrs = self.shown_chars[y], self.shown_attrs[y]
+            if chars == shown_chars and attrs == shown_attrs:
+                continue
+            x = 0
+            while x < width:
+                if chars[x] == shown_chars[x] and attrs[x] == shown_attrs[x]:
+                    x += 1
+                    continue
+                # move the cursor as cheaply as possible
+                if cy == y and cx is not None and cx <= x:
+                    if x - cx >= JUMP_COST:
+                        out.append(f"\x1b[{x - cx}C")
+                    else:
+                        # a short stretch of unchanged cells is cheaper to rewrite than to jump over
+                        for gx in range(cx, x):
+                            if attrs[gx] != attr:
+                                out.append(_sgr_change(attr, attrs[gx]))
+                                attr = attrs[gx]
+                            out.append(chars[gx])
+                elif cy is not None and cy < y and x == 0 and y - cy <= 2:
+                    out.append("\r" + "\n" * (y - cy))
+                else:
+                    out.append(f"\x1b[{y + 1};{x + 1}H" if x else f"\x1b[{y + 1}H")
+                if attrs[x] != attr:
+                    out.append(_sgr_change(attr, attrs[x]))
+                    attr = attrs[x]
+                out.append(chars[x])
+                shown_chars[x] = chars[x]
+                shown_attrs[x] = attrs[x]
+                x += 1
+                # after the last column the terminal may or may not have wrapped
+                cy, cx = y, (x if x < width else None)
+        self.attr = attr
+        self.cursor = (cy, cx)
+        if out:
+            data = "".join(out).encode()
+            out.clear()
+            os.write(self.fd_out, data)
+            self.bytes_written += len(data)
+
+    def invalidate(self) -> None:
+        # clear(): the next refresh repaints everything, like curses
+        self.out.append("\x1b[0m\x1b[2J")
+        self.attr = None
+        self.cursor = (None, None)
+        for y in range(self.height):
+            self.shown_chars[y] = [None] * self.width
+            self.shown_attrs[y] = [None] * self.width
+
+    def read_key(self, timeout: Optional[float]) -> int:
+        if not self.pending:
+            if sys.platform == "win32":
+                return _read_key_windows(timeout)
+            ready, _, _ = select.select([self.fd_in], [], [], timeout)
+            if not ready:
+                return -1
+            self.pending = os.read(self.fd_in, 64)
+            if not self.pending:
+                return -1
+        for seq, key in _ESCAPES.items():
+            if self.pending.startswith(seq):
+                self.pending = self.pending[len(seq):]
+                return key
+        key = self.pending[0]
+        self.pending = self.pending[1:]
+        return key
+
+
+def _read_key_windows(timeout: Optional[float]) -> int:
+    import msvcrt
+
+    end = None if timeout is None else time.monotonic() + timeout
+    while not msvcrt.kbhit():
+        if end is not None and time.monotonic() >= end:
+            return -1
+        time.sleep(0.01)
+    ch = msvcrt.getwch()
+    if ch in ("\x00", "\xe0"):
+        return {"H": KEY_UP, "P": KEY_DOWN, "K": KEY_LEFT, "M": KEY_RIGHT,
+                "G": KEY_HOME, "O": KEY_END, "I": KEY_PPAGE, "Q": KEY_NPAGE}.get(msvcrt.getwch(), -1)
+    return ord(ch)
+
+
+class Window:
+    def __init__(self, screen: Screen, y: int, x: int, height: int, width: int):
+        self.screen = screen
+        self.y, self.x = y, x
+        self.height, self.width = height, width
+        self.background = (" ", A_NORMAL)
+        self.delay: Optional[float] = None  # seconds getch waits; None blocks
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    def keypad(self, flag: bool) -> None:
+        pass
+
+    def timeout(self, ms: int) -> None:
+        self.delay = None if ms < 0 else ms / 1000
+
+    def nodelay(self, flag: bool) -> None:
+        self.delay = 0 if flag else None
+
+    def bkgd(self, ch: str, attr: int = A_NORMAL) -> None:
+        self.background = (ch, attr)
+        self.erase()
+
+    def erase(self) -> None:
+        width = min(self.width, self.screen.width - self.x)
+        for y in range(self.y, min(self.y + self.height, self.screen.height)):
+            self.screen.chars[y][self.x:self.x + width] = [self.background[0]] * width
+            self.screen.attrs[y][self.x:self.x + width] = [self.background[1]] * width
+
+    def clear(self) -> None:
+        self.erase()
+        self.screen.invalidate()
+
+    def addstr(self, y: int, x: int, text: str, attr: int = A_NORMAL) -> None:
+        screen = self.screen
+        if not (0 <= y < min(self.height, screen.height - self.y) and 0 <= x < self.width):
+            raise error("addstr() returned ERR")
+        if not attr & A_COLOR:
+            attr |= self.background[1]
+        limit = min(self.width - x, screen.width - self.x - x)
+        text_fits = text[:limit]
+        start = self.x + x
+        screen.chars[self.y + y][start:start + len(text_fits)] = text_fits
+        screen.attrs[self.y + y][start:start + len(text_fits)] = [attr] * len(text_fits)
+        if len(text) > limit:
+            raise error("addstr() returned ERR")
+
+    def addch(self, y: int, x: int, ch: Union[int, str], attr: int = A_NORMAL) -> None:
+        self.addstr(y, x, chr(ch) if isinstance(ch, int) else ch, attr)
+
+    def border(self) -> None:
+        h, w = self.height, self.width
+        attr = self.background[1]
+        self.addstr(0, 0, "┌" + "─" * (w - 2) + "┐", attr)
+        for y in range(1, h - 1):
+            self.addstr(y, 0, "│", attr)
+            self.addstr(y, w - 1, "│", attr)
+        try:
+            self.addstr(h - 1, 0, "└" + "─" * (w - 2) + "┘", attr)
+        except error:
+            pass  # bottom-right corner of the screen, same as curses
+
+    def refresh(self) -> None:
+        self.screen.flush()
+
+    def getch(self) -> int:
+        self.screen.flush()
+        return self.screen.read_key(self.delay)
+
+
+def newwin(height: int, width: int, y: int = 0, x: int = 0) -> Window:
+    if _screen is None:
+        raise error("must call initscr() first")
+    return Window(_screen, y, x, height, width)
+
+
+def initscr(fd_in: int = 0, fd_out: int = 1) -> Window:
+    global _screen, _saved
+    _saved = None
+    if sys.platform == "win32":
+        os.system("")  # turns on VT escape processing in the Windows console
+    else:
+        import termios
+        import tty
+
+        try:
+            _saved = (fd_in, termios.tcgetattr(fd_in))
+            tty.setcbreak(fd_in)
+        except termios.error:
+            pass
+    _screen = Screen(fd_in, fd_out)
+    os.write(fd_out, b"\x1b[?1049h\x1b[0m\x1b[2J")  # alternate screen, cleared
+    return Window(_screen, 0, 0, _screen.height, _screen.width)
+
+
+_saved = None
+
+
+def endwin() -> None:
+    global _screen, _saved
+    if _screen is None:
+        return
+    os.write(_screen.fd_out, b"\x1b[0m\x1b[?25h\x1b[?1049l")
+    if _saved is not None:
+        import termios
+
+        termios.tcsetattr(_saved[0], termios.TCSADRAIN, _saved[1])
+    _screen = None
+    _saved = None
+
+
+def wrapper(func, *args, **kwargs):
+    stdscr = initscr()
+    try:
+        return func(stdscr, *args, **kwargs)
+    finally:
+        endwin()
+
+
+def _bench_child(backend: str, frames: int, result_fd: int) -> None:
+    # runs inside the pseudo-terminal; draws `frames` turns of a scripted game
+    import json
+    import random
+
+    import better_game
+
+    if backend == "ansi":
+        better_game.curses = sys.modules[__name__]
+    module = better_game.curses
+    stdscr = module.initscr()
+    try:
+        better_game.init_colors()
+        game = better_game.Game(stdscr, seed=1)
+        game.popup_level = lambda *a, **k: None
+        rng = random.Random(1)
+        draw = 0.0
+        for _ in range(frames):
+            game.player.hp = game.player.max_hp  # the benchmark should not die
+            game.take_turn(rng.choice([(0, -1), (0, 1), (-1, 0), (1, 0)]))
+            game.recompute_fov()
+            start = time.perf_counter()
+            game.draw()
+            draw += time.perf_counter() - start
+    finally:
+        module.endwin()
+    os.write(result_fd, json.dumps({"draw": draw}).encode())
+
+
+def benchmark(frames: int = 500) -> None:
+    """
+    Draw the same scripted game with curses and with this module, each in its
+    own pseudo-terminal, and report bytes written and time per frame.
+    """
+    import fcntl
+    import json
+    import pty
+    import struct
+    import termios
+
+    print(f"{frames} frames of a scripted game in a 120x40 pseudo-terminal")
+    print(f"{'backend':>8} {'ms/frame':>9} {'bytes/frame':>12}")
+    for backend in ("curses", "ansi"):
+        master, slave = pty.openpty()
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack("HHHH", 40, 120, 0, 0))
+        result_r, result_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(master)
+            os.close(result_r)
+            os.setsid()
+            for fd in (0, 1, 2):
+                os.dup2(slave, fd)
+            os.environ["TERM"] = os.environ.get("TERM", "xterm-256color") or "xterm-256color"
+            try:
+                _bench_child(backend, frames, result_w)
+            finally:
+                os._exit(0)
+        os.close(slave)
+        os.close(result_w)
+        written = 0
+        while True:
+            try:
+                chunk = os.read(master, 65536)
+            except OSError:
+                break  # EIO once the child has gone
+            if not chunk:
+                break
+            written += len(chunk)
+        os.waitpid(pid, 0)
+        result = json.loads(os.read(result_r, 4096) or b'{"draw": 0}')
+        os.close(result_r)
+        os.close(master)
+        print(f"{backend:>8} {result['draw'] / frames * 1000:>9.3f} {written / frames:>12.0f}")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
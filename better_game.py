@@ -5,13 +5,58 @@
 # - interactive inventory (Candy Box 2 style) with equip/use/drop/examine
 # - improved combat with hit chance, crits, damage display in bottom bar
 # - level popups when descending floors
+# - items, powerups and enemies defined in data/*.json (see content.py)
+# - visited floors are kept (see floors.py) and '<' climbs back up
+# - cave floors from a cellular-automata generator (see cavegen.py)
+# - spectators can watch over telnet with --spectate PORT (see spectate.py)
+# - --ansi draws with plain ANSI escapes instead of curses (see ansiterm.py)
+# - lit rooms, wall torches and glowing items light up what you can see (see lighting.py)
+# - enemies all move at once, collisions settled in one pass (see enemyai.py)
+# - every attack, pickup, spawn and death is logged; 'm' scrolls the log (see telemetry.py)
+# - --realtime: the world moves on a fixed tick instead of waiting for keys (see realtime.py)
+# - 'n' shows a minimap of the explored floor (see minimap.py)
+# - enemies out of sight follow noise and your scent trail (see senses.py)
+# - slow turns switch costly features off until they fit a time budget (see governor.py)
+# - sight and shots walk precomputed rays; equip a bow and 'f' shoots (see rays.py)
+# - things you saw stay on the map, dimmed, once out of view (see lastseen.py)
+# - handcrafted vaults from data/vaults.json are stamped between rooms (see vaults.py)
+# - headless games can be any size; hordes of enemies stress-test them (see stress.py)
 # Save & run with: python3 rogue_ascii_v2_upgraded.py
 # On Windows: pip install windows-curses
 
-import curses
+import argparse
+import math
 import random
 import sys
 import time
+from collections import deque
+
+try:
+	import curses
+except ImportError:
+	# no curses module (e.g. Windows without windows-curses): draw with ANSI escapes
+	import ansiterm as curses
+
+import numpy as np
+
+from cavegen import generate_cave
+from composer import FrameComposer, attr_table, layer, row_strings, tile_array
+from content import load_content
+from enemyai import VECTOR_MIN, WANDER_CHANCE, WANDER_DIRS, chase_steps, resolve_moves, settle_moves, wander_steps
+from floorcheck import check_floor
+from lastseen import LastSeen
+from governor import BUDGET_MS, Governor
+from lighting import Light, LightMaps
+from minimap import Minimap
+from rays import ray_table
+from realtime import MAX_FPS, TICK_RATE, TickClock
+from senses import Senses
+from floors import ENEMY_DTYPE, ITEM_DTYPE, Floor, FloorStore, pack_mask, pack_tiles, unpack_mask, unpack_tiles
+from snapshot import restore_snapshot, take_snapshot
+from spawns import SpawnIndex
+from spectate import Broadcaster, frame_rows, sgr_palette
+from telemetry import Attack, BadFloor, Death, Equip, EventLog, FloorChange, Pickup, Quality, Spawn
+from vaults import ITEM, MONSTER, candidates, pick, stamp
 
 MAP_W = 100
 MAP_H = 30
@@ -23,16 +68,40 @@ MAX_ENEMIES = 24
 # Gameplay tuning
 BASE_ENEMIES = 2
 ENEMIES_PER_LEVEL = 2
+# visited floors kept in memory; older ones are compressed to disk
+FLOORS_IN_MEMORY = 3
+# every CAVE_EVERY-th floor is a cave instead of rooms and tunnels
+CAVE_EVERY = 3
+# vaults tried on each rooms floor, and spots tried for each before giving up on it
+VAULTS_PER_FLOOR = 2
+VAULT_TRIES = 20
+# layouts to try before settling for one that fails check_floor
+MAP_ATTEMPTS = 20
+# turns the undo key can take back (only with --debug)
+UNDO_DEPTH = 100
+# lighting: chance a room is lit, wall torches per floor and how far they reach
+LIT_ROOM_CHANCE = 0.3
+TORCHES_PER_FLOOR = 4
+TORCH_RADIUS = 6
+# how far (in steps) enemies hear footsteps and fighting
+STEP_NOISE = 3
+COMBAT_NOISE = 12
+# map cells per minimap cell, each way
+MINIMAP_BLOCK = 4
+# real-time mode: the player heals 1 HP every REGEN_EVERY ticks
+REGEN_EVERY = 10
+# when the governor cuts them: enemies out of view act every DISTANT_EVERY-th
+# turn, and the minimap is refreshed every OVERLAY_EVERY-th
+DISTANT_EVERY = 4
+OVERLAY_EVERY = 4
 
 # Tiles / symbols
 WALL = '#'
 FLOOR = '.'
 PLAYER_CHAR = '@'
 STAIRS = '>'
-ENEMY_CHAR = 'g'
-POTION = '!'
-SWORD = '/'
-POWER_SYMBOLS = {'atk': '+', 'hp': 'h', 'def': 'd', 'spd': 's'}
+UP_STAIRS = '<'
+TORCH = '*'
 UNKNOWN = ' '
 
 # Colour pair IDs
@@ -46,6 +115,47 @@ CP_SWORD = 7
 CP_POWER = 8
 CP_TEXT = 9
 CP_POPUP = 10
+CP_TORCH = 11
+CP_MEMORY = 12
+
+# colour names used by the content files in data/
+COLOR_PAIRS = {
+	'player': CP_PLAYER, 'wall': CP_WALL, 'floor': CP_FLOOR, 'enemy': CP_ENEMY,
+	'potion': CP_POTION, 'stairs': CP_STAIRS, 'sword': CP_SWORD, 'power': CP_POWER,
+	'text': CP_TEXT, 'popup': CP_POPUP, 'torch': CP_TORCH,
+}
+
+# colour pair -> (foreground, background); -1 is the terminal default
+PAIR_COLORS = {
+	CP_PLAYER: (curses.COLOR_YELLOW, -1),
+	CP_WALL: (curses.COLOR_WHITE, -1),
+	CP_FLOOR: (curses.COLOR_WHITE, -1),
+	CP_ENEMY: (curses.COLOR_GREEN, -1),
+	CP_POTION: (curses.COLOR_RED, -1),
+	CP_STAIRS: (curses.COLOR_CYAN, -1),
+	CP_SWORD: (curses.COLOR_MAGENTA, -1),
+	CP_POWER: (curses.COLOR_BLUE, -1),
+	CP_TEXT: (curses.COLOR_WHITE, -1),
+	CP_POPUP: (curses.COLOR_BLACK, curses.COLOR_YELLOW),
+	CP_TORCH: (curses.COLOR_YELLOW, curses.COLOR_RED),
+	CP_MEMORY: (curses.COLOR_BLUE, -1),
+}
+
+# key code -> action: a (dx, dy) step, or a command name
+KEYMAP = {
+	curses.KEY_UP: (0,-1), ord('k'): (0,-1), ord('w'): (0,-1), ord('W'): (0,-1),
+	curses.KEY_DOWN: (0,1), ord('j'): (0,1), ord('s'): (0,1), ord('S'): (0,1),
+	curses.KEY_LEFT: (-1,0), ord('h'): (-1,0), ord('a'): (-1,0), ord('A'): (-1,0),
+	curses.KEY_RIGHT: (1,0), ord('l'): (1,0), ord('d'): (1,0), ord('D'): (1,0),
+	ord('g'): (0,0), ord('G'): (0,0), ord(' '): (0,0),
+	ord('q'): 'quit', ord('Q'): 'quit',
+	ord('i'): 'inventory', ord('I'): 'inventory',
+	ord('e'): 'equip', ord('E'): 'equip',
+	ord('u'): 'undo', ord('U'): 'undo',
+	ord('m'): 'log', ord('M'): 'log',
+	ord('n'): 'minimap', ord('N'): 'minimap',
+	ord('f'): 'fire', ord('F'): 'fire',
+}
 
 class Rect:
 	def __init__(self, x, y, w, h):
@@ -53,6 +163,7 @@ class Rect:
 		self.y1 = y
 		self.x2 = x + w
 		self.y2 = y + h
+		self.lit = False
 	def center(self):
 		return ((self.x1 + self.x2) // 2, (self.y1 + self.y2) // 2)
 	def intersect(self, other):
@@ -69,9 +180,11 @@ class Entity:
 		self.name = name or ch
 		self.atk = 1
 		self.defn = 0
+		self.color_pair = CP_TEXT
 
 class Item:
-	def __init__(self, x, y, ch, kind, name, color_pair=CP_POWER, bonus=1):
+	def __init__(self, x, y, ch, kind, name, color_pair=CP_POWER, bonus=1,
+				 blocks=False, effects=(), message='', light=0, reach=0):
 		self.x = x
 		self.y = y
 		self.ch = ch
@@ -79,62 +192,158 @@ class Item:
 		self.name = name
 		self.color_pair = color_pair
 		self.bonus = bonus
+		self.blocks = blocks
+		self.effects = effects  # (effect function, amount) pairs from content.py
+		self.message = message
+		self.light = light  # radius it lights while on the floor
+		self.range = reach  # how far it shoots, for bows
 
 class Game:
-	def __init__(self, stdscr):
+	def __init__(self, stdscr, seed=12345, events=None, width=MAP_W, height=MAP_H):
 		self.stdscr = stdscr
-		self.map = [[WALL for _ in range(MAP_W)] for _ in range(MAP_H)]
+		# map size; the screen stays MAP_W x MAP_H, so only headless games go bigger (see stress.py)
+		self.width = width
+		self.height = height
+		self.map = [[WALL for _ in range(self.width)] for _ in range(self.height)]
 		self.rooms = []
+		self.floor_cells = []
+		self.vaults_per_floor = VAULTS_PER_FLOOR
+		self.vault_spawns = []  # (marker, x, y) the vaults stamped on this floor hold
 		self.player = None
 		self.stairs = None
+		self.up_stairs = None
 		self.enemies = []
 		self.items = []
+		self.torches = []
+		self.lights = LightMaps()
+		self.wanted_enemies = 0
+		self.wanted_items = 0
+		# fixed seed keeps layout same each run — pass seed=None if you want random each play
+		self.rng = random.Random(seed)
+		self.spawn_index = SpawnIndex(rng=self.rng)
 		self.message = "Welcome — reach '>' to escape. Press 'i' for inventory."
 		self.level = 1
-		# fixed seed keeps layout same each run — remove if you want random each play
-		random.seed(12345)
+		self.turn = 0
+		self.events = events if events is not None else EventLog()  # writes to a file with --events
+		self.content = load_content()
+		self.composer = FrameComposer(
+			{WALL: (WALL, CP_WALL), FLOOR: (FLOOR, CP_FLOOR)},
+			{WALL: (WALL, CP_TEXT), FLOOR: (',', CP_TEXT)},
+			UNKNOWN, CP_TEXT)
+		self.attrs = None
+		self.last_seen = LastSeen(CP_MEMORY, ignore=[CP_PLAYER])
+		self.rays = ray_table(self.width)  # shared by every game with this map width
+		self.minimap = Minimap(MINIMAP_BLOCK, (FLOOR, CP_FLOOR), (WALL, CP_WALL), (UNKNOWN, CP_TEXT))
+		self.show_minimap = False
+		self.senses = Senses()
 		self.make_map()
-		self.visible = [[False]*MAP_W for _ in range(MAP_H)]
-		self.explored = [[False]*MAP_W for _ in range(MAP_H)]
+		self.visible = np.zeros((self.height, self.width), dtype=bool)
+		self.explored = np.zeros((self.height, self.width), dtype=bool)
 		self.fov_radius = 10
 		self.inventory = []
 		self.equipped = None
 		self.last_combat = ''
+		self.floors = FloorStore(FLOORS_IN_MEMORY)
+		self.spectators = None  # a spectate.Broadcaster when the run is being watched
+		self.history = None  # snapshots for the undo key, a deque when debugging
+		self.realtime = None  # the TickClock in real-time mode
+		self.governor = None  # a governor.Governor when turns have a time budget
+		self.drawn = None  # the last frame drawn, while only changed rows are redrawn
+		self.minimap_frame = None  # the last minimap drawn, while its refresh is cut
+		self.enemy_xy = None  # (enemies list, xs, ys) as of the last enemy turn, see enemy_positions
 
 	def create_room(self, room):
-		for y in range(room.y1, room.y2):
-			for x in range(room.x1, room.x2):
-				if 0 <= x < MAP_W and 0 <= y < MAP_H:
-					self.map[y][x] = FLOOR
+		# one slice per row, clipped to the map
+		x1, x2 = max(0, room.x1), min(self.width, room.x2)
+		if x1 >= x2:
+			return
+		run = [FLOOR] * (x2 - x1)
+		for y in range(max(0, room.y1), min(self.height, room.y2)):
+			self.map[y][x1:x2] = run
 
 	def create_h_tunnel(self, x1, x2, y):
-		for x in range(min(x1,x2), max(x1,x2)+1):
-			if 0 <= x < MAP_W and 0 <= y < MAP_H:
-				self.map[y][x] = FLOOR
+		if 0 <= y < self.height:
+			x1, x2 = max(0, min(x1,x2)), min(self.width, max(x1,x2)+1)
+			if x1 < x2:
+				self.map[y][x1:x2] = [FLOOR] * (x2 - x1)
 
 	def create_v_tunnel(self, y1, y2, x):
 		for y in range(min(y1,y2), max(y1,y2)+1):
-			if 0 <= x < MAP_W and 0 <= y < MAP_H:
+			if 0 <= x < self.width and 0 <= y < self.height:
 				self.map[y][x] = FLOOR
 
-	def make_map(self):
+	def make_map(self, validate=True):
+		# a new floor, ready to play
+		self.generate_floor(validate)
+		self.set_terrain()
+		for e in self.enemies:
+			self.events.emit(Spawn(self.turn, self.level, e.name, e.x, e.y))
+
+	def generate_floor(self, validate=True):
+		# the map, rooms, torches and spawns only; make_map() then builds the
+		# terrain caches, so floorcheck.py can check floors without them
+		for _ in range(MAP_ATTEMPTS):
+			self.map = [[WALL for _ in range(self.width)] for _ in range(self.height)]
+			self.enemies = []
+			self.items = []
+			# layout first, then everything that lives on it
+			if self.level % CAVE_EVERY == 0:
+				self.make_caves()
+			else:
+				self.make_rooms()
+			self.place_vaults()
+			self.place_torches()
+			self.populate()
+			if not validate:
+				break
+			result = check_floor(self)
+			if result.ok:
+				break
+		else:
+			# every layout failed: play the last one, but leave a trace of it in the log
+			self.events.emit(BadFloor(self.turn, self.level, MAP_ATTEMPTS, len(result.problems), result.problems[0]))
+
+	def set_terrain(self):
+		# the map changed: rebuild the cached terrain layers and light maps
+		tiles = tile_array(self.map)
+		self.composer.set_terrain(tiles)
+		self.last_seen.set_terrain(self.composer.terrain_glyph, self.composer.terrain_pair)
+		self.view_boxes = []  # where recompute_fov could have seen anything
+		self.lights.set_walls(tiles == ord(WALL))
+		self.walkable = tiles != ord(WALL)
+		self.wall_cells = (~self.walkable).ravel().tolist()  # flat, as the ray tables index it
+		self.minimap.set_terrain(self.walkable)
+		self.minimap_boxes = []  # explored boxes the minimap has not caught up with
+		self.senses.set_terrain(self.walkable)
+		self.passable = np.empty_like(self.walkable)  # refilled every enemy turn
+
+	def place_player(self, x, y):
+		if self.player is None:
+			self.player = Entity(x, y, PLAYER_CHAR, hp=24, name='You')
+			self.player.atk = 2
+		else:
+			self.player.x, self.player.y = x, y
+
+	def make_rooms(self):
 		self.rooms = []
-		for _ in range(MAX_ROOMS):
-			w = random.randint(ROOM_MIN, ROOM_MAX)
-			h = random.randint(ROOM_MIN, ROOM_MAX)
-			x = random.randint(1, MAP_W - w - 2)
-			y = random.randint(1, MAP_H - h - 2)
+		self.floor_cells = []
+		# as many tries per cell as on the standard map
+		for _ in range(MAX_ROOMS * self.width * self.height // (MAP_W * MAP_H)):
+			w = self.rng.randint(ROOM_MIN, ROOM_MAX)
+			h = self.rng.randint(ROOM_MIN, ROOM_MAX)
+			x = self.rng.randint(1, self.width - w - 2)
+			y = self.rng.randint(1, self.height - h - 2)
 			new_room = Rect(x,y,w,h)
 			if any(new_room.intersect(other) for other in self.rooms):
 				continue
 			self.create_room(new_room)
+			new_room.lit = self.rng.random() < LIT_ROOM_CHANCE
 			(cx,cy) = new_room.center()
 			if not self.rooms:
-				self.player = Entity(cx, cy, PLAYER_CHAR, hp=24, name='You')
-				self.player.atk = 2
+				self.place_player(cx, cy)
 			else:
 				(prevx, prevy) = self.rooms[-1].center()
-				if random.choice([True, False]):
+				if self.rng.choice([True, False]):
 					self.create_h_tunnel(prevx, cx, prevy)
 					self.create_v_tunnel(prevy, cy, cx)
 				else:
@@ -146,45 +355,169 @@ class Game:
 		last_center = self.rooms[-1].center()
 		self.stairs = Entity(last_center[0], last_center[1], STAIRS, name='Stairs')
 
+	def make_caves(self):
+		self.rooms = []
+		rng = np.random.default_rng(self.rng.getrandbits(64))
+		for _ in range(10):
+			floor = generate_cave(self.width, self.height, rng)
+			if floor.sum() >= self.width * self.height // 4:
+				break
+		self.map = np.where(floor, FLOOR, WALL).tolist()
+		ys, xs = np.nonzero(floor)
+		self.floor_cells = list(zip(xs.tolist(), ys.tolist()))
+		px, py = self.rng.choice(self.floor_cells)
+		self.place_player(px, py)
+		# stairs on the cave cell farthest from the player
+		far = int(np.argmax((xs - px)**2 + (ys - py)**2))
+		self.stairs = Entity(int(xs[far]), int(ys[far]), STAIRS, name='Stairs')
+
+	def place_vaults(self):
+		# stamp vaults into solid rock between the rooms, each joined by a tunnel to a room
+		self.vault_spawns = []
+		if not self.rooms or not self.content.vaults or self.vaults_per_floor <= 0:
+			return
+		tiles = tile_array(self.map).copy()
+		vaulted = np.zeros(tiles.shape, dtype=bool)  # cells stamped by a vault so far
+		floor = ord(FLOOR)
+		placed = 0
+		for _ in range(self.vaults_per_floor):
+			vault = pick(self.content.vaults, self.level, self.rng)
+			if vault is None:
+				return
+			shape = self.rng.choice(vault.shapes)
+			# spots over solid rock, clear of every room, tunnel and vault so far
+			for x, y in candidates(tiles, shape, self.rng, VAULT_TRIES):
+				doors = [(x + dx, y + dy, out_x, out_y) for dx, dy, out_x, out_y in shape.doors]
+				targets = [self.vault_target(*door) for door in doors]
+				if None in targets:
+					continue  # an entrance faces no room: its tunnel would cut through the vault
+				legs = [leg for door, target in zip(doors, targets) for leg in self.vault_tunnel(*door, *target)]
+				if any(vaulted[leg].any() for leg in legs):
+					continue  # a tunnel would cut through an earlier vault
+				stamp(tiles, shape, x, y)
+				vaulted[y:y + shape.height, x:x + shape.width] |= shape.mask
+				for leg in legs:
+					tiles[leg] = floor
+				self.vault_spawns += [(MONSTER, x + dx, y + dy) for dx, dy in shape.monsters]
+				self.vault_spawns += [(ITEM, x + dx, y + dy) for dx, dy in shape.items]
+				placed += 1
+				break
+		if placed:
+			self.map = np.where(tiles == ord(FLOOR), FLOOR, WALL).tolist()
+
+	def vault_tunnel(self, x, y, out_x, out_y, cx, cy):
+		# the two legs of the tunnel from the entrance at (x, y) to (cx, cy), as index pairs:
+		# it leaves along the side the entrance is on, then turns
+		if out_x:
+			return (y, slice(min(x, cx), max(x, cx) + 1)), (slice(min(y, cy), max(y, cy) + 1), cx)
+		return (slice(min(y, cy), max(y, cy) + 1), x), (cy, slice(min(x, cx), max(x, cx) + 1))
+
+	def vault_target(self, x, y, out_x, out_y):
+		# centre of the nearest room beyond the entrance at (x, y), or None
+		best, target = None, None
+		for room in self.rooms:
+			cx, cy = room.center()
+			if (cx - x) * out_x + (cy - y) * out_y > 0:
+				distance = abs(cx - x) + abs(cy - y)
+				if best is None or distance < best:
+					best, target = distance, (cx, cy)
+		return target
+
+	def place_torches(self):
+		# torches hang on walls next to floor
+		floor = tile_array(self.map) != ord(WALL)
+		beside = np.zeros_like(floor)
+		beside[1:] |= floor[:-1]
+		beside[:-1] |= floor[1:]
+		beside[:, 1:] |= floor[:, :-1]
+		beside[:, :-1] |= floor[:, 1:]
+		ys, xs = np.nonzero(~floor & beside)
+		spots = self.rng.sample(range(len(xs)), min(TORCHES_PER_FLOOR, len(xs)))
+		self.torches = [Entity(int(xs[i]), int(ys[i]), TORCH, name='Torch') for i in spots]
+		for t in self.torches:
+			t.color_pair = CP_TORCH
+
+	def light_sources(self):
+		for i, room in enumerate(self.rooms):
+			if room.lit:
+				# the room's walls are lit too
+				yield Light(('room', i), *room.center(), rect=(room.x1-1, room.y1-1, room.x2, room.y2))
+		for i, t in enumerate(self.torches):
+			yield Light(('torch', i), t.x, t.y, TORCH_RADIUS)
+		for it in self.items:
+			if it.light:
+				yield Light(('item', id(it)), it.x, it.y, it.light)
+
+	def build_spawn_index(self):
+		# free cells inside each room (or the whole cave), minus where the player and stairs are
+		index = SpawnIndex(exclude=[(self.player.x, self.player.y), (self.stairs.x, self.stairs.y)], rng=self.rng)
+		if self.rooms:
+			for room in self.rooms:
+				cells = []
+				for y in range(room.y1+1, room.y2):
+					row = self.map[y]
+					cells += [(x, y) for x in range(room.x1+1, room.x2) if row[x] != WALL]
+				index.add_group(cells)
+		else:
+			index.add_group(self.floor_cells)
+		return index
+
+	def populate(self):
+		# the way back up is where the player arrives
+		self.up_stairs = None
+		if self.level > 1:
+			self.up_stairs = Entity(self.player.x, self.player.y, UP_STAIRS, name='Up Stairs')
+
+		# every spawn takes its own free cell, so the counts come out exact
+		self.spawn_index = self.build_spawn_index()
+
 		# spawn enemies scaled by level
 		enemy_count = min(MAX_ENEMIES, BASE_ENEMIES + (self.level-1)*ENEMIES_PER_LEVEL)
-		for _ in range(enemy_count):
-			room = random.choice(self.rooms)
-			x = random.randint(room.x1+1, room.x2-1)
-			y = random.randint(room.y1+1, room.y2-1)
-			if self.is_blocked(x,y):
-				continue
-			hp = 3 + (self.level//2)
-			g = Entity(x,y,ENEMY_CHAR,hp=hp, name='Goblin')
-			g.atk = 1 + random.randint(0,1) + (self.level//3)
-			g.defn = random.randint(0,1) + (self.level//4)
-			g.max_hp = hp
-			self.enemies.append(g)
+		enemy_types = [t for t in self.content.enemies if t.min_level <= self.level]
+		self.wanted_enemies = enemy_count if enemy_types else 0
+		for _ in range(self.wanted_enemies):
+			spot = self.spawn_index.take()
+			if spot is None:
+				break
+			self.enemies.append(self.spawn_enemy(enemy_types, *spot))
 
-		# items: one standout sword, potions and powerups
-		room = random.choice(self.rooms)
-		x = random.randint(room.x1+1, room.x2-1)
-		y = random.randint(room.y1+1, room.y2-1)
-		self.items.append(Item(x,y,SWORD,'sword','Rusty Sword',color_pair=CP_SWORD,bonus=3))
-
-		for _ in range(4):
-			room = random.choice(self.rooms)
-			x = random.randint(room.x1+1, room.x2-1)
-			y = random.randint(room.y1+1, room.y2-1)
-			if self.is_blocked(x,y):
-				continue
-			self.items.append(Item(x,y,POTION,'potion','Healing Potion',color_pair=CP_POTION,bonus=6))
-
-		kinds = ['atk','hp','def','spd']
-		for kind in kinds:
-			room = random.choice(self.rooms)
-			x = random.randint(room.x1+1, room.x2-1)
-			y = random.randint(room.y1+1, room.y2-1)
-			if self.is_blocked(x,y):
-				continue
-			name = {'atk':'Bracer of Strength','hp':'Heartstone','def':'Shield Emblem','spd':'Wind Talisman'}[kind]
-			sym = POWER_SYMBOLS[kind]
-			self.items.append(Item(x,y,sym,'power',name,color_pair=CP_POWER,bonus=1))
+		# items and powerups, in the order listed in data/items.json and data/powers.json
+		self.wanted_items = sum(kind.per_floor for kind in self.content.items)
+		for kind in self.content.items:
+			for _ in range(kind.per_floor):
+				spot = self.spawn_index.take()
+				if spot is None:
+					break
+				self.items.append(self.spawn_item(kind, *spot))
+
+		# what the vaults hold comes on top of the counts above
+		for marker, x, y in self.vault_spawns:
+			if marker == MONSTER:
+				if enemy_types:
+					self.enemies.append(self.spawn_enemy(enemy_types, x, y))
+			else:
+				self.items.append(self.spawn_item(self.rng.choice(self.content.items), x, y))
+
+	def spawn_enemy(self, enemy_types, x, y):
+		if len(enemy_types) == 1:
+			kind = enemy_types[0]
+		else:
+			kind = self.rng.choices(enemy_types, weights=[t.weight for t in enemy_types])[0]
+		hp = kind.hp.at(self.level, self.rng)
+		g = Entity(x,y,kind.glyph,hp=hp, name=kind.name)
+		g.atk = kind.atk.at(self.level, self.rng)
+		g.defn = kind.defn.at(self.level, self.rng)
+		g.max_hp = hp
+		g.color_pair = COLOR_PAIRS[kind.color]
+		g.type_id = kind.type_id
+		return g
+
+	def spawn_item(self, kind, x, y):
+		it = Item(x, y, kind.glyph, kind.kind, kind.name, color_pair=COLOR_PAIRS[kind.color],
+				  bonus=kind.bonus, blocks=kind.blocks, effects=kind.effects, message=kind.message,
+				  light=kind.light, reach=kind.range)
+		it.type_id = kind.type_id
+		return it
 
 	def is_blocked(self, x, y):
 		if self.map[y][x] == WALL:
@@ -195,102 +528,138 @@ class Game:
 			if e.x == x and e.y == y:
 				return True
 		for it in self.items:
-			if it.x == x and it.y == y and it.kind == 'sword':
+			if it.x == x and it.y == y and it.blocks:
 				return True
 		return False
 
 	def recompute_fov(self):
-		self.visible = [[False]*MAP_W for _ in range(MAP_H)]
-		for dy in range(-self.fov_radius,self.fov_radius+1):
-			for dx in range(-self.fov_radius,self.fov_radius+1):
-				x = self.player.x + dx
-				y = self.player.y + dy
-				if 0 <= x < MAP_W and 0 <= y < MAP_H:
-					if dx*dx + dy*dy <= self.fov_radius*self.fov_radius:
-						if self.line_of_sight(self.player.x,self.player.y,x,y):
-							self.visible[y][x] = True
-							self.explored[y][x] = True
+		self.visible.fill(False)  # in place, so a turn allocates no new mask
+		# every cell in the view disc with a clear ray from the player (see rays.py)
+		seen = self.rays.visible(self.wall_cells, self.height, self.player.x, self.player.y, self.fov_radius)
+		self.visible.ravel()[seen] = True
+		self.explored.ravel()[seen] = True
+		# lights in view show everything they light; their maps are cached (see lighting.py)
+		self.lights.update(self.light_sources())
+		seen = self.lights.seen_from(self.player.x, self.player.y, self.visible)
+		self.visible |= seen
+		self.explored |= seen
+		# only the view and the lights in it can have explored anything new
+		r = self.fov_radius
+		boxes = [(self.player.x - r, self.player.y - r, self.player.x + r, self.player.y + r)]
+		for light in self.lights.shown:
+			boxes.append(light.rect or (light.x - light.radius, light.y - light.radius, light.x + light.radius, light.y + light.radius))
+		self.view_boxes = boxes
+		pending = self.minimap_boxes
+		if not self.show_minimap:
+			# nobody is looking: reduce it whole when it is next shown
+			self.minimap.invalidate()
+			pending.clear()
+			return
+		pending.extend(boxes)
+		if not (self.cut('minimap') and self.turn % OVERLAY_EVERY):
+			self.minimap.update(self.explored, pending)
+			pending.clear()
 
 	def line_of_sight(self, x1, y1, x2, y2):
-		# Bresenham
-		dx = abs(x2-x1)
-		dy = abs(y2-y1)
-		x = x1
-		y = y1
-		sx = 1 if x2>x1 else -1
-		sy = 1 if y2>y1 else -1
-		if dx>dy:
-			err = dx//2
-			while x != x2:
-				if self.map[y][x] == WALL and (x,y) != (x1,y1) and (x,y) != (x2,y2):
-					return False
-				err -= dy
-				if err < 0:
-					y += sy
-					err += dx
-				x += sx
-		else:
-			err = dy//2
-			while y != y2:
-				if self.map[y][x] == WALL and (x,y) != (x1,y1) and (x,y) != (x2,y2):
-					return False
-				err -= dx
-				if err < 0:
-					x += sx
-					err += dy
-				y += sy
-		return True
+		# Bresenham, walked from a precomputed ray table
+		return self.rays.clear(self.wall_cells, y1*self.width + x1, x2 - x1, y2 - y1)
+
+	def compose(self):
+		# glyph and colour pair arrays for the map, built in layers (see composer.py);
+		# later layers cover earlier ones: items, enemies, torches, stairs, player;
+		# out of view, what was last seen there (see lastseen.py)
+		fixtures = ([self.up_stairs] if self.up_stairs else []) + [self.stairs]
+		# only enemies in view are drawn, so only they are turned into a layer
+		xs, ys = self.enemy_positions()
+		in_view = [self.enemies[i] for i in np.flatnonzero(self.visible[ys, xs]).tolist()]
+		layers = [
+			layer(self.items),
+			layer(in_view),
+			layer(self.torches),
+			layer(fixtures, pair=CP_STAIRS),
+			layer([self.player], pair=CP_PLAYER),
+		]
+		glyphs, pairs = self.composer.compose(self.visible, self.explored, layers)
+		self.last_seen.update(self.visible, self.view_boxes, glyphs, pairs, self.turn)
+		self.last_seen.render(glyphs, pairs)
+		return glyphs, pairs
+
+	def status_lines(self):
+		status = f"HP:{self.player.hp}/{self.player.max_hp}  LV:{self.level}  Enemies:{len(self.enemies)}  Equipped:{self.inventory[self.equipped].name if (self.equipped is not None and self.equipped < len(self.inventory)) else 'None'}"
+		if self.realtime is not None:
+			status += f"  Ticks:{self.realtime.ticks} missed:{self.realtime.missed}"
+		return [
+			"-"*MAP_W,
+			status,
+			f"MSG: {self.message}",
+			f"LAST_COMBAT: {self.last_combat}",
+			"Controls: arrows/WASD to move, g wait, i inventory, e equip/cycle, f shoot, m log, n map, q quit",
+		]
 
 	def draw(self):
-		self.stdscr.clear()
-		for y in range(MAP_H):
-			for x in range(MAP_W):
-				ch = UNKNOWN
-				attr = curses.color_pair(CP_TEXT)
-				if self.visible[y][x]:
-					if self.map[y][x] == WALL:
-						ch = WALL
-						attr = curses.color_pair(CP_WALL)
-					else:
-						ch = FLOOR
-						attr = curses.color_pair(CP_FLOOR)
-					# objects
-					if self.player.x == x and self.player.y == y:
-						ch = PLAYER_CHAR
-						attr = curses.color_pair(CP_PLAYER)
-					elif self.stairs.x == x and self.stairs.y == y:
-						ch = STAIRS
-						attr = curses.color_pair(CP_STAIRS)
-					else:
-						for it in self.items:
-							if it.x == x and it.y == y:
-								ch = it.ch
-								attr = curses.color_pair(it.color_pair)
-						for e in self.enemies:
-							if e.x == x and e.y == y:
-								ch = e.ch
-								attr = curses.color_pair(CP_ENEMY)
-				elif self.explored[y][x]:
-					if self.map[y][x] == WALL:
-						ch = WALL
-					else:
-						ch = ','
+		glyphs, pairs = self.compose()
+		if self.spectators is not None:
+			self.spectators.publish(frame_rows(glyphs, pairs, self.status_lines(), CP_TEXT))
+		if self.attrs is None:
+			# colour pair -> curses attribute, once curses is running
+			self.attrs = attr_table({cp: curses.color_pair(cp) for cp in PAIR_COLORS}).tolist()
+		if self.cut('redraw') and self.drawn is not None:
+			# only the rows that differ from the last frame
+			old_glyphs, old_pairs = self.drawn
+			rows = np.flatnonzero((glyphs != old_glyphs).any(axis=1) | (pairs != old_pairs).any(axis=1)).tolist()
+			self.draw_cells(0, 0, glyphs, pairs, rows)
+		else:
+			# erase, not clear: clear() makes curses repaint the whole screen every turn
+			self.stdscr.erase()
+			self.draw_cells(0, 0, glyphs, pairs)
+		self.drawn = (glyphs, pairs) if self.cut('redraw') else None
+		if self.show_minimap:
+			self.draw_minimap()
+
+		# UI panel; padded so a shorter line covers a longer one left undrawn
+		try:
+			for i, line in enumerate(self.status_lines()):
+				self.stdscr.addstr(MAP_H+i, 0, line[:MAP_W-1].ljust(MAP_W-1), curses.color_pair(CP_TEXT))
+			self.stdscr.refresh()
+		except curses.error:
+			pass
+
+	def draw_cells(self, top, left, glyphs, pairs, rows=None):
+		# one addstr per run of cells that share a colour pair; all rows, or just `rows`
+		strings = row_strings(glyphs)
+		width = glyphs.shape[1]
+		for y in range(glyphs.shape[0]) if rows is None else rows:
+			row, row_pairs = str(strings[y]), pairs[y]
+			cuts = (np.flatnonzero(row_pairs[1:] != row_pairs[:-1]) + 1).tolist()
+			for start, end in zip([0] + cuts, cuts + [width]):
 				try:
-					self.stdscr.addch(y, x, ord(ch), attr)
+					self.stdscr.addstr(top + y, left + start, row[start:end], self.attrs[row_pairs[start]])
 				except curses.error:
 					pass
 
-		# UI panel
-		status = f"HP:{self.player.hp}/{self.player.max_hp}  LV:{self.level}  Enemies:{len(self.enemies)}  Equipped:{self.inventory[self.equipped].name if (self.equipped is not None and self.equipped < len(self.inventory)) else 'None'}"
+	def draw_minimap(self):
+		# top right corner of the map, framed; stairs once explored, enemies while in view
+		if self.cut('minimap') and self.minimap_frame is not None and self.turn % OVERLAY_EVERY:
+			glyphs, pairs = self.minimap_frame
+		else:
+			fixtures = [self.stairs] + ([self.up_stairs] if self.up_stairs else [])
+			glyphs, pairs = self.minimap_frame = self.minimap.render([
+				(layer(fixtures, pair=CP_STAIRS), self.explored),
+				(layer(self.enemies), self.visible),
+				(layer([self.player], pair=CP_PLAYER), None),
+			])
+		h, w = glyphs.shape
+		left = MAP_W - w - 2
+		edge = curses.color_pair(CP_TEXT)
 		try:
-			self.stdscr.addstr(MAP_H, 0, ("-"*MAP_W)[:MAP_W-1], curses.color_pair(CP_TEXT))
-			self.stdscr.addstr(MAP_H+1, 0, status[:MAP_W-1], curses.color_pair(CP_TEXT))
-			self.stdscr.addstr(MAP_H+2, 0, f"MSG: {self.message}"[:MAP_W-1], curses.color_pair(CP_TEXT))
-			self.stdscr.addstr(MAP_H+3, 0, f"LAST_COMBAT: {self.last_combat}"[:MAP_W-1], curses.color_pair(CP_TEXT))
-			self.stdscr.addstr(MAP_H+4, 0, "Controls: arrows/WASD to move, g wait, i inventory, e equip/cycle, q quit"[:MAP_W-1], curses.color_pair(CP_TEXT))
-			self.stdscr.refresh()
+			self.stdscr.addstr(0, left, '+' + '-'*w + '+', edge)
+			for y in range(h):
+				self.stdscr.addstr(1+y, left, '|', edge)
+				self.stdscr.addstr(1+y, left+w+1, '|', edge)
+			self.stdscr.addstr(h+1, left, '+' + '-'*w + '+', edge)
 		except curses.error:
 			pass
+		self.draw_cells(1, left+1, glyphs, pairs)
 
 	def popup_level(self, text, seconds=1.2):
 		h = 5
@@ -305,87 +674,76 @@ class Game:
 		time.sleep(seconds)
 		win.erase()
 		del win
+		self.drawn = None  # the popup is left on screen until a full redraw
 
 	def handle_keys(self):
-		k = self.stdscr.getch()
-		if k == -1:
+		action = KEYMAP.get(self.stdscr.getch())
+		if action == 'undo':
+			if self.history:
+				self.restore(self.history.pop())
+				self.message = "Undone."
+				self.recompute_fov()
+				self.draw()
 			return None
-		# movement
-		if k in (curses.KEY_UP, ord('k'), ord('w'), ord('W')):
-			return (0, -1)
-		if k in (curses.KEY_DOWN, ord('j'), ord('s'), ord('S')):
-			return (0, 1)
-		if k in (curses.KEY_LEFT, ord('h'), ord('a'), ord('A')):
-			return (-1, 0)
-		if k in (curses.KEY_RIGHT, ord('l'), ord('d'), ord('D')):
-			return (1, 0)
-		if k in (ord('g'), ord('G'), ord(' ')):
-			return (0,0)
-		if k in (ord('q'), ord('Q')):
-			return 'quit'
-		if k in (ord('i'), ord('I')):
+		if action == 'inventory':
 			self.show_inventory()
 			return None
-		if k in (ord('e'), ord('E')):
+		if action == 'log':
+			self.show_log()
+			return None
+		if action == 'minimap':
+			self.show_minimap = not self.show_minimap
+			self.drawn = None
+			self.minimap.update(self.explored)
+			self.draw()
+			return None
+		if action == 'equip':
 			self.cycle_equip()
 			return None
-		return None
+		return action
 
 	def pickup_item_at(self, x, y):
 		for it in list(self.items):
 			if it.x == x and it.y == y:
-				if it.kind == 'potion':
-					self.player.hp = min(self.player.max_hp, self.player.hp + it.bonus)
-					self.message = f"You drink a potion and heal {it.bonus} HP."
-					self.items.remove(it)
-					return True
-				elif it.kind == 'sword':
-					self.inventory.append(it)
-					self.items.remove(it)
-					self.message = f"You pick up {it.name}. Press 'e' to equip."
-					return True
-				elif it.kind == 'power':
-					if it.ch == POWER_SYMBOLS['atk']:
-						self.player.atk += 1
-						self.message = f"{it.name} found — Attack +1 permanently."
-					elif it.ch == POWER_SYMBOLS['hp']:
-						self.player.max_hp += 3
-						self.player.hp = min(self.player.max_hp, self.player.hp + 3)
-						self.message = f"{it.name} found — Max HP +3 (healed)."
-					elif it.ch == POWER_SYMBOLS['def']:
-						self.player.defn += 1
-						self.message = f"{it.name} found — Defence +1 permanently."
-					elif it.ch == POWER_SYMBOLS['spd']:
-						self.player.hp = min(self.player.max_hp, self.player.hp + 2)
-						self.message = f"{it.name} found — You feel swift! (+2 HP)"
-					self.items.remove(it)
-					return True
+				self.items.remove(it)
+				for effect, amount in it.effects:
+					effect(self, it, amount)
+				self.message = it.message.format(name=it.name, bonus=it.bonus)
+				self.events.emit(Pickup(self.turn, self.level, it.name, it.kind, x, y))
+				return True
 		return False
 
-	def perform_attack(self, attacker, defender):
-		# hit chance and damage, returns (damage, crit, hit_chance)
+	def perform_attack(self, attacker, defender, weapon=None):
+		# hit chance and damage, returns (damage, crit, hit_chance); `weapon` is what a shot was fired with
 		hit_chance = 75 + (attacker.atk - defender.defn) * 5
 		hit_chance = max(25, min(95, hit_chance))
-		roll = random.randint(1,100)
+		roll = self.rng.randint(1,100)
+		self.senses.noise(defender.x, defender.y, COMBAT_NOISE, self.turn)
 		if roll > hit_chance:
+			self.events.emit(Attack(self.turn, self.level, attacker.name, defender.name, hit_chance, roll, 0, False))
 			return (0, False, hit_chance)
-		dmg = random.randint(1,4) + max(0, attacker.atk-1)
-		# equipment bonus
-		if attacker is self.player and self.equipped is not None and self.equipped < len(self.inventory):
+		dmg = self.rng.randint(1,4) + max(0, attacker.atk-1)
+		# equipment bonus: the bow for a shot, the sword in hand otherwise
+		if weapon is not None:
+			dmg += weapon.bonus
+		elif attacker is self.player and self.equipped is not None and self.equipped < len(self.inventory):
 			it = self.inventory[self.equipped]
 			if it.kind == 'sword':
 				dmg += it.bonus
-		crit = random.random() < 0.07
+		crit = self.rng.random() < 0.07
 		if crit:
 			dmg = int(dmg*1.8)+1
 		actual = max(0, dmg - defender.defn)
 		defender.hp -= actual
+		self.events.emit(Attack(self.turn, self.level, attacker.name, defender.name, hit_chance, roll, actual, crit))
+		if defender.hp <= 0:
+			self.events.emit(Death(self.turn, self.level, defender.name, defender.x, defender.y, attacker.name))
 		return (actual, crit, hit_chance)
 
 	def move_player(self, dx, dy):
 		nx = self.player.x + dx
 		ny = self.player.y + dy
-		if not (0 <= nx < MAP_W and 0 <= ny < MAP_H):
+		if not (0 <= nx < self.width and 0 <= ny < self.height):
 			self.message = "You bump the edge of the map."
 			return
 		if self.map[ny][nx] == WALL:
@@ -398,18 +756,7 @@ class Game:
 				target = e
 				break
 		if target:
-			dmg, crit, chance = self.perform_attack(self.player, target)
-			if dmg == 0:
-				self.message = f"You miss the {target.name} ({chance}%)."
-				self.last_combat = f"Missed (chance {chance}%)."
-			else:
-				desc = f"You hit {target.name} for {dmg}{' (CRIT)' if crit else ''}."
-				self.message = desc
-				self.last_combat = desc
-				if target.hp <= 0:
-					self.enemies.remove(target)
-					self.message = f"You slay the {target.name}!"
-					self.last_combat = f"Slain: {target.name}."
+			self.player_attack(target)
 			return
 		# items
 		if self.pickup_item_at(nx, ny):
@@ -420,41 +767,168 @@ class Game:
 		if self.stairs.x == nx and self.stairs.y == ny:
 			self.level_up()
 			return
+		if self.up_stairs and self.up_stairs.x == nx and self.up_stairs.y == ny:
+			self.climb_up()
+			return
 		# move
 		self.player.x = nx
 		self.player.y = ny
 		self.message = "You move."
 
+	def player_attack(self, target, weapon=None):
+		dmg, crit, chance = self.perform_attack(self.player, target, weapon)
+		if dmg == 0:
+			self.message = f"You miss the {target.name} ({chance}%)."
+			self.last_combat = f"Missed (chance {chance}%)."
+		else:
+			desc = f"You {'shoot' if weapon else 'hit'} {target.name} for {dmg}{' (CRIT)' if crit else ''}."
+			self.message = desc
+			self.last_combat = desc
+			if target.hp <= 0:
+				self.enemies.remove(target)
+				self.message = f"You slay the {target.name}!"
+				self.last_combat = f"Slain: {target.name}."
+
+	def aim(self):
+		# the equipped bow and the nearest enemy in view within its range,
+		# or None with the reason in the message
+		weapon = self.inventory[self.equipped] if self.equipped is not None and self.equipped < len(self.inventory) else None
+		if weapon is None or not weapon.range:
+			self.message = "You have nothing to shoot with."
+			return None
+		px, py = self.player.x, self.player.y
+		reach = weapon.range * weapon.range
+		targets = [e for e in self.enemies if self.visible[e.y, e.x] and (e.x-px)**2 + (e.y-py)**2 <= reach]
+		if not targets:
+			self.message = "Nothing in range to shoot."
+			return None
+		return weapon, min(targets, key=lambda e: (e.x-px)**2 + (e.y-py)**2)
+
+	def fire(self):
+		# shoot the nearest enemy in view with the equipped bow; the arrow
+		# flies along the ray to it and stops at the first wall or enemy.
+		# Returns whether an arrow was loosed.
+		aimed = self.aim()
+		if aimed is None:
+			return False
+		weapon, target = aimed
+		px, py = self.player.x, self.player.y
+		by_cell = {e.y*self.width + e.x: e for e in self.enemies}
+		cell, wall = self.rays.trace(self.wall_cells, by_cell, py*self.width + px, target.x - px, target.y - py)
+		if wall:
+			self.message = f"Your arrow hits the wall short of the {target.name}."
+			return True
+		self.player_attack(by_cell[cell], weapon)
+		return True
+
 	def enemy_turns(self):
-		for e in list(self.enemies):
-			if abs(e.x - self.player.x) <= self.fov_radius and abs(e.y - self.player.y) <= self.fov_radius:
-				if self.visible[e.y][e.x] and self.line_of_sight(e.x,e.y,self.player.x,self.player.y):
-					dmg, crit, chance = self.perform_attack(e, self.player)
-					if dmg == 0:
-						self.message = f"The {e.name} misses you ({chance}%)."
-						self.last_combat = f"Enemy missed ({chance}%)."
-					else:
-						desc = f"{e.name} hits you for {dmg}{' (CRIT)' if crit else ''}."
-						self.message = desc
-						self.last_combat = desc
-						if self.player.hp <= 0:
-							self.game_over("You were slain.")
-					# attempt move towards player if not adjacent
-					dx = 1 if self.player.x > e.x else -1 if self.player.x < e.x else 0
-					dy = 1 if self.player.y > e.y else -1 if self.player.y < e.y else 0
-					nx = e.x + dx
-					ny = e.y + dy
-					if not (nx == self.player.x and ny == self.player.y) and not self.is_blocked(nx, ny):
-						e.x = nx
-						e.y = ny
+		# enemies attack one by one, then all move at once (see enemyai.py)
+		if len(self.enemies) >= VECTOR_MIN:
+			self.enemy_turns_vectorized()
+			return
+		px, py = self.player.x, self.player.y
+		distant = self.cut('distant_ai')
+		wander = not self.cut('wander')
+		steps = []
+		for i, e in enumerate(self.enemies):
+			step = (0, 0)
+			near = abs(e.x - px) <= self.fov_radius and abs(e.y - py) <= self.fov_radius
+			if not near and distant and (i + self.turn) % DISTANT_EVERY:
+				pass  # not this enemy's turn to act
+			elif near and self.visible[e.y, e.x] and self.line_of_sight(e.x,e.y,px,py):
+				self.enemy_attack(e)
+				# step towards the player
+				step = (1 if px > e.x else -1 if px < e.x else 0, 1 if py > e.y else -1 if py < e.y else 0)
 			else:
-				if random.random() < 0.2:
-					dx, dy = random.choice([(1,0),(-1,0),(0,1),(0,-1),(0,0)])
-					nx = e.x + dx
-					ny = e.y + dy
-					if (0 <= nx < MAP_W and 0 <= ny < MAP_H and self.map[ny][nx] != WALL and not self.is_blocked(nx, ny)):
-						e.x = nx
-						e.y = ny
+				# out of sight: follow a noise or the scent trail, or wander if far away
+				trace = self.senses.follow_one(e.x, e.y, self.turn)
+				if trace is not None:
+					step = trace
+				elif not near and wander and self.rng.random() < WANDER_CHANCE:
+					step = self.rng.choice(WANDER_DIRS)
+			steps.append(step)
+		positions = [(e.x, e.y) for e in self.enemies]
+		blocked = {(px, py)}
+		blocked.update((it.x, it.y) for it in self.items if it.blocks)
+		for e, (x, y) in zip(self.enemies, settle_moves(positions, steps, self.walkable, blocked)):
+			e.x = x
+			e.y = y
+		self.enemy_xy = None
+
+	def enemy_turns_vectorized(self):
+		# the same turn as enemy_turns with the movement done on arrays
+		n = len(self.enemies)
+		px, py = self.player.x, self.player.y
+		xs, ys = self.enemy_positions()
+		near = (np.abs(xs - px) <= self.fov_radius) & (np.abs(ys - py) <= self.fov_radius)
+		chasing = np.zeros(n, dtype=bool)
+		for i in np.flatnonzero(near & self.visible[ys, xs]).tolist():
+			e = self.enemies[i]
+			if self.line_of_sight(e.x,e.y,px,py):
+				chasing[i] = True
+				self.enemy_attack(e)
+		# chasers step towards the player, the rest follow noise or scent if
+		# they can, enemies out of range may wander, and the others hold still
+		dxs, dys = chase_steps(xs, ys, px, py)
+		dxs[~chasing] = 0
+		dys[~chasing] = 0
+		if self.cut('distant_ai'):
+			# enemies out of range take turns: each acts every DISTANT_EVERY-th turn
+			awake = near | ((np.arange(n) + self.turn) % DISTANT_EVERY == 0)
+			tdx, tdy = np.zeros(n, np.intp), np.zeros(n, np.intp)
+			tracking = np.zeros(n, dtype=bool)
+			tdx[awake], tdy[awake], tracking[awake] = self.senses.follow(xs[awake], ys[awake], self.turn)
+			idle = awake & ~near & ~tracking
+		else:
+			tdx, tdy, tracking = self.senses.follow(xs, ys, self.turn)
+			idle = ~near & ~tracking
+		tracking &= ~chasing
+		dxs[tracking] = tdx[tracking]
+		dys[tracking] = tdy[tracking]
+		if not self.cut('wander') and idle.any():
+			wdx, wdy = wander_steps(n, np.random.default_rng(self.rng.getrandbits(64)))
+			dxs[idle] = wdx[idle]
+			dys[idle] = wdy[idle]
+		nxs, nys = resolve_moves(xs, ys, dxs, dys, self.refresh_passable())
+		for i in np.flatnonzero((nxs != xs) | (nys != ys)).tolist():
+			e = self.enemies[i]
+			e.x = int(nxs[i])
+			e.y = int(nys[i])
+		self.enemy_xy = (self.enemies, nxs, nys)
+
+	def enemy_attack(self, e):
+		dmg, crit, chance = self.perform_attack(e, self.player)
+		if dmg == 0:
+			self.message = f"The {e.name} misses you ({chance}%)."
+			self.last_combat = f"Enemy missed ({chance}%)."
+		else:
+			desc = f"{e.name} hits you for {dmg}{' (CRIT)' if crit else ''}."
+			self.message = desc
+			self.last_combat = desc
+			if self.player.hp <= 0:
+				self.game_over("You were slain.")
+
+	def enemy_positions(self):
+		# xs, ys arrays of the enemies.  Enemies only move in their turn, which
+		# leaves the arrays behind; a new or shorter list (a floor change, a
+		# restore, a kill) is read off the objects again.
+		cached = self.enemy_xy
+		if cached is None or cached[0] is not self.enemies or len(cached[1]) != len(self.enemies):
+			n = len(self.enemies)
+			xs = np.fromiter((e.x for e in self.enemies), np.intp, n)
+			ys = np.fromiter((e.y for e in self.enemies), np.intp, n)
+			cached = self.enemy_xy = (self.enemies, xs, ys)
+		return cached[1], cached[2]
+
+	def refresh_passable(self):
+		# cells an enemy may step into this turn: floor without the player or blocking items
+		passable = self.passable
+		np.copyto(passable, self.walkable)
+		passable[self.player.y, self.player.x] = False
+		for it in self.items:
+			if it.blocks:
+				passable[it.y, it.x] = False
+		return passable
 
 	def game_over(self, msg):
 	    # show the same big popup style as floor entry
@@ -462,24 +936,92 @@ class Game:
 	    self.popup_level("Game Over", seconds=1.5)
 
 	    curses.endwin()
+	    self.events.close()
 	    print(msg)
+	    if self.realtime is not None:
+	        print(self.realtime.report())
+	    if self.governor is not None:
+	        print(self.governor.report())
 	    sys.exit(0)
 
 	def level_up(self):
-		self.level += 1
-		self.player.hp = min(100, self.player.hp + 8)
-		self.player.max_hp = min(100, getattr(self.player,'max_hp',24) + 5)
-		self.message = "You descend deeper... the dungeon reshapes!"
+		first_visit = self.level + 1 not in self.floors
+		self.change_floor(self.level + 1)
+		if first_visit:
+			self.player.hp = min(100, self.player.hp + 8)
+			self.player.max_hp = min(100, getattr(self.player,'max_hp',24) + 5)
+			self.message = "You descend deeper... the dungeon reshapes!"
+		else:
+			self.message = "You descend the stairs again."
 		self.popup_level(f"Entering Floor {self.level}")
-		self.map = [[WALL for _ in range(MAP_W)] for _ in range(MAP_H)]
-		self.rooms = []
-		self.enemies = []
-		self.items = []
+
+	def climb_up(self):
+		self.change_floor(self.level - 1)
+		self.message = "You climb back up the stairs."
+		self.popup_level(f"Back to Floor {self.level}")
+
+	def change_floor(self, level):
+		going_down = level > self.level
+		self.events.emit(FloorChange(self.turn, level, self.level, level not in self.floors))
+		self.floors.put(self.level, self.pack_floor())
+		self.level = level
+		self.visible = np.zeros((self.height, self.width), dtype=bool)
+		floor = self.floors.get(level)
+		if floor is not None:
+			self.unpack_floor(floor)
+			# arrive on the stairs we came through
+			arrival = self.up_stairs if going_down else self.stairs
+			self.player.x, self.player.y = arrival.x, arrival.y
+			return
+		self.explored = np.zeros((self.height, self.width), dtype=bool)
 		self.make_map()
-		self.player.x, self.player.y = self.rooms[0].center()
 		for e in self.enemies:
 			e.hp += self.level // 2
 
+	def pack_floor(self):
+		enemies = np.array([(e.x, e.y, e.hp, e.max_hp, e.atk, e.defn, e.type_id) for e in self.enemies], dtype=ENEMY_DTYPE)
+		items = np.array([(it.x, it.y, it.type_id) for it in self.items], dtype=ITEM_DTYPE)
+		rooms = np.array([(r.x1, r.y1, r.x2, r.y2, r.lit) for r in self.rooms], dtype=np.int16).reshape(-1, 5)
+		torches = np.array([(t.x, t.y) for t in self.torches], dtype=np.int16).reshape(-1, 2)
+		return Floor(
+			width=self.width, height=self.height,
+			tiles=pack_tiles(self.map),
+			explored=pack_mask(self.explored),
+			rooms=rooms,
+			stairs=(self.stairs.x, self.stairs.y),
+			up_stairs=(self.up_stairs.x, self.up_stairs.y) if self.up_stairs else None,
+			enemies=enemies,
+			items=items,
+			torches=torches,
+		)
+
+	def unpack_floor(self, floor):
+		self.map = unpack_tiles(floor.tiles, floor.width, floor.height)
+		self.explored = unpack_mask(floor.explored, floor.width, floor.height)
+		self.rooms = []
+		for x1, y1, x2, y2, lit in floor.rooms.tolist():
+			room = Rect(x1, y1, x2 - x1, y2 - y1)
+			room.lit = bool(lit)
+			self.rooms.append(room)
+		self.torches = []
+		for x, y in floor.torches.tolist():
+			t = Entity(x, y, TORCH, name='Torch')
+			t.color_pair = CP_TORCH
+			self.torches.append(t)
+		self.stairs = Entity(*floor.stairs, STAIRS, name='Stairs')
+		self.up_stairs = Entity(*floor.up_stairs, UP_STAIRS, name='Up Stairs') if floor.up_stairs else None
+		self.enemies = []
+		for x, y, hp, max_hp, atk, defn, type_id in floor.enemies.tolist():
+			kind = self.content.enemies[type_id]
+			g = Entity(x, y, kind.glyph, hp=hp, name=kind.name)
+			g.max_hp, g.atk, g.defn = max_hp, atk, defn
+			g.color_pair = COLOR_PAIRS[kind.color]
+			g.type_id = type_id
+			self.enemies.append(g)
+		self.items = [self.spawn_item(self.content.items[type_id], x, y)
+					  for x, y, type_id in floor.items.tolist()]
+		self.set_terrain()
+
 	def show_inventory(self):
 		# interactive inventory - select item by number then pick action
 		h = 14
@@ -514,6 +1056,7 @@ class Game:
 					if a in (ord('e'), ord('E')):
 						self.equipped = n
 						self.message = f"Equipped {sel.name}."
+						self.events.emit(Equip(self.turn, self.level, sel.name))
 						break
 					if a in (ord('u'), ord('U')) and sel.kind == 'potion':
 						self.player.hp = min(self.player.max_hp, self.player.hp + sel.bonus)
@@ -533,6 +1076,39 @@ class Game:
 						break
 		win.erase()
 		del win
+		self.drawn = None
+
+	def show_log(self):
+		# scroll back through recent events: up/down a line, PgUp/PgDn a page, q closes
+		h = MAP_H
+		w = MAP_W - 4
+		win = curses.newwin(h, w, 0, 2)
+		win.keypad(True)
+		events = list(self.events.ring)
+		page = h - 3
+		top = max(0, len(events) - page)
+		while True:
+			win.erase()
+			win.border()
+			win.addstr(0, 2, f" Log: {len(events)} events ")
+			for i, ev in enumerate(events[top:top+page]):
+				win.addstr(1+i, 2, f"T{ev.turn:<5} F{ev.level:<3} {ev.text()}"[:w-4])
+			win.refresh()
+			c = win.getch()
+			if c in (ord('q'), ord('Q'), ord('m'), ord('M'), 27):
+				break
+			if c in (curses.KEY_UP, ord('k'), ord('w')):
+				top -= 1
+			elif c in (curses.KEY_DOWN, ord('j'), ord('s')):
+				top += 1
+			elif c == curses.KEY_PPAGE:
+				top -= page
+			elif c == curses.KEY_NPAGE:
+				top += page
+			top = max(0, min(top, len(events) - page))
+		win.erase()
+		del win
+		self.drawn = None
 
 	def cycle_equip(self):
 		if not self.inventory:
@@ -543,46 +1119,137 @@ class Game:
 		else:
 			self.equipped = (self.equipped + 1) % len(self.inventory)
 		self.message = f"Equipped {self.inventory[self.equipped].name}."
+		self.events.emit(Equip(self.turn, self.level, self.inventory[self.equipped].name))
 
 	def main_loop(self):
 		self.stdscr.nodelay(False)
 		self.popup_level(f"Entering Floor {self.level}")
 		while True:
-			self.recompute_fov()
-			self.draw()
+			self.timed('fov', self.recompute_fov)
+			self.timed('draw', self.draw)
+			self.end_turn()
 			action = None
 			while action is None:
 				action = self.handle_keys()
 			if action == 'quit':
 				self.game_over("You quit. Bye!")
-			dxdy = action
-			if dxdy == (0,0):
-				self.message = "You wait..."
-			else:
-				self.move_player(dxdy[0], dxdy[1])
-			self.enemy_turns()
-			if self.player.x == self.stairs.x and self.player.y == self.stairs.y:
-				self.level_up()
-			if self.player.hp <= 0:
-				self.game_over("You died.")
+			if self.history is not None:
+				self.history.append(self.snapshot())
+			if not self.take_turn(action) and self.history is not None:
+				self.history.pop()  # nothing happened: nothing to undo
+
+	def realtime_loop(self, tick_rate=TICK_RATE, fps=MAX_FPS, seconds=None):
+		# the world ticks at tick_rate whatever the player does; keys act as
+		# soon as they arrive and frames are drawn at most fps times a second
+		self.popup_level(f"Entering Floor {self.level}")
+		clock = self.realtime = TickClock(tick_rate)
+		frame_gap = 1.0 / fps
+		next_frame = 0.0
+		dirty = True
+		end = None if seconds is None else clock.clock() + seconds
+		while end is None or clock.clock() < end:
+			for _ in range(clock.due()):
+				self.tick()
+				dirty = True
+			now = clock.clock()
+			if dirty and now >= next_frame:
+				self.timed('fov', self.recompute_fov)
+				self.timed('draw', self.draw)
+				self.end_turn()
+				dirty = False
+				next_frame = now + frame_gap
+			# wait for a key, but no longer than the next tick or pending frame
+			wait = clock.wait()
+			if dirty:
+				wait = min(wait, max(0.0, next_frame - clock.clock()))
+			self.stdscr.timeout(math.ceil(wait * 1000))
+			action = self.handle_keys()
+			if action == 'quit':
+				self.game_over("You quit. Bye!")
+			elif action == 'fire':
+				self.fire()  # no tick passes either way; only the shot or the message changes
+				dirty = True
+			elif action is not None and action != (0,0):
+				was = (self.player.x, self.player.y)
+				self.move_player(*action)
+				self.leave_traces(was)
+				self.recompute_fov()  # enemies judge sight by it on the next tick
+				dirty = True
+		return clock
+
+	def leave_traces(self, was):
+		# scent where the player stands, and footsteps if they moved from `was`
+		x, y = self.player.x, self.player.y
+		self.senses.scent(x, y, self.turn)
+		if (x, y) != was:
+			self.senses.noise(x, y, STEP_NOISE, self.turn)
+
+	def tick(self):
+		# one real-time step: enemies act and the player slowly heals
+		self.turn += 1
+		self.timed('enemies', self.enemy_turns)
+		if self.turn % REGEN_EVERY == 0 and self.player.hp < self.player.max_hp:
+			self.player.hp += 1
+		if self.player.hp <= 0:
+			self.game_over("You died.")
+
+	def snapshot(self):
+		# cheap copy of everything a turn can change (see snapshot.py)
+		return take_snapshot(self)
+
+	def restore(self, snap):
+		restore_snapshot(self, snap)
+		self.minimap.invalidate()
+
+	def take_turn(self, dxdy):
+		# one player action (a step, a wait or a shot) followed by the enemies' turn;
+		# returns False, with no turn passing, when there is nothing to shoot
+		if dxdy == 'fire' and self.aim() is None:
+			return False
+		self.turn += 1
+		was = (self.player.x, self.player.y)
+		if dxdy == (0,0):
+			self.message = "You wait..."
+		elif dxdy == 'fire':
+			self.fire()
+		else:
+			self.move_player(dxdy[0], dxdy[1])
+		self.leave_traces(was)
+		self.timed('enemies', self.enemy_turns)
+		if self.player.hp <= 0:
+			self.game_over("You died.")
+		return True
+
+	def cut(self, step):
+		# whether the governor has switched a costly feature off (see governor.py)
+		return self.governor is not None and self.governor.cut(step)
+
+	def timed(self, phase, fn):
+		# run one phase of a turn, timing it for the governor
+		if self.governor is None:
+			return fn()
+		start = time.perf_counter()
+		result = fn()
+		self.governor.record(phase, time.perf_counter() - start)
+		return result
+
+	def end_turn(self):
+		# the turn's phases are all in: let the governor adjust, and log what it did
+		if self.governor is None:
+			return
+		change = self.governor.end_turn()
+		if change is not None:
+			self.events.emit(Quality(self.turn, self.level, *change))
 
 def init_colors():
 	if not curses.has_colors():
 		return
 	curses.start_color()
 	curses.use_default_colors()
-	curses.init_pair(CP_PLAYER, curses.COLOR_YELLOW, -1)
-	curses.init_pair(CP_WALL, curses.COLOR_WHITE, -1)
-	curses.init_pair(CP_FLOOR, curses.COLOR_WHITE, -1)
-	curses.init_pair(CP_ENEMY, curses.COLOR_GREEN, -1)
-	curses.init_pair(CP_POTION, curses.COLOR_RED, -1)
-	curses.init_pair(CP_STAIRS, curses.COLOR_CYAN, -1)
-	curses.init_pair(CP_SWORD, curses.COLOR_MAGENTA, -1)
-	curses.init_pair(CP_POWER, curses.COLOR_BLUE, -1)
-	curses.init_pair(CP_TEXT, curses.COLOR_WHITE, -1)
-	curses.init_pair(CP_POPUP, curses.COLOR_BLACK, curses.COLOR_YELLOW)
-
-def main(stdscr):
+	for pair, (fg, bg) in PAIR_COLORS.items():
+		curses.init_pair(pair, fg, bg)
+
+def main(stdscr, spectate_port=None, debug=False, events_path=None, tick_rate=None, budget_ms=BUDGET_MS):
 	curses.curs_set(0)
 	stdscr.keypad(True)
 	stdscr.timeout(100)
@@ -596,11 +1263,36 @@ def main(stdscr):
 		stdscr.refresh()
 		stdscr.getch()
 		return
-	game = Game(stdscr)
-	game.main_loop()
+	game = Game(stdscr, events=EventLog(events_path) if events_path else None)
+	if debug:
+		game.history = deque(maxlen=UNDO_DEPTH)
+	if budget_ms:
+		game.governor = Governor(budget_ms)
+	if spectate_port is not None:
+		game.spectators = Broadcaster(sgr_palette(PAIR_COLORS), port=spectate_port).start()
+	# close the event log however the run ends, Ctrl-C included, so the last batch is written
+	try:
+		if tick_rate:
+			game.realtime_loop(tick_rate)
+		else:
+			game.main_loop()
+	finally:
+		game.events.close()
 
 if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="ASCII roguelike.")
+	parser.add_argument('--spectate', type=int, metavar='PORT', help="let others watch with: telnet <host> PORT")
+	parser.add_argument('--ansi', action='store_true', help="draw with ANSI escapes instead of curses (see ansiterm.py)")
+	parser.add_argument('--debug', action='store_true', help="enable the undo key (u)")
+	parser.add_argument('--events', metavar='FILE', help="append every game event to FILE (see telemetry.py)")
+	parser.add_argument('--realtime', type=float, nargs='?', const=TICK_RATE, metavar='TPS',
+						help=f"enemies act TPS times a second instead of once per move (default {TICK_RATE})")
+	parser.add_argument('--budget', type=float, default=BUDGET_MS, metavar='MS',
+						help=f"cut costly features while turns take longer than MS (default {BUDGET_MS:g}, 0 never)")
+	args = parser.parse_args()
+	if args.ansi:
+		import ansiterm as curses
 	try:
-		curses.wrapper(main)
+		curses.wrapper(main, args.spectate, args.debug, args.events, args.realtime, args.budget)
 	except KeyboardInterrupt:
 		print("Bye.")
@@ -0,0 +1,139 @@
+import sys
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Builds a frame from whole-array layers instead of deciding each cell with
+# branches.  Terrain is looked up through 256-entry tables indexed by the tile
+# byte, once for lit cells and once for remembered ones, and only when the map
+# changes.  Each turn the visibility masks pick between those, and entities
+# are scattered on top in priority order, so the cost is a handful of numpy
+# operations whatever the number of items and enemies.  Building a layer with
+# layer() does touch every object given, so callers pass only what can be in
+# view (Game.compose filters its enemies by position first).
+#
+# Frames come out as a (height, width) array of one-character strings and a
+# (height, width) uint8 array of colour pairs, which any backend can consume:
+# row_strings() gives each row as one str, and attr_table() maps pairs to the
+# backend's attributes.
+
+# (xs, ys, glyph codepoints, pairs) for one kind of thing on the map
+Layer = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def tile_array(rows: Sequence[Sequence[str]]) -> np.ndarray:
+    """
+    A list-of-lists map as a (height, width) uint8 array of tile bytes.
+    """
+    text = "".join("".join(row) for row in rows).encode("ascii")
+    return np.frombuffer(text, dtype=np.uint8).reshape(len(rows), len(rows[0]))
+
+
+def layer(things: Iterable, glyph: Optional[str] = None, pair: Optional[int] = None) -> Layer:
+    """
+    Positions, glyphs and pairs of objects with x, y, ch and color_pair.
+    `glyph` and `pair` override the objects' own.
+    """
+    things = list(things)
+    count = len(things)
+    xs = np.fromiter((t.x for t in things), np.intp, count)
+    ys = np.fromiter((t.y for t in things), np.intp, count)
+    if glyph is None:
+        glyphs = np.fromiter((ord(t.ch) for t in things), np.uint32, count)
+    else:
+        glyphs = np.full(count, ord(glyph), np.uint32)
+    if pair is None:
+        pairs = np.fromiter((t.color_pair for t in things), np.uint8, count)
+    else:
+        pairs = np.full(count, pair, np.uint8)
+    return xs, ys, glyphs, pairs
+
+
+def row_strings(glyphs: np.ndarray) -> np.ndarray:
+    """
+    Each row of a glyph array as one str, without a Python loop over cells.
+    """
+    height, width = glyphs.shape
+    return np.ascontiguousarray(glyphs).view(f"<U{width}").reshape(height)
+
+
+def attr_table(attrs: Dict[int, int]) -> np.ndarray:
+    """
+    A 256-entry lookup table from colour pair id to a backend attribute,
+    e.g. {pair: curses.color_pair(pair)}.
+    """
+    table = np.zeros(256, dtype=np.int64)
+    for pair, attr in attrs.items():
+        table[pair] = attr
+    return table
+
+
+class FrameComposer:
+    """
+    `lit` and `remembered` map a tile character to the (glyph, pair) shown
+    when it is in view and when it has only been seen before.  Cells never
+    seen show `unknown` in `unknown_pair`.
+    """
+
+    def __init__(self, lit: Dict[str, Tuple[str, int]], remembered: Dict[str, Tuple[str, int]],
+                 unknown: str = " ", unknown_pair: int = 0):
+        self.unknown = ord(unknown)
+        self.unknown_pair = unknown_pair
+        self.lit_glyph, self.lit_pair = self._tables(lit)
+        self.memory_glyph, self.memory_pair = self._tables(remembered)
+        self.tiles: Optional[np.ndarray] = None
+
+    def _tables(self, looks: Dict[str, Tuple[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        glyphs = np.arange(256, dtype=np.uint32)  # unlisted tiles show themselves
+        pairs = np.full(256, self.unknown_pair, dtype=np.uint8)
+        for tile, (glyph, pair) in looks.items():
+            glyphs[ord(tile)] = ord(glyph)
+            pairs[ord(tile)] = pair
+        return glyphs, pairs
+
+    def set_terrain(self, tiles: np.ndarray) -> None:
+        """
+        Build the terrain layers for a new map.  Call again whenever the tiles change.
+        """
+        self.tiles = tiles
+        self.terrain_glyph = self.lit_glyph[tiles]
+        self.terrain_pair = self.lit_pair[tiles]
+        self.memory_glyph_layer = self.memory_glyph[tiles]
+        self.memory_pair_layer = self.memory_pair[tiles]
+
+    def compose(self, visible: np.ndarray, explored: np.ndarray,
+                layers: Sequence[Layer]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (glyphs, pairs) for the frame.  `layers` are drawn in order, so
+        later ones cover earlier ones, and only where `visible` is set.
+        """
+        glyphs = np.where(visible, self.terrain_glyph,
+                          np.where(explored, self.memory_glyph_layer, self.unknown))
+        pairs = np.where(visible, self.terrain_pair,
+                         np.where(explored, self.memory_pair_layer, self.unknown_pair)).astype(np.uint8)
+        for xs, ys, layer_glyphs, layer_pairs in layers:
+            if not len(xs):
+                continue
+            shown = visible[ys, xs]
+            ys, xs = ys[shown], xs[shown]
+            glyphs[ys, xs] = layer_glyphs[shown]
+            pairs[ys, xs] = layer_pairs[shown]
+        return glyphs.astype(np.uint32).view("<U1"), pairs
+
+
+if __name__ == "__main__":
+    # Game.compose() against the number of enemies on the floor, layers
+    # built from the game's own entities included
+    from stress import horde_game
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f"{size}x{size} cave")
+    for count in (10, 1000, 10000, 100000):
+        game = horde_game(size, size, count)
+        game.compose()
+        start = time.perf_counter()
+        for _ in range(50):
+            game.compose()
+        elapsed = (time.perf_counter() - start) / 50
+        print(f"{len(game.enemies):>6} enemies: {elapsed * 1000:.3f} ms/frame")
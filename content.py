@@ -0,0 +1,313 @@
+import json
+import os
+import pickle
+import sys
+import time
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+from effects import EFFECTS
+from vaults import Vault, compile_vault
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+BUNDLE_PATH = os.path.join(BASE_DIR, ".cache", "content.bundle")
+
+# Bump when the compiled types change so old bundles are rebuilt.
+BUNDLE_VERSION = 5
+
+# Spawn order matters: make_map places items in the order they are listed here.
+SOURCES = ("items.json", "powers.json", "enemies.json", "races.json", "professions.json",
+           "vaults.json")
+
+COLORS = ("player", "wall", "floor", "enemy", "potion", "stairs", "sword", "power", "text", "popup", "torch")
+STATS = ("health", "strength", "dexterity", "intelligence")
+
+
+class ContentError(ValueError):
+    pass
+
+
+class ItemType(NamedTuple):
+    key: str
+    kind: str
+    name: str
+    glyph: str
+    color: str
+    bonus: int
+    per_floor: int
+    blocks: bool
+    # (effect function, amount) pairs, applied in order on pickup.
+    effects: Tuple[Tuple[Callable[..., None], int], ...]
+    message: str
+    # Radius of the light the item gives off while it lies on the floor (0: none).
+    light: int = 0
+    # How far it shoots once equipped (0: not a ranged weapon).
+    range: int = 0
+    # Position in Content.items, used by saved floors to refer to the type.
+    type_id: int = 0
+
+
+class StatRoll(NamedTuple):
+    base: int
+    roll: int
+    per_levels: int
+
+    def at(self, level: int, rng) -> int:
+        value = self.base
+        if self.roll:
+            value += rng.randint(0, self.roll)
+        if self.per_levels:
+            value += level // self.per_levels
+        return value
+
+
+class EnemyType(NamedTuple):
+    key: str
+    name: str
+    glyph: str
+    color: str
+    hp: StatRoll
+    atk: StatRoll
+    defn: StatRoll
+    weight: int
+    min_level: int
+    # Position in Content.enemies.
+    type_id: int = 0
+
+
+class Race(NamedTuple):
+    key: str
+    modifiers: Dict[str, int]
+
+
+class Profession(NamedTuple):
+    key: str
+    intro: str
+
+
+class Content(NamedTuple):
+    items: Tuple[ItemType, ...]
+    enemies: Tuple[EnemyType, ...]
+    races: Dict[str, Race]
+    professions: Dict[str, Profession]
+    vaults: Tuple[Vault, ...]
+
+
+_MISSING = object()
+
+
+def _field(entry: Dict[str, Any], name: str, kind: type, where: str, default: Any = _MISSING) -> Any:
+    if name not in entry:
+        if default is _MISSING:
+            raise ContentError(f"{where}: missing {name!r}")
+        return default
+    value = entry[name]
+    # bool is an int subclass, but true is never a valid stat.
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ContentError(f"{where}.{name}: expected {kind.__name__}, got {value!r}")
+    return value
+
+
+def _check_fields(entry: Any, allowed: Tuple[str, ...], where: str) -> None:
+    if not isinstance(entry, dict):
+        raise ContentError(f"{where}: expected an object, got {entry!r}")
+    unknown = set(entry) - set(allowed)
+    if unknown:
+        raise ContentError(f"{where}: unknown field(s) {', '.join(sorted(unknown))}")
+
+
+def _glyph(entry: Dict[str, Any], where: str) -> str:
+    glyph = _field(entry, "glyph", str, where)
+    if len(glyph) != 1:
+        raise ContentError(f"{where}.glyph: expected one character, got {glyph!r}")
+    return glyph
+
+
+def _color(entry: Dict[str, Any], where: str, default: Any = _MISSING) -> str:
+    color = _field(entry, "color", str, where, default)
+    if color not in COLORS:
+        raise ContentError(f"{where}.color: unknown colour {color!r}")
+    return color
+
+
+_ITEM_FIELDS = ("kind", "name", "glyph", "color", "bonus", "per_floor", "blocks", "effects", "message", "light",
+                "range")
+
+
+def _compile_item(key: str, entry: Dict[str, Any], where: str, defaults: Dict[str, Any]) -> ItemType:
+    _check_fields(entry, _ITEM_FIELDS, where)
+    entry = {**defaults, **entry}
+    bonus = _field(entry, "bonus", int, where, 0)
+    effects = []
+    for i, spec in enumerate(_field(entry, "effects", list, where)):
+        # ["heal", 3] applies 3; ["heal"] applies the item's bonus.
+        if not isinstance(spec, list) or not 1 <= len(spec) <= 2:
+            raise ContentError(f"{where}.effects[{i}]: expected [name] or [name, amount]")
+        if spec[0] not in EFFECTS:
+            raise ContentError(f"{where}.effects[{i}]: unknown effect {spec[0]!r}")
+        amount = spec[1] if len(spec) == 2 else bonus
+        if not isinstance(amount, int) or isinstance(amount, bool):
+            raise ContentError(f"{where}.effects[{i}]: amount must be an integer")
+        effects.append((EFFECTS[spec[0]], amount))
+    light = _field(entry, "light", int, where, 0)
+    if light < 0:
+        raise ContentError(f"{where}.light: must not be negative")
+    reach = _field(entry, "range", int, where, 0)
+    if reach < 0:
+        raise ContentError(f"{where}.range: must not be negative")
+    message = _field(entry, "message", str, where)
+    try:
+        message.format(name="", bonus=0)
+    except (KeyError, IndexError, ValueError) as e:
+        raise ContentError(f"{where}.message: bad placeholder ({e})") from None
+    return ItemType(
+        key=key,
+        kind=_field(entry, "kind", str, where),
+        name=_field(entry, "name", str, where),
+        glyph=_glyph(entry, where),
+        color=_color(entry, where),
+        bonus=bonus,
+        per_floor=_field(entry, "per_floor", int, where, 1),
+        blocks=_field(entry, "blocks", bool, where, False),
+        effects=tuple(effects),
+        message=message,
+        light=light,
+        range=reach,
+    )
+
+
+def _compile_stat(entry: Dict[str, Any], name: str, where: str) -> StatRoll:
+    stat = _field(entry, name, dict, where)
+    where = f"{where}.{name}"
+    _check_fields(stat, ("base", "roll", "per_levels"), where)
+    roll = StatRoll(
+        base=_field(stat, "base", int, where),
+        roll=_field(stat, "roll", int, where, 0),
+        per_levels=_field(stat, "per_levels", int, where, 0),
+    )
+    if roll.roll < 0 or roll.per_levels < 0:
+        raise ContentError(f"{where}: roll and per_levels must not be negative")
+    return roll
+
+
+def _compile_enemy(key: str, entry: Dict[str, Any], where: str) -> EnemyType:
+    _check_fields(entry, ("name", "glyph", "color", "hp", "atk", "defn", "weight", "min_level"), where)
+    return EnemyType(
+        key=key,
+        name=_field(entry, "name", str, where),
+        glyph=_glyph(entry, where),
+        color=_color(entry, where, "enemy"),
+        hp=_compile_stat(entry, "hp", where),
+        atk=_compile_stat(entry, "atk", where),
+        defn=_compile_stat(entry, "defn", where),
+        weight=_field(entry, "weight", int, where, 1),
+        min_level=_field(entry, "min_level", int, where, 1),
+    )
+
+
+def _compile_race(key: str, entry: Dict[str, Any], where: str) -> Race:
+    _check_fields(entry, STATS, where)
+    return Race(key=key, modifiers={stat: _field(entry, stat, int, where) for stat in entry})
+
+
+def _compile_profession(key: str, entry: Dict[str, Any], where: str) -> Profession:
+    _check_fields(entry, ("intro",), where)
+    return Profession(key=key, intro=_field(entry, "intro", str, where))
+
+
+def _compile_vault(key: str, entry: Dict[str, Any], where: str) -> Vault:
+    _check_fields(entry, ("rows", "weight", "min_level"), where)
+    rows = _field(entry, "rows", list, where)
+    if not all(isinstance(row, str) for row in rows):
+        raise ContentError(f"{where}.rows: expected a list of strings")
+    weight = _field(entry, "weight", int, where, 1)
+    if weight < 1:
+        raise ContentError(f"{where}.weight: must be at least 1")
+    try:
+        return compile_vault(key, rows, weight, _field(entry, "min_level", int, where, 1))
+    except ValueError as e:
+        raise ContentError(f"{where}.rows: {e}") from None
+
+
+def _read_source(data_dir: str, name: str) -> Dict[str, Any]:
+    path = os.path.join(data_dir, name)
+    with open(path, encoding="utf-8") as f:
+        try:
+            table = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ContentError(f"{name}: {e}") from None
+    if not isinstance(table, dict):
+        raise ContentError(f"{name}: expected an object of entries")
+    return table
+
+
+def compile_content(data_dir: str = DATA_DIR) -> Content:
+    """
+    Parse and validate every content file, raising ContentError on the first problem.
+    """
+    tables = {name: _read_source(data_dir, name) for name in SOURCES}
+    items = [_compile_item(k, v, f"items.json:{k}", {}) for k, v in tables["items.json"].items()]
+    power_defaults = {"kind": "power", "color": "power", "bonus": 1, "light": 3}
+    items += [_compile_item(k, v, f"powers.json:{k}", power_defaults) for k, v in tables["powers.json"].items()]
+    enemies = [_compile_enemy(k, v, f"enemies.json:{k}") for k, v in tables["enemies.json"].items()]
+    if not enemies:
+        raise ContentError("enemies.json: at least one enemy is required")
+    return Content(
+        items=tuple(item._replace(type_id=i) for i, item in enumerate(items)),
+        enemies=tuple(enemy._replace(type_id=i) for i, enemy in enumerate(enemies)),
+        races={k: _compile_race(k, v, f"races.json:{k}") for k, v in tables["races.json"].items()},
+        professions={k: _compile_profession(k, v, f"professions.json:{k}") for k, v in tables["professions.json"].items()},
+        vaults=tuple(_compile_vault(k, v, f"vaults.json:{k}") for k, v in tables["vaults.json"].items()),
+    )
+
+
+def _signature(data_dir: str) -> Tuple[Any, ...]:
+    # Like .pyc files, a bundle is valid while every source keeps its size and mtime.
+    signature: list = [BUNDLE_VERSION, os.path.abspath(data_dir)]
+    for name in SOURCES:
+        st = os.stat(os.path.join(data_dir, name))
+        signature.append((name, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+
+def load_content(data_dir: str = DATA_DIR, use_cache: bool = True) -> Content:
+    """
+    Return the compiled content, from .cache/content.bundle when it is up to date.
+    """
+    signature = _signature(data_dir)
+    if use_cache:
+        try:
+            with open(BUNDLE_PATH, "rb") as f:
+                cached_signature, content = pickle.load(f)
+            if cached_signature == signature:
+                return content
+        except Exception:
+            pass  # Missing, truncated or stale bundle: rebuild it below.
+
+    content = compile_content(data_dir)
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(BUNDLE_PATH), exist_ok=True)
+            tmp_path = f"{BUNDLE_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump((signature, content), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, BUNDLE_PATH)
+        except OSError:
+            pass
+    return content
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else DATA_DIR
+    start = time.perf_counter()
+    content = load_content(data_dir, use_cache=False)
+    parsed = (time.perf_counter() - start) * 1000
+    load_content(data_dir)
+    start = time.perf_counter()
+    load_content(data_dir)
+    bundled = (time.perf_counter() - start) * 1000
+    print(f"{len(content.items)} items, {len(content.enemies)} enemies, "
+          f"{len(content.races)} races, {len(content.professions)} professions, "
+          f"{len(content.vaults)} vaults: OK")
+    print(f"  parse + validate: {parsed:8.3f} ms")
+    print(f"  cached bundle:    {bundled:8.3f} ms")
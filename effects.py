@@ -0,0 +1,34 @@
+from typing import Callable, Dict
+
+# Effect functions take (game, item, amount).  Content files refer to them by
+# name and content.py swaps the names for the functions when it compiles them,
+# so applying an item is a walk over its (function, amount) pairs.
+
+
+def take(game, item, amount: int) -> None:
+    game.inventory.append(item)
+
+
+def heal(game, item, amount: int) -> None:
+    game.player.hp = min(game.player.max_hp, game.player.hp + amount)
+
+
+def max_hp(game, item, amount: int) -> None:
+    game.player.max_hp += amount
+
+
+def attack(game, item, amount: int) -> None:
+    game.player.atk += amount
+
+
+def defence(game, item, amount: int) -> None:
+    game.player.defn += amount
+
+
+EFFECTS: Dict[str, Callable[..., None]] = {
+    "take": take,
+    "heal": heal,
+    "max_hp": max_hp,
+    "attack": attack,
+    "defence": defence,
+}
@@ -0,0 +1,132 @@
+import argparse
+import multiprocessing
+import time
+from collections import Counter
+from typing import List, NamedTuple
+
+import numpy as np
+
+from cavegen import label_regions
+from floors import pack_tiles
+
+
+class FloorCheck(NamedTuple):
+    problems: List[str]  # anything that makes the floor unplayable
+    missing_enemies: int  # spawns asked for but not placed
+    missing_items: int
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def check_floor(game, wall: str = "#") -> FloorCheck:
+    """
+    Check a freshly generated floor: the stairs and every spawn must be on
+    floor reachable from the player, and no two things may share a cell.
+    """
+    height, width = len(game.map), len(game.map[0])
+    tiles = np.frombuffer(pack_tiles(game.map), dtype=np.uint8).reshape(height, width)
+    walkable = tiles != ord(wall)
+    labels, _ = label_regions(walkable)
+    problems = []
+
+    def region(name, x, y):
+        if not (0 <= x < width and 0 <= y < height):
+            problems.append(f"{name} at ({x},{y}) is off the map")
+            return None
+        if not walkable[y, x]:
+            problems.append(f"{name} at ({x},{y}) is in a wall")
+            return None
+        return labels[y, x]
+
+    start = region("player", game.player.x, game.player.y)
+    taken = {(game.player.x, game.player.y): "player"}
+    fixtures = [("stairs", game.stairs)]
+    if game.up_stairs is not None:
+        fixtures.append(("up stairs", game.up_stairs))
+    spawns = ([(f"enemy {e.name}", e) for e in game.enemies]
+              + [(f"item {it.name}", it) for it in game.items])
+    for name, thing in fixtures + spawns:
+        spot = (thing.x, thing.y)
+        # the player arrives on the up stairs
+        if spot in taken and not (name == "up stairs" and taken[spot] == "player"):
+            problems.append(f"{name} at ({thing.x},{thing.y}) shares a cell with {taken[spot]}")
+        taken.setdefault(spot, name)
+        label = region(name, thing.x, thing.y)
+        if label is not None and start is not None and label != start:
+            problems.append(f"{name} at ({thing.x},{thing.y}) is unreachable")
+
+    return FloorCheck(
+        problems=problems,
+        missing_enemies=max(0, game.wanted_enemies - len(game.enemies)),
+        missing_items=max(0, game.wanted_items - len(game.items)),
+    )
+
+
+def _check_seeds(level: int, first: int, last: int) -> dict:
+    # imported here because better_game imports check_floor
+    import better_game
+
+    game = better_game.Game(None)
+    game.level = level
+    tally = {"floors": 0, "failed": 0, "short": 0, "missing_enemies": 0, "missing_items": 0,
+             "reasons": Counter(), "caves": False}
+    for seed in range(first, last):
+        game.rng.seed(seed)
+        game.generate_floor(validate=False)  # no terrain caches: nothing here draws the floor
+        result = check_floor(game)
+        tally["floors"] += 1
+        if not result.ok:
+            tally["failed"] += 1
+            # "enemy Goblin at (3,4) is in a wall" -> "enemy Goblin is in a wall"
+            tally["reasons"].update({" ".join(w for w in p.split() if not w.startswith("(")) for p in result.problems})
+        if result.missing_enemies or result.missing_items:
+            tally["short"] += 1
+        tally["missing_enemies"] += result.missing_enemies
+        tally["missing_items"] += result.missing_items
+    tally["caves"] = not game.rooms
+    return tally
+
+
+def run_batch(levels: List[int], seeds: int, jobs: int = 1) -> None:
+    """
+    Generate `seeds` floors for each level without the in-game retry and
+    report how often the generator produces a bad or short floor.
+    """
+    print(f"{'level':>5} {'layout':>6} {'floors/s':>9} {'failed':>7} {'short':>7} "
+          f"{'-enemies':>9} {'-items':>7}  most common problem")
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    try:
+        for level in levels:
+            bounds = [(level, seeds * k // jobs, seeds * (k + 1) // jobs) for k in range(jobs)]
+            start = time.perf_counter()
+            if pool is None:
+                parts = [_check_seeds(*b) for b in bounds]
+            else:
+                parts = pool.starmap(_check_seeds, bounds)
+            rate = seeds / (time.perf_counter() - start)
+            total = Counter()
+            reasons = Counter()
+            for part in parts:
+                reasons.update(part.pop("reasons"))
+                total.update(part)
+            layout = "caves" if total["caves"] else "rooms"
+            common = reasons.most_common(1)[0][0] if reasons else "-"
+            print(f"{level:>5} {layout:>6} {rate:>9.0f} {total['failed'] / seeds:>7.1%} "
+                  f"{total['short'] / seeds:>7.1%} {total['missing_enemies'] / seeds:>9.2f} "
+                  f"{total['missing_items'] / seeds:>7.2f}  {common}")
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate generated floors over many seeds.")
+    parser.add_argument("--seeds", type=int, default=2000, help="floors to generate per level")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 3, 6, 10],
+                        help="dungeon levels to test (the level picks the generator)")
+    parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes")
+    args = parser.parse_args()
+    run_batch(args.levels, args.seeds, max(1, args.jobs))
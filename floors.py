@@ -0,0 +1,156 @@
+import atexit
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SPILL_ROOT = os.path.join(BASE_DIR, ".cache", "floors")
+
+ENEMY_DTYPE = np.dtype([
+    ("x", np.int16),
+    ("y", np.int16),
+    ("hp", np.int16),
+    ("max_hp", np.int16),
+    ("atk", np.int16),
+    ("defn", np.int16),
+    ("type_id", np.uint16),
+])
+
+ITEM_DTYPE = np.dtype([
+    ("x", np.int16),
+    ("y", np.int16),
+    ("type_id", np.uint16),
+])
+
+
+class Floor(NamedTuple):
+    """
+    Everything needed to put a visited floor back the way the player left it.
+    """
+    width: int
+    height: int
+    tiles: bytes  # one ASCII tile per cell, row-major
+    explored: bytes  # one bit per cell, see pack_mask
+    rooms: np.ndarray  # (n, 5) int16 of x1, y1, x2, y2, lit
+    stairs: Tuple[int, int]
+    up_stairs: Optional[Tuple[int, int]]
+    enemies: np.ndarray  # ENEMY_DTYPE
+    items: np.ndarray  # ITEM_DTYPE
+    torches: np.ndarray  # (n, 2) int16 of x, y
+
+    def nbytes(self) -> int:
+        return (len(self.tiles) + len(self.explored) + self.rooms.nbytes
+                + self.enemies.nbytes + self.items.nbytes + self.torches.nbytes)
+
+
+def pack_tiles(rows: List[List[str]]) -> bytes:
+    return "".join("".join(row) for row in rows).encode("ascii")
+
+
+def unpack_tiles(tiles: bytes, width: int, height: int) -> List[List[str]]:
+    text = tiles.decode("ascii")
+    return [list(text[y * width:(y + 1) * width]) for y in range(height)]
+
+
+def pack_mask(rows: List[List[bool]]) -> bytes:
+    return np.packbits(np.asarray(rows, dtype=bool), axis=None).tobytes()
+
+
+def unpack_mask(packed: bytes, width: int, height: int) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=width * height)
+    return bits.astype(bool).reshape(height, width)
+
+
+class FloorStore:
+    """
+    Visited floors by level.  The most recently used `keep` floors stay in
+    memory and older ones are zlib-compressed into a per-run spill directory,
+    which is removed again by close() or at interpreter exit.  Floors are
+    never changed once stored, so state() can share them with a snapshot;
+    spill files a snapshot names are kept until close().
+    """
+
+    def __init__(self, keep: int = 3, spill_root: str = SPILL_ROOT):
+        self.keep = max(1, keep)
+        self.spill_root = spill_root
+        self._memory: "OrderedDict[int, Floor]" = OrderedDict()
+        self._spilled: Dict[int, str] = {}
+        self._spill_dir: Optional[str] = None
+        self._pinned: Set[str] = set()  # spill files some snapshot may still name
+        self._spills = 0  # spill files written, for unique names
+
+    def __contains__(self, level: int) -> bool:
+        return level in self._memory or level in self._spilled
+
+    def __len__(self) -> int:
+        return len(self._memory) + len(self._spilled)
+
+    def put(self, level: int, floor: Floor) -> None:
+        self._memory[level] = floor
+        self._memory.move_to_end(level)
+        stale = self._spilled.pop(level, None)
+        if stale is not None:
+            self._discard(stale)
+        while len(self._memory) > self.keep:
+            self._spill(*self._memory.popitem(last=False))
+
+    def get(self, level: int) -> Optional[Floor]:
+        if level in self._memory:
+            self._memory.move_to_end(level)
+            return self._memory[level]
+        path = self._spilled.get(level)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            floor = pickle.loads(zlib.decompress(f.read()))
+        self.put(level, floor)
+        return floor
+
+    def state(self) -> tuple:
+        self._pinned.update(self._spilled.values())
+        return tuple(self._memory.items()), tuple(self._spilled.items())
+
+    def set_state(self, state: tuple) -> None:
+        memory, spilled = state
+        kept = {path for _, path in spilled}
+        for path in self._spilled.values():
+            if path not in kept:
+                self._discard(path)
+        self._memory = OrderedDict(memory)
+        self._spilled = dict(spilled)
+
+    def memory_bytes(self) -> int:
+        return sum(floor.nbytes() for floor in self._memory.values())
+
+    def _spill(self, level: int, floor: Floor) -> None:
+        if self._spill_dir is None:
+            try:
+                os.makedirs(self.spill_root, exist_ok=True)
+                self._spill_dir = tempfile.mkdtemp(prefix="run-", dir=self.spill_root)
+            except OSError:
+                self._spill_dir = tempfile.mkdtemp(prefix="rogue-floors-")
+            atexit.register(self.close)
+        # a new name every time: an older file for this level may belong to a snapshot
+        path = os.path.join(self._spill_dir, f"floor-{level}-{self._spills}.bin")
+        self._spills += 1
+        with open(path, "wb") as f:
+            f.write(zlib.compress(pickle.dumps(floor, protocol=pickle.HIGHEST_PROTOCOL)))
+        self._spilled[level] = path
+
+    def _discard(self, path: str) -> None:
+        if path not in self._pinned:
+            os.remove(path)
+
+    def close(self) -> None:
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+            atexit.unregister(self.close)  # which would otherwise keep the store alive
+        self._spilled.clear()
+        self._pinned.clear()
@@ -0,0 +1,153 @@
+import argparse
+from collections import deque
+from typing import Dict, NamedTuple, Optional, Sequence
+
+# Keeps turns within a time budget by switching costly features off.  The
+# game times each phase of a turn (enemies, fov, draw) and hands the times
+# over; when SLOW_TURNS turns in a row go over the budget the governor cuts
+# the next feature in STEPS, and when CALM_TURNS turns in a row finish well
+# inside it (under HEADROOM of the budget) it restores the last one cut.
+# Anything between resets both counts, so a single slow turn -- a garbage
+# collection, a burst of fighting -- changes nothing, and quality does not
+# flap around the budget.  Every change is returned to the game, which logs
+# it as a telemetry.Quality event with the turn and phase times behind it.
+
+BUDGET_MS = 16.0  # turn budget; one frame at 60 Hz
+SLOW_TURNS = 3  # turns over budget in a row before cutting a feature
+CALM_TURNS = 30  # turns under HEADROOM * budget in a row before restoring one
+HEADROOM = 0.5
+
+# cut in this order and restored in reverse, cheapest loss first:
+#   distant_ai  enemies out of view act only every few turns
+#   wander      idle enemies stop rolling to wander
+#   minimap     the minimap is refreshed every few turns instead of every turn
+#   redraw      only map rows that changed are drawn, not the whole screen
+STEPS = ("distant_ai", "wander", "minimap", "redraw")
+
+
+class Change(NamedTuple):
+    quality: int  # features still on after the change
+    step: str
+    cut: bool  # switched off, or back on
+    turn_ms: float  # mean turn time over the streak that caused it
+    phase: str  # the slowest phase of the last turn
+    phase_ms: float
+    budget_ms: float
+
+
+class Governor:
+    def __init__(self, budget_ms: float = BUDGET_MS, steps: Sequence[str] = STEPS,
+                 slow_turns: int = SLOW_TURNS, calm_turns: int = CALM_TURNS, headroom: float = HEADROOM):
+        self.budget = budget_ms / 1000
+        self.steps = tuple(steps)
+        self.slow_turns = slow_turns
+        self.calm_turns = calm_turns
+        self.headroom = headroom
+        self.level = 0  # how many of `steps` are cut
+        self.off: frozenset = frozenset()
+        self.times: Dict[str, float] = {}  # this turn's phases so far
+        self.turns: deque = deque(maxlen=1000)  # recent turn times, for report()
+        self.streak = 0  # turns in a row over budget (> 0) or calm (< 0)
+        self.streak_time = 0.0
+        self.cuts = 0
+        self.restores = 0
+
+    def cut(self, step: str) -> bool:
+        return step in self.off
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+
+    def end_turn(self) -> Optional[Change]:
+        """
+        Close the turn's phase times and return a Change if quality moved.
+        """
+        times = self.times
+        if not times:
+            return None
+        self.times = {}
+        total = sum(times.values())
+        self.turns.append(total)
+        if total > self.budget:
+            if self.streak < 0:
+                self.streak, self.streak_time = 0, 0.0
+            self.streak += 1
+        elif total < self.budget * self.headroom:
+            if self.streak > 0:
+                self.streak, self.streak_time = 0, 0.0
+            self.streak -= 1
+        else:
+            self.streak, self.streak_time = 0, 0.0
+            return None
+        self.streak_time += total
+        if self.streak >= self.slow_turns and self.level < len(self.steps):
+            self.level += 1
+            return self._change(self.steps[self.level - 1], True, times)
+        if -self.streak >= self.calm_turns and self.level > 0:
+            self.level -= 1
+            return self._change(self.steps[self.level], False, times)
+        return None
+
+    def _change(self, step: str, cut: bool, times: Dict[str, float]) -> Change:
+        mean = self.streak_time / abs(self.streak)
+        self.streak, self.streak_time = 0, 0.0
+        self.off = frozenset(self.steps[:self.level])
+        if cut:
+            self.cuts += 1
+        else:
+            self.restores += 1
+        phase = max(times, key=times.get)
+        return Change(len(self.steps) - self.level, step, cut, round(mean * 1000, 2), phase,
+                      round(times[phase] * 1000, 2), self.budget * 1000)
+
+    def report(self) -> str:
+        if not self.turns:
+            return "no turns timed"
+        turns = sorted(self.turns)
+        pick = lambda q: turns[min(len(turns) - 1, int(q * len(turns)))] * 1000
+        off = ", ".join(self.steps[:self.level]) or "nothing"
+        return (f"quality {len(self.steps) - self.level}/{len(self.steps)} ({off} cut), {self.cuts} cuts, "
+                f"{self.restores} restores; last {len(turns)} turns p50 {pick(0.5):.2f} ms "
+                f"p99 {pick(0.99):.2f} ms against {self.budget * 1000:g} ms")
+
+
+if __name__ == "__main__":
+    # a crowded floor under a tight budget: watch the governor cut features
+    # until turns fit, then what each turn costs at the final quality
+    import random
+
+    import numpy as np
+
+    from headless import HeadlessGame
+    from telemetry import EventLog, Quality
+
+    parser = argparse.ArgumentParser(description="Play a crowded floor headless under a turn budget.")
+    parser.add_argument("--budget", type=float, default=2.0, help="turn budget in ms")
+    parser.add_argument("--enemies", type=int, default=1000, help="enemies to add to the floor")
+    parser.add_argument("--turns", type=int, default=300)
+    args = parser.parse_args()
+
+    game = HeadlessGame(seed=1, events=EventLog(ring=10 ** 6))  # keep every event for the printout
+    game.governor = Governor(args.budget)
+    game.player.hp = game.player.max_hp = 10 ** 9  # keep playing, dying is not the point
+    free = np.argwhere(game.walkable)
+    rng = np.random.default_rng(1)
+    taken = {(e.x, e.y) for e in game.enemies} | {(game.player.x, game.player.y)}
+    kinds = game.content.enemies[:1]
+    for y, x in free[rng.permutation(len(free))].tolist():
+        if len(game.enemies) >= args.enemies:
+            break
+        if (x, y) not in taken:
+            game.enemies.append(game.spawn_enemy(kinds, x, y))
+    keys = random.Random(1)
+    for _ in range(args.turns):
+        game.press(keys.choice([ord(c) for c in "wasdg"]))
+        game.timed("draw", game.frame)
+        game.end_turn()
+    for event in game.events.ring:
+        if isinstance(event, Quality):
+            print(f"turn {event.turn}: {event.text()}")
+    turns = list(game.governor.turns)
+    print(f"{len(game.enemies)} enemies: first turns {np.mean(turns[:SLOW_TURNS]) * 1000:.2f} ms, "
+          f"last 100 {np.mean(turns[-100:]) * 1000:.2f} ms")
+    print(game.governor.report())
@@ -0,0 +1,240 @@
+import argparse
+import os
+import random
+import time
+from multiprocessing import Pipe, Process, shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from better_game import MAP_H, MAP_W
+from headless import HeadlessGame
+
+try:
+    from gymnasium import spaces
+except ImportError:
+    spaces = None  # the environments work without gymnasium; only the space objects need it
+
+# Reinforcement-learning environments over the headless game, in the shape
+# of the gymnasium API: reset() -> (obs, info) and step(action) -> (obs,
+# reward, terminated, truncated, info).  Actions are the keys handle_keys
+# knows that do something without a menu: the four steps, wait, shoot and
+# cycling the equipped item.  An observation is three (MAP_H, MAP_W) uint8
+# grids, holding only what the player knows:
+#
+#   0  terrain  0 unknown, 1 floor, 2 wall, as explored
+#   1  visible  1 where in view
+#   2  things   in view: 1 player, 2 enemy, 3 item, 4 stairs down, 5 stairs up
+#
+# plus STATS as int32 (hp, max_hp, level, turn).  Observations are written
+# into arrays the caller may own, which is how VecGameEnv steps many games
+# in worker processes and reads every observation straight out of
+# multiprocessing.shared_memory: the only messages between processes are a
+# byte saying "step" and one saying "done".
+
+ACTION_KEYS = [ord(c) for c in "wsadgfe"]  # up, down, left, right, wait, shoot, equip
+CHANNELS = 3
+STATS = ("hp", "max_hp", "level", "turn")
+EMPTY, PLAYER, ENEMY, ITEM, STAIRS, UP_STAIRS = range(6)
+
+MAX_STEPS = 1000  # steps before an episode is cut short
+REWARD_STEP = -0.01  # every step, so dawdling costs
+REWARD_KILL = 1.0
+REWARD_FLOOR = 10.0  # each floor deeper than the episode has been
+REWARD_DEATH = -10.0
+
+
+class GameEnv:
+    """
+    One game.  The obs and stats returned are the env's own buffers,
+    overwritten by the next step: copy them to keep them.
+    """
+
+    def __init__(self, seed: Optional[int] = None, max_steps: int = MAX_STEPS,
+                 obs: Optional[np.ndarray] = None, stats: Optional[np.ndarray] = None):
+        self.rng = random.Random(seed)
+        self.max_steps = max_steps
+        self.obs = obs if obs is not None else np.zeros((CHANNELS, MAP_H, MAP_W), dtype=np.uint8)
+        self.stats = stats if stats is not None else np.zeros(len(STATS), dtype=np.int32)
+        self.action_count = len(ACTION_KEYS)
+        if spaces is not None:
+            self.action_space = spaces.Discrete(self.action_count)
+            self.observation_space = spaces.Box(0, UP_STAIRS, self.obs.shape, dtype=np.uint8)
+        self.game: Optional[HeadlessGame] = None
+        self._map = None
+
+    def reset(self, seed: Optional[int] = None) -> Tuple[np.ndarray, dict]:
+        self.close()
+        game = self.game = HeadlessGame(seed if seed is not None else self.rng.getrandbits(32))
+        game.events.enabled = False  # nobody reads the log
+        self.steps = 0
+        self.deepest = game.level
+        self._observe()
+        return self.obs, self._info()
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, dict]:
+        game = self.game
+        level, enemies = game.level, len(game.enemies)
+        game.press(ACTION_KEYS[action])
+        self.steps += 1
+        reward = REWARD_STEP
+        if game.level == level:
+            reward += REWARD_KILL * (enemies - len(game.enemies))
+        elif game.level > self.deepest:
+            reward += REWARD_FLOOR * (game.level - self.deepest)
+            self.deepest = game.level
+        terminated = game.over is not None
+        if terminated and game.player.hp <= 0:
+            reward += REWARD_DEATH
+        self._observe()
+        return self.obs, reward, terminated, self.steps >= self.max_steps, self._info()
+
+    def close(self) -> None:
+        """
+        Let go of the current game's floors, spilled ones included.
+        """
+        if self.game is not None:
+            self.game.floors.close()
+
+    def _info(self) -> dict:
+        return dict(zip(STATS, self.stats.tolist()))
+
+    def _observe(self) -> None:
+        game = self.game
+        obs = self.obs
+        if game.map is not self._map:
+            # floor and wall codes for the new floor, shown where explored
+            self._map = game.map
+            self._terrain = np.where(game.walkable, 1, 2).astype(np.uint8)
+        np.multiply(self._terrain, game.explored, out=obs[0])
+        np.copyto(obs[1], game.visible)
+        things = obs[2]
+        things.fill(EMPTY)
+        visible = game.visible
+        for code, group in ((ITEM, game.items), (ENEMY, game.enemies),
+                            (UP_STAIRS, [game.up_stairs] if game.up_stairs else []), (STAIRS, [game.stairs])):
+            for t in group:
+                if visible[t.y, t.x]:
+                    things[t.y, t.x] = code
+        things[game.player.y, game.player.x] = PLAYER
+        p = game.player
+        self.stats[:] = (p.hp, p.max_hp, game.level, game.turn)
+
+
+def _worker(conn, names: Tuple[str, ...], first: int, count: int, total: int, seed: int, max_steps: int) -> None:
+    # steps envs first .. first+count-1 of the shared buffers on every b"s"
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    obs, stats, actions, rewards, terminated, truncated = _views(blocks, total)
+    envs = [GameEnv(seed + first + i, max_steps, obs[first + i], stats[first + i]) for i in range(count)]
+    for env in envs:
+        env.reset()
+    conn.send_bytes(b"r")
+    try:
+        while conn.recv_bytes() == b"s":
+            for i, env in enumerate(envs, first):
+                _, rewards[i], terminated[i], truncated[i], _ = env.step(int(actions[i]))
+                if terminated[i] or truncated[i]:
+                    env.reset()  # the next episode starts at once; its first obs is returned
+            conn.send_bytes(b"d")
+    finally:
+        for env in envs:
+            env.close()
+        del obs, stats, actions, rewards, terminated, truncated, envs
+        for block in blocks:
+            block.close()
+
+
+_LAYOUT = [((CHANNELS, MAP_H, MAP_W), np.uint8), ((len(STATS),), np.int32), ((), np.int64),
+           ((), np.float32), ((), np.bool_), ((), np.bool_)]
+
+
+def _views(blocks: List[shared_memory.SharedMemory], n: int) -> List[np.ndarray]:
+    return [np.ndarray((n,) + shape, dtype, buffer=block.buf) for block, (shape, dtype) in zip(blocks, _LAYOUT)]
+
+
+class VecGameEnv:
+    """
+    `n` games stepped together by `workers` processes.  step(actions) takes
+    one action per game and returns (obs, rewards, terminated, truncated,
+    stats) as arrays over the games, views of shared memory that the next
+    step overwrites.  A game that ends is reset straight away, so its row
+    already holds the next episode's first observation.
+    """
+
+    def __init__(self, n: int, workers: Optional[int] = None, seed: int = 0, max_steps: int = MAX_STEPS):
+        self.n = n
+        workers = max(1, min(n, workers or os.cpu_count() or 1))
+        self.blocks = [shared_memory.SharedMemory(create=True, size=max(1, n * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize))
+                       for shape, dtype in _LAYOUT]
+        self.obs, self.stats, self.actions, self.rewards, self.terminated, self.truncated = _views(self.blocks, n)
+        names = tuple(block.name for block in self.blocks)
+        self.conns = []
+        self.procs = []
+        for w in range(workers):
+            first, last = n * w // workers, n * (w + 1) // workers
+            ours, theirs = Pipe()
+            proc = Process(target=_worker, args=(theirs, names, first, last - first, n, seed, max_steps), daemon=True)
+            proc.start()
+            self.conns.append(ours)
+            self.procs.append(proc)
+        for conn in self.conns:
+            conn.recv_bytes()
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The games were reset when the workers started: their current observations.
+        """
+        return self.obs, self.stats
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        self.actions[:] = actions
+        for conn in self.conns:
+            conn.send_bytes(b"s")
+        for conn in self.conns:
+            conn.recv_bytes()
+        return self.obs, self.rewards, self.terminated, self.truncated, self.stats
+
+    def close(self) -> None:
+        if not self.procs:
+            return
+        for conn in self.conns:
+            conn.send_bytes(b"q")
+        for proc in self.procs:
+            proc.join()
+        self.procs = []
+        del self.obs, self.stats, self.actions, self.rewards, self.terminated, self.truncated
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure env steps per second, one game and many in worker processes.")
+    parser.add_argument("--envs", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--steps", type=int, default=200, help="vector steps to time")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    env = GameEnv(seed=1)
+    env.reset()
+    start = time.perf_counter()
+    for action in rng.integers(env.action_count, size=2000).tolist():
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset()
+    single = 2000 / (time.perf_counter() - start)
+    print(f"one env: {single:.0f} steps/s")
+
+    vec = VecGameEnv(args.envs, args.workers, seed=1)
+    try:
+        start = time.perf_counter()
+        episodes = 0
+        for _ in range(args.steps):
+            _, _, terminated, truncated, _ = vec.step(rng.integers(env.action_count, size=args.envs))
+            episodes += int((terminated | truncated).sum())
+        elapsed = time.perf_counter() - start
+    finally:
+        vec.close()
+    print(f"{args.envs} envs on {len(vec.conns)} workers: {args.envs * args.steps / elapsed:.0f} steps/s "
+          f"({episodes} episodes ended)")
@@ -0,0 +1,80 @@
+from typing import List, Optional
+
+from better_game import CP_TEXT, KEYMAP, MAP_H, MAP_W, Game
+from spectate import Row, frame_rows
+from telemetry import EventLog
+
+
+class HeadlessGame(Game):
+    """
+    A Game with no terminal.  Keys go in through press(), frames come out of
+    frame(), and game over is recorded in `over` instead of exiting.
+    """
+
+    def __init__(self, seed: Optional[int] = 12345, events: Optional[EventLog] = None,
+                 width: int = MAP_W, height: int = MAP_H):
+        self.over: Optional[str] = None
+        self.turns = 0
+        super().__init__(None, seed, events, width, height)
+        self.recompute_fov()
+
+    def draw(self) -> None:
+        pass
+
+    def popup_level(self, text: str, seconds: float = 1.2) -> None:
+        pass
+
+    def show_inventory(self) -> None:
+        pass
+
+    def show_log(self) -> None:
+        pass
+
+    def game_over(self, msg: str) -> None:
+        if self.over is None:
+            self.over = msg
+
+    def press(self, key: int) -> bool:
+        """
+        Apply one key code as the curses game would.  Returns True if it took a turn.
+        """
+        action = KEYMAP.get(key)
+        if action is None or self.over is not None:
+            return False
+        if action == "quit":
+            self.game_over("You quit. Bye!")
+            return False
+        if action == "equip":
+            self.cycle_equip()
+            return False
+        if action in ("inventory", "undo", "log", "minimap"):
+            return False
+        if not self.take_turn(action):
+            return False
+        self.timed("fov", self.recompute_fov)
+        self.turns += 1
+        return True
+
+    def changes_floor(self, key: int) -> bool:
+        """
+        Whether the key steps onto either stairs, so press() may build a floor.
+        """
+        action = KEYMAP.get(key)
+        if not isinstance(action, tuple) or self.over is not None:
+            return False
+        x, y = self.player.x + action[0], self.player.y + action[1]
+        return any(s is not None and (s.x, s.y) == (x, y) for s in (self.stairs, self.up_stairs))
+
+    def snapshot(self) -> tuple:
+        return super().snapshot(), self.over, self.turns
+
+    def restore(self, snap: tuple) -> None:
+        state, self.over, self.turns = snap
+        super().restore(state)
+
+    def frame(self) -> List[Row]:
+        """
+        The screen as rows of (glyphs, colour pairs): the map, then the status panel.
+        """
+        glyphs, pairs = self.compose()
+        return frame_rows(glyphs, pairs, self.status_lines(), CP_TEXT)
@@ -1,30 +1,50 @@
-from typing import Optional
+from collections import deque
+from typing import Deque, Dict, Optional
 
 import tcod.event
 
-from actions import Action, EscapeAction, MovementAction
+import actions
+from actions import Action
+
+MOVE_KEYS: Dict[int, Action] = {
+    # Arrow keys.
+    tcod.event.K_UP: actions.MOVE_UP,
+    tcod.event.K_DOWN: actions.MOVE_DOWN,
+    tcod.event.K_LEFT: actions.MOVE_LEFT,
+    tcod.event.K_RIGHT: actions.MOVE_RIGHT,
+    tcod.event.K_HOME: actions.MOVE_UP_LEFT,
+    tcod.event.K_END: actions.MOVE_DOWN_LEFT,
+    tcod.event.K_PAGEUP: actions.MOVE_UP_RIGHT,
+    tcod.event.K_PAGEDOWN: actions.MOVE_DOWN_RIGHT,
+    # Numpad keys.
+    tcod.event.K_KP_1: actions.MOVE_DOWN_LEFT,
+    tcod.event.K_KP_2: actions.MOVE_DOWN,
+    tcod.event.K_KP_3: actions.MOVE_DOWN_RIGHT,
+    tcod.event.K_KP_4: actions.MOVE_LEFT,
+    tcod.event.K_KP_6: actions.MOVE_RIGHT,
+    tcod.event.K_KP_7: actions.MOVE_UP_LEFT,
+    tcod.event.K_KP_8: actions.MOVE_UP,
+    tcod.event.K_KP_9: actions.MOVE_UP_RIGHT,
+}
+
+KEY_ACTIONS: Dict[int, Action] = {
+    **MOVE_KEYS,
+    tcod.event.K_ESCAPE: actions.ESCAPE,
+}
 
 
 class EventHandler(tcod.event.EventDispatch[Action]):
+    def __init__(self) -> None:
+        # Every action from a batch of events, oldest first.  The main loop drains it.
+        self.actions: Deque[Action] = deque()
+
     def ev_quit(self, event: tcod.event.Quit) -> Optional[Action]:
         raise SystemExit()
 
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[Action]:
-        action: Optional[Action] = None
-
-        key = event.sym
-
-        if key == tcod.event.K_UP:
-            action = MovementAction(dx=0, dy=-1)
-        elif key == tcod.event.K_DOWN:
-            action = MovementAction(dx=0, dy=1)
-        elif key == tcod.event.K_LEFT:
-            action = MovementAction(dx=-1, dy=0)
-        elif key == tcod.event.K_RIGHT:
-            action = MovementAction(dx=1, dy=0)
-
-        elif key == tcod.event.K_ESCAPE:
-            action = EscapeAction()
+        action = KEY_ACTIONS.get(event.sym)
 
-        # No valid key was pressed
-        return action
\ No newline at end of file
+        # Keys without a binding are ignored
+        if action is not None:
+            self.actions.append(action)
+        return action
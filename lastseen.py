@@ -0,0 +1,144 @@
+import sys
+import time
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+# What the player last saw of things that are out of view.  When a cell
+# leaves the field of view with an enemy, item, torch or stairs on it, the
+# glyph is remembered there with the turn it was seen, and drawn dimmed over
+# the remembered terrain until the cell is in view again and shows what is
+# really there.
+#
+# The memory is three flat arrays (cell, glyph, turn) with one entry per
+# remembered thing, and an update only looks at cells whose visibility can
+# have changed: what was in view last frame, found inside the view boxes
+# recompute_fov reports, and what is remembered.  Neither the number of
+# entities on the floor nor the size of the map enters into it.  What is on a
+# cell is read off the composed frame -- anything that is not the lit
+# terrain glyph -- so the memory needs no hook into entities at all.
+
+# (x1, y1, x2, y2) in map cells, inclusive
+Box = Tuple[int, int, int, int]
+
+
+class LastSeen:
+    def __init__(self, pair: int, ignore: Iterable[int] = ()):
+        self.pair = pair  # colour pair remembered things are drawn in
+        # colour pairs never remembered (e.g. the player's), as a lookup table
+        self.ignored = np.zeros(256, dtype=bool)
+        self.ignored[list(ignore)] = True
+        self.terrain: Optional[np.ndarray] = None
+        self.clear()
+
+    def set_terrain(self, terrain_glyph: np.ndarray, terrain_pair: np.ndarray) -> None:
+        """
+        The lit terrain glyphs and pairs of a new floor; forgets everything.
+        """
+        self.terrain = terrain_glyph
+        self.terrain_pairs = terrain_pair
+        self.clear()
+
+    def clear(self) -> None:
+        self.cells = np.zeros(0, dtype=np.intp)
+        self.glyphs = np.zeros(0, dtype=np.uint32)
+        self.turns = np.zeros(0, dtype=np.int32)
+        # things in view at the last update, and its turn
+        self.shown: Tuple[np.ndarray, np.ndarray] = (self.cells, self.glyphs)
+        self.shown_turn = 0
+
+    def state(self) -> tuple:
+        # update() swaps in new arrays rather than writing into them, so
+        # they can be shared with a snapshot as they are
+        return self.cells, self.glyphs, self.turns, self.shown, self.shown_turn
+
+    def set_state(self, state: tuple) -> None:
+        self.cells, self.glyphs, self.turns, self.shown, self.shown_turn = state
+
+    def update(self, visible: np.ndarray, boxes: Iterable[Box], glyphs: np.ndarray, pairs: np.ndarray,
+               turn: int) -> None:
+        """
+        Take in a composed frame.  `boxes` must cover every visible cell.
+        """
+        in_view = visible.ravel()
+        # remembered cells back in view show what is really there
+        if len(self.cells):
+            keep = ~in_view[self.cells]
+            if not keep.all():
+                self.cells, self.glyphs, self.turns = self.cells[keep], self.glyphs[keep], self.turns[keep]
+        # things shown last time on cells now out of view are remembered
+        cells, seen = self.shown
+        if len(cells):
+            gone = ~in_view[cells]
+            if gone.any():
+                self.cells = np.concatenate([self.cells, cells[gone]])
+                self.glyphs = np.concatenate([self.glyphs, seen[gone]])
+                self.turns = np.concatenate([self.turns, np.full(int(gone.sum()), self.shown_turn, np.int32)])
+        self.shown = self._things(visible, boxes, glyphs.view(np.uint32), pairs)
+        self.shown_turn = turn
+
+    def _things(self, visible: np.ndarray, boxes: Iterable[Box], glyphs: np.ndarray,
+                pairs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # flat cells in view inside `boxes` that show something other than terrain
+        height, width = visible.shape
+        found = []
+        for x1, y1, x2, y2 in boxes:
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2 + 1), min(height, y2 + 1)
+            if x1 >= x2 or y1 >= y2:
+                continue
+            window = np.s_[y1:y2, x1:x2]
+            thing = (glyphs[window] != self.terrain[window]) | (pairs[window] != self.terrain_pairs[window])
+            thing &= visible[window]
+            thing &= ~self.ignored[pairs[window]]
+            ys, xs = np.nonzero(thing)
+            found.append((ys + y1) * width + (xs + x1))
+        if not found:
+            return np.zeros(0, np.intp), np.zeros(0, np.uint32)
+        cells = found[0] if len(found) == 1 else np.unique(np.concatenate(found))  # boxes may overlap
+        return cells, glyphs.ravel()[cells]
+
+    def render(self, glyphs: np.ndarray, pairs: np.ndarray) -> None:
+        """
+        Draw the remembered things into a composed frame, in place.
+        """
+        if not len(self.cells):
+            return
+        glyphs.view(np.uint32).ravel()[self.cells] = self.glyphs
+        pairs.ravel()[self.cells] = self.pair
+
+
+if __name__ == "__main__":
+    # per-turn cost against the number of enemies on a big cave
+    from cavegen import generate_cave
+    from composer import FrameComposer
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = np.random.default_rng(1)
+    floor = generate_cave(size, size, rng)
+    tiles = np.where(floor, ord("."), ord("#")).astype(np.uint8)
+    composer = FrameComposer({"#": ("#", 2), ".": (".", 3)}, {"#": ("#", 9), ".": (",", 9)}, " ", 9)
+    composer.set_terrain(tiles)
+    cells = np.argwhere(floor)
+    walk = cells[rng.choice(len(cells), 200)].tolist()
+    r = 10
+    print(f"{size}x{size} cave, view radius {r}")
+    for count in (100, 10000, 100000):
+        ys, xs = cells[rng.choice(len(cells), count)].T
+        things = (xs, ys, np.full(count, ord("g"), np.uint32), np.full(count, 4, np.uint8))
+        memory = LastSeen(12)
+        memory.set_terrain(composer.terrain_glyph, composer.terrain_pair)
+        visible = np.zeros_like(floor)
+        explored = np.zeros_like(floor)
+        spent = 0.0
+        for turn, (y, x) in enumerate(walk):
+            visible[:] = False
+            box = (x - r, y - r, x + r, y + r)
+            visible[max(0, y - r):y + r + 1, max(0, x - r):x + r + 1] = True
+            explored |= visible
+            glyphs, pairs = composer.compose(visible, explored, [things])
+            start = time.perf_counter()
+            memory.update(visible, [box], glyphs, pairs, turn)
+            memory.render(glyphs, pairs)
+            spent += time.perf_counter() - start
+        print(f"  {count:>6} enemies: {spent / len(walk) * 1e6:6.0f} us per turn, {len(memory.cells)} remembered")
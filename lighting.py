@@ -0,0 +1,243 @@
+import sys
+import time
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from rays import ray_table
+
+# Light sources and their cached light maps.  A light map is the set of cells
+# a source lights; it only depends on the walls and on the source itself, so
+# it is computed when either changes and reused every other turn.  Each turn
+# the maps of the sources the player can see are OR-ed together, and of those
+# lit cells the player sees only the ones with a clear ray back to them, at
+# any distance -- light shows what is in the line of sight, not through walls.
+# Cells inside an open lit room the player stands in need no check at all;
+# of the rest, a few are walked along the table's rays and more are checked
+# all at once against a summed-area table of the walls (clear_lines), so a
+# lit room far bigger than the view costs a few array passes a turn rather
+# than a ray walk per lit cell, and no far rays are added to the table.
+
+WALK_CELLS = 64  # lit cells beyond the view walked ray by ray; more go through clear_lines()
+
+
+def _wall_sums(walls: np.ndarray) -> np.ndarray:
+    # summed-area table: entry [y, x] counts the walls above and left of (x, y)
+    height, width = walls.shape
+    sums = np.zeros((height + 1, width + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(walls, axis=0, dtype=np.int32), axis=1, out=sums[1:, 1:])
+    return sums
+
+
+def _walls_in(sums: np.ndarray, x1, y1, x2, y2) -> np.ndarray:
+    # walls in each box x1..x2, y1..y2 (inclusive, in any order); 0 for empty boxes
+    x1, x2 = np.minimum(x1, x2), np.maximum(x1, x2) + 1
+    y1, y2 = np.minimum(y1, y2), np.maximum(y1, y2) + 1
+    return sums[y2, x2] - sums[y1, x2] - sums[y2, x1] + sums[y1, x1]
+
+
+def clear_lines(walls: np.ndarray, sums: np.ndarray, x: int, y: int, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    For each cell (xs[i], ys[i]), whether nothing in `walls` blocks the line
+    from (x, y) to it: the same Bresenham line and rules as RayTable.clear,
+    for many cells at once and at any distance.  `sums` is _wall_sums(walls).
+    """
+    # Along its major axis the line takes one cell per step; on the minor axis
+    # step k is -((half - k * minor) // major) over, which rises from 0 to
+    # `minor`.  The steps still on the start's row (or column) and those
+    # already on the end's are each one straight run, counted exactly off the
+    # table; the steps between lie in a box that is checked whole.  A wall in
+    # either run blocks the line, and no wall in any of the three clears it,
+    # so only lines with a wall somewhere in the box are walked cell by cell.
+    dx, dy = xs - x, ys - y
+    shallow = np.abs(dx) > np.abs(dy)
+    major = np.where(shallow, np.abs(dx), np.abs(dy))
+    minor = np.where(shallow, np.abs(dy), np.abs(dx))
+    step = np.where(shallow, np.sign(dx), np.sign(dy))
+    side = np.where(shallow, np.sign(dy), np.sign(dx))
+    half = major // 2
+    rise = np.maximum(minor, 1)
+    first = np.where(minor > 0, np.minimum(major - 1, half // rise), major - 1)  # last step on the start's row
+    last = np.where(minor > 0, np.minimum(major, (half - major + minor * major) // rise + 1), major)  # first on the end's
+
+    def box(lo, hi, off1, off2):
+        # walls at major steps lo..hi and minor offsets off1..off2 (relative to the start)
+        empty = lo > hi
+        lo, hi = np.where(empty, 0, lo), np.where(empty, 0, hi)
+        a1, a2, b1, b2 = step * lo, step * hi, side * off1, side * off2
+        x1, x2 = x + np.where(shallow, a1, b1), x + np.where(shallow, a2, b2)
+        y1, y2 = y + np.where(shallow, b1, a1), y + np.where(shallow, b2, a2)
+        return np.where(empty, 0, _walls_in(sums, x1, y1, x2, y2))
+
+    blocked = (box(1, first, 0, 0) > 0) | ((minor > 0) & (box(last, major - 1, minor, minor) > 0))
+    unsure = ~blocked & (minor > 1) & (box(first + 1, last - 1, 1, minor - 1) > 0)
+    clear = ~blocked
+    if unsure.any():
+        # the rest cell by cell, all their steps in one go
+        idx = np.flatnonzero(unsure)
+        lengths = major[idx] - 1
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        owner = np.repeat(idx, lengths)
+        k = np.arange(len(owner)) - starts + 1
+        off = -((half[owner] - k * minor[owner]) // major[owner])
+        along, across = step[owner] * k, side[owner] * off
+        cx = np.where(shallow[owner], x + along, x + across)
+        cy = np.where(shallow[owner], y + across, y + along)
+        hit = np.zeros(len(clear), dtype=bool)
+        hit[owner[walls[cy, cx]]] = True
+        clear &= ~hit
+    return clear
+
+
+class Light(NamedTuple):
+    """
+    A torch or glowing item lights a disc of `radius` cells it has line of
+    sight to.  A lit room (`rect` = x1, y1, x2, y2, walls included) lights
+    all of itself.
+    """
+    key: Hashable
+    x: int
+    y: int
+    radius: int = 0
+    rect: Optional[Tuple[int, int, int, int]] = None
+
+
+def light_map(walls: np.ndarray, light: Light, wall_cells: Optional[List[bool]] = None) -> np.ndarray:
+    """
+    The (height, width) bool mask of cells `light` lights.  A source lights
+    the cells it has line of sight to, along the same rays as the player's
+    view (see rays.py): walls block the cells behind them but are lit
+    themselves.
+    """
+    height, width = walls.shape
+    lit = np.zeros((height, width), dtype=bool)
+    if light.rect is not None:
+        x1, y1, x2, y2 = light.rect
+        lit[max(0, y1):min(height, y2 + 1), max(0, x1):min(width, x2 + 1)] = True
+        return lit
+    cells = wall_cells if wall_cells is not None else walls.ravel().tolist()
+    lit.ravel()[ray_table(width).visible(cells, height, light.x, light.y, light.radius)] = True
+    return lit
+
+
+class LightMaps:
+    """
+    Light maps by source key.  update() recomputes only sources that are new
+    or changed since the last call; set_walls() drops everything.
+    """
+
+    def __init__(self):
+        self.walls: Optional[np.ndarray] = None
+        self._wall_cells: Optional[List[bool]] = None
+        self._wall_sums: Optional[np.ndarray] = None
+        self._seen: Optional[np.ndarray] = None
+        self._known: Optional[np.ndarray] = None
+        self._maps: Dict[Hashable, Tuple[Light, np.ndarray]] = {}
+        self.shown: List[Light] = []  # the sources the last seen_from() used
+        self.computed = 0  # light maps built so far, for benchmarks
+
+    def set_walls(self, walls: np.ndarray) -> None:
+        self.walls = walls
+        self._wall_cells = walls.ravel().tolist()
+        self._wall_sums = _wall_sums(walls)
+        self._seen = np.zeros_like(walls)
+        self._known = np.zeros_like(walls)
+        self._maps.clear()
+
+    def update(self, lights: Iterable[Light]) -> None:
+        maps = {}
+        for light in lights:
+            cached = self._maps.get(light.key)
+            if cached is None or cached[0] != light:
+                cached = (light, light_map(self.walls, light, self._wall_cells))
+                self.computed += 1
+            maps[light.key] = cached
+        self._maps = maps
+
+    def seen_from(self, x: int, y: int, sight: np.ndarray) -> np.ndarray:
+        """
+        Cells the viewer at (x, y) sees by light: those lit by a source whose
+        light reaches the viewer, or that the viewer can see in `sight`, and
+        that are in `sight` already or have a clear line from the viewer.
+        The returned array is reused by the next call.
+        """
+        seen = self._seen
+        seen.fill(False)
+        # from inside a room with no walls in it, a line to any other cell
+        # inside stays inside, so those cells need no checking
+        known = self._known
+        known[...] = sight
+        self.shown.clear()
+        for light, lit in self._maps.values():
+            if lit[y, x] or (light.rect is None and sight[light.y, light.x]):
+                seen |= lit
+                self.shown.append(light)
+                if light.rect is not None:
+                    # the cells inside its walls; lines to the walls themselves can still graze one
+                    x1, y1, x2, y2 = light.rect
+                    x1, y1 = max(0, x1), max(0, y1)
+                    if x1 < x < x2 and y1 < y < y2 and not _walls_in(self._wall_sums, x1 + 1, y1 + 1, x2 - 1, y2 - 1):
+                        known[y1 + 1:y2, x1 + 1:x2] = True
+        if self.shown:
+            # lit cells beyond the view disc: keep those the viewer has a line to
+            ys, xs = np.nonzero(seen & ~known)
+            if not len(xs):
+                return seen
+            rays = ray_table(seen.shape[1])
+            if len(xs) <= WALK_CELLS and max(np.abs(xs - x).max(), np.abs(ys - y).max()) <= rays.radius:
+                # a few cells, all with their rays in the table: walking them is cheaper
+                width = seen.shape[1]
+                origin = y * width + x
+                walls = self._wall_cells
+                blocked = [not rays.clear(walls, origin, cx - x, cy - y) for cx, cy in zip(xs.tolist(), ys.tolist())]
+            else:
+                blocked = ~clear_lines(self.walls, self._wall_sums, x, y, xs, ys)
+            seen[ys[blocked], xs[blocked]] = False
+        return seen
+
+    def lit(self) -> np.ndarray:
+        """
+        Every lit cell on the floor.
+        """
+        total = np.zeros_like(self.walls)
+        for _, lit in self._maps.values():
+            total |= lit
+        return total
+
+
+if __name__ == "__main__":
+    # per-turn cost on a big floor full of lights, with the player walking
+    # around; then in one lit room bigger than the view, the whole floor
+    from cavegen import generate_cave
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = np.random.default_rng(1)
+    floor = generate_cave(size, size, rng)
+    cells = np.argwhere(floor)
+    picks = cells[rng.choice(len(cells), count, replace=False)]
+    lights = [Light(("torch", i), int(x), int(y), 6) for i, (y, x) in enumerate(picks)]
+    room = np.ones((size, size), dtype=bool)
+    room[1:-1, 1:-1] = False
+    room[size // 2, 0] = False  # a doorway
+    room_light = [Light("room", size // 2, size // 2, rect=(0, 0, size - 1, size - 1))]
+    inside = np.argwhere(~room[1:-1, 1:-1]) + 1
+    for name, walls, lit_by, spots in (("cave", ~floor, lights, cells), ("lit room", room, room_light, inside)):
+        maps = LightMaps()
+        maps.set_walls(walls)
+        start = time.perf_counter()
+        maps.update(lit_by)
+        built = time.perf_counter() - start
+        sight = np.zeros_like(walls)
+        walk = spots[rng.choice(len(spots), 500)]
+        shown = 0
+        start = time.perf_counter()
+        for y, x in walk:
+            sight[:] = False
+            sight[max(0, y - 10):y + 10, max(0, x - 10):x + 10] = True
+            maps.update(lit_by)
+            shown += int(maps.seen_from(int(x), int(y), sight).sum())
+        per_turn = (time.perf_counter() - start) / len(walk)
+        print(f"{size}x{size} {name}, {len(lit_by)} lights: {maps.computed} light maps built "
+              f"({built * 1000:.0f} ms), then {per_turn * 1000:.3f} ms per turn over {len(walk)} moves, "
+              f"{shown // len(walk)} cells seen")
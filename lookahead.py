@@ -0,0 +1,85 @@
+import argparse
+import random
+import time
+from typing import Tuple
+
+from headless import HeadlessGame
+
+# A Monte Carlo lookahead player for difficulty testing.  Before each move it
+# snapshots the game, tries every step followed by random play a few turns
+# deep, restoring the snapshot between tries, and takes the step whose
+# futures scored best.  How deep and how often it survives says how hard a
+# floor is.
+
+STEPS = [(0, -1), (0, 1), (-1, 0), (1, 0), (0, 0)]
+KEYS = {(0, -1): ord('w'), (0, 1): ord('s'), (-1, 0): ord('a'), (1, 0): ord('d'), (0, 0): ord('g')}
+
+
+def score(game: HeadlessGame) -> float:
+    if game.player.hp <= 0:
+        return -100.0
+    # deeper is better, then health, fewer enemies and being nearer the stairs
+    to_stairs = abs(game.stairs.x - game.player.x) + abs(game.stairs.y - game.player.y)
+    return 50 * game.level + game.player.hp - 2 * len(game.enemies) - 0.5 * to_stairs
+
+
+def choose(game: HeadlessGame, rng: random.Random, rollouts: int = 8, depth: int = 6) -> Tuple[Tuple[int, int], int]:
+    """
+    Return the best step and how many futures were played to find it.
+    Rollouts skip recompute_fov, so enemies judge sight by the current
+    turn's field of view; that is close enough a few turns ahead.  They
+    are not logged either: only the turns actually played are events.
+    """
+    root = game.snapshot()
+    game.events.enabled = False
+    best, best_value = STEPS[-1], float("-inf")
+    for step in STEPS:
+        total = 0.0
+        for _ in range(rollouts):
+            game.restore(root)
+            game.rng.seed(rng.getrandbits(32))  # sample the enemies' luck too
+            game.take_turn(step)
+            for _ in range(depth - 1):
+                if game.over is not None:
+                    break
+                game.take_turn(rng.choice(STEPS))
+            total += score(game)
+        if total > best_value:
+            best, best_value = step, total
+    game.restore(root)
+    game.events.enabled = True
+    return best, len(STEPS) * rollouts
+
+
+def play(seed: int, turns: int, rollouts: int, depth: int) -> dict:
+    game = HeadlessGame(seed=seed)
+    rng = random.Random(seed)
+    futures = 0
+    start = time.perf_counter()
+    for _ in range(turns):
+        step, tried = choose(game, rng, rollouts, depth)
+        futures += tried
+        game.press(KEYS[step])
+        if game.over is not None:
+            break
+    return {"turns": game.turns, "level": game.level, "hp": game.player.hp, "died": game.over is not None,
+            "futures": futures, "seconds": time.perf_counter() - start}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play seeded games with a lookahead bot and report how far it gets.")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=200, help="turn limit per game")
+    parser.add_argument("--rollouts", type=int, default=8, help="random futures per candidate step")
+    parser.add_argument("--depth", type=int, default=6, help="turns per future")
+    args = parser.parse_args()
+
+    print(f"{'seed':>4} {'turns':>6} {'floor':>6} {'hp':>4} {'died':>5} {'futures/s':>10}")
+    futures = seconds = 0.0
+    for seed in range(1, args.games + 1):
+        result = play(seed, args.turns, args.rollouts, args.depth)
+        futures += result["futures"]
+        seconds += result["seconds"]
+        print(f"{seed:>4} {result['turns']:>6} {result['level']:>6} {result['hp']:>4} "
+              f"{'yes' if result['died'] else 'no':>5} {result['futures'] / result['seconds']:>10.0f}")
+    print(f"{futures / seconds:.0f} futures/s overall ({args.depth} turns each)")
@@ -1,15 +1,18 @@
 import tcod 
 
 from actions import EscapeAction, MovementAction
+from content import load_content
 from input_handlers import EventHandler
+from tileset_cache import load_tilesheet
 
 health = 10
 strength = 6
 dexterity = 6
 intelligence = 6
 
-professions = ["fighter", "ranger", "wizard"]
-races = ["human", "orc", "elf", "gnome"]
+content = load_content()
+professions = list(content.professions)
+races = list(content.races)
 
 def main() -> None:
     screen_width = 80
@@ -20,7 +23,7 @@ def main() -> None:
 
 
 
-    tileset = tcod.tileset.load_tilesheet(
+    tileset = load_tilesheet(
         "dejavu10x10_gs_tc.png", 32, 8, tcod.tileset.CHARMAP_TCOD
     )
 
@@ -42,44 +45,31 @@ def main() -> None:
             root_console.clear()
 
             for event in tcod.event.wait():
-                action = event_handler.dispatch(event)
-            if action is None:
-                continue
-            if isinstance(action, MovementAction):
-                player_x += action.dx
-                player_y += action.dy
-            elif isinstance(action, EscapeAction):
-                raise SystemExit()
+                event_handler.dispatch(event)
+
+            # Apply every key from this batch, not just the last one.
+            while event_handler.actions:
+                action = event_handler.actions.popleft()
+                if isinstance(action, MovementAction):
+                    player_x += action.dx
+                    player_y += action.dy
+                elif isinstance(action, EscapeAction):
+                    raise SystemExit()
 
     global health, strength, dexterity, intelligence
     
-    profession = professions[int(input("Choose class: 0=fighter, 1=ranger, 2=wizard: "))]
-    if profession == "fighter":
-        print("You are a strong fighter, ready for battle!")
-    elif profession == "ranger":
-        print("You are a nimble ranger, master of the wilds!")
-    elif profession == "wizard":
-        print("You are a wise wizard, wielder of arcane power!")
-    else:
-        profession = "fighter"
-        print("Invalid choice. Defaulting to fighter.")
-
-    race = races[int(input("Choose race: 0=human, 1=orc, 2=elf, 3=gnome: "))]
-    if race == "human":
-        pass  # no stat changes
-    elif race == "orc":
-        strength += 2
-        dexterity -= 1
-        intelligence -= 1
-    elif race == "elf":
-        strength -= 2
-        dexterity += 1
-        intelligence += 1
-    elif race == "gnome":
-        strength -= 1
-        intelligence += 2
-        health -= 1
-        
+    profession_menu = ", ".join(f"{i}={name}" for i, name in enumerate(professions))
+    profession = professions[int(input(f"Choose class: {profession_menu}: "))]
+    print(content.professions[profession].intro)
+
+    race_menu = ", ".join(f"{i}={name}" for i, name in enumerate(races))
+    race = races[int(input(f"Choose race: {race_menu}: "))]
+    modifiers = content.races[race].modifiers
+    health += modifiers.get("health", 0)
+    strength += modifiers.get("strength", 0)
+    dexterity += modifiers.get("dexterity", 0)
+    intelligence += modifiers.get("intelligence", 0)
+
     print("\n--- Character Created ---")
     print(f"Profession: {profession}")
     print(f"Race: {race}")
@@ -0,0 +1,134 @@
+import sys
+import time
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from composer import Layer
+
+# A block-reduced overview of the explored floor.  Each `block` x `block`
+# square of map cells becomes one minimap cell: floor if any floor cell in
+# it has been explored, otherwise wall if any wall has, otherwise unknown.
+# Exploring only ever changes cells near the player or in a light the player
+# sees, so update() is given those boxes and re-reduces just the blocks they
+# cover; the whole map is reduced again only after set_terrain() or
+# invalidate().  Markers (player, stairs, enemies) are stamped on a copy of
+# the terrain when rendering.
+
+# (x1, y1, x2, y2) in map cells, inclusive
+Box = Tuple[int, int, int, int]
+
+
+class Minimap:
+    def __init__(self, block: int, floor: Tuple[str, int], wall: Tuple[str, int], unknown: Tuple[str, int]):
+        self.block = block
+        self.floor = (ord(floor[0]), floor[1])
+        self.wall = (ord(wall[0]), wall[1])
+        self.unknown = (ord(unknown[0]), unknown[1])
+        self.walkable: Optional[np.ndarray] = None
+        self.stale = True
+
+    def set_terrain(self, walkable: np.ndarray) -> None:
+        height, width = walkable.shape
+        b = self.block
+        self.shape = (-(-height // b), -(-width // b))
+        self.walkable = walkable
+        self.glyphs = np.full(self.shape, self.unknown[0], dtype=np.uint32)
+        self.pairs = np.full(self.shape, self.unknown[1], dtype=np.uint8)
+        self.stale = True
+
+    def invalidate(self) -> None:
+        """
+        The explored mask changed wholesale (a restored snapshot): reduce everything next update.
+        """
+        self.stale = True
+
+    def update(self, explored: np.ndarray, boxes: Iterable[Box] = ()) -> None:
+        """
+        Re-reduce the blocks covering `boxes`, the regions where cells may
+        have been explored since the last update.
+        """
+        if self.stale:
+            self.stale = False
+            self._reduce(explored, 0, 0, self.shape[0], self.shape[1])
+            return
+        b = self.block
+        for x1, y1, x2, y2 in boxes:
+            self._reduce(explored, max(0, y1) // b, max(0, x1) // b,
+                         min(self.shape[0], y2 // b + 1), min(self.shape[1], x2 // b + 1))
+
+    def _reduce(self, explored: np.ndarray, by1: int, bx1: int, by2: int, bx2: int) -> None:
+        if by1 >= by2 or bx1 >= bx2:
+            return
+        b = self.block
+        ys, xs = slice(by1 * b, by2 * b), slice(bx1 * b, bx2 * b)
+        known = explored[ys, xs]
+        walkable = self.walkable[ys, xs]
+        if known.shape != ((by2 - by1) * b, (bx2 - bx1) * b):
+            # a partial block at the bottom or right edge: pad with unexplored
+            padded = np.zeros(((by2 - by1) * b, (bx2 - bx1) * b), dtype=bool)
+            padded[:known.shape[0], :known.shape[1]] = known
+            known = padded
+            padded = np.zeros_like(known)
+            padded[:walkable.shape[0], :walkable.shape[1]] = walkable
+            walkable = padded
+        seen_floor = (known & walkable).reshape(by2 - by1, b, bx2 - bx1, b).any(axis=(1, 3))
+        seen_any = known.reshape(by2 - by1, b, bx2 - bx1, b).any(axis=(1, 3))
+        glyphs = self.glyphs[by1:by2, bx1:bx2]
+        pairs = self.pairs[by1:by2, bx1:bx2]
+        glyphs[...] = np.where(seen_floor, self.floor[0], np.where(seen_any, self.wall[0], self.unknown[0]))
+        pairs[...] = np.where(seen_floor, self.floor[1], np.where(seen_any, self.wall[1], self.unknown[1]))
+
+    def render(self, marks: Sequence[Tuple[Layer, Optional[np.ndarray]]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (glyphs, pairs) like FrameComposer.compose.  Each mark is a
+        layer and an optional mask; things are shown only where the mask is
+        set (e.g. enemies in view, stairs explored), later marks on top.
+        """
+        glyphs = self.glyphs.copy()
+        pairs = self.pairs.copy()
+        for (xs, ys, layer_glyphs, layer_pairs), mask in marks:
+            if not len(xs):
+                continue
+            if mask is not None:
+                shown = mask[ys, xs]
+                xs, ys, layer_glyphs, layer_pairs = xs[shown], ys[shown], layer_glyphs[shown], layer_pairs[shown]
+            glyphs[ys // self.block, xs // self.block] = layer_glyphs
+            pairs[ys // self.block, xs // self.block] = layer_pairs
+        return glyphs.view("<U1"), pairs
+
+
+if __name__ == "__main__":
+    # per-turn cost of a minimap over a big cave, walking with a 10-cell view
+    from cavegen import generate_cave
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    block = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rng = np.random.default_rng(1)
+    floor = generate_cave(size, size, rng)
+    explored = np.zeros_like(floor)
+    minimap = Minimap(block, (".", 3), ("#", 9), (" ", 9))
+    minimap.set_terrain(floor)
+    minimap.update(explored)
+    cells = np.argwhere(floor)
+    walk = cells[rng.choice(len(cells), 1000)]
+    enemy_ys, enemy_xs = cells[rng.choice(len(cells), 10000)].T
+    enemies = (enemy_xs, enemy_ys, np.full(len(enemy_xs), ord("g"), np.uint32), np.full(len(enemy_xs), 4, np.uint8))
+    r = 10
+    updated = rendered = 0.0
+    for y, x in walk.tolist():
+        explored[max(0, y - r):y + r + 1, max(0, x - r):x + r + 1] = True
+        player = (np.array([x]), np.array([y]), np.array([ord("@")], np.uint32), np.array([1], np.uint8))
+        start = time.perf_counter()
+        minimap.update(explored, [(x - r, y - r, x + r, y + r)])
+        updated += time.perf_counter() - start
+        start = time.perf_counter()
+        minimap.render([(enemies, explored), (player, None)])
+        rendered += time.perf_counter() - start
+    full = time.perf_counter()
+    minimap.invalidate()
+    minimap.update(explored)
+    full = time.perf_counter() - full
+    print(f"{size}x{size} cave, {block}x{block} blocks -> {minimap.shape[1]}x{minimap.shape[0]} minimap: "
+          f"update {updated / len(walk) * 1e6:.0f} us, render with 10000 enemies {rendered / len(walk) * 1e6:.0f} us "
+          f"per turn (full rebuild {full * 1000:.1f} ms)")
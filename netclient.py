@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import curses
+import json
+import random
+import socket
+import statistics
+import time
+from typing import List, Tuple
+
+from better_game import MAP_H, MAP_W, init_colors
+
+# Thin client for server.py.  It only paints the diffs it is sent; every
+# game rule runs on the server.  With --bots it becomes a load generator
+# instead: N scripted players that walk at random and time each turn.
+
+ARROWS = {curses.KEY_UP: ord('w'), curses.KEY_DOWN: ord('s'), curses.KEY_LEFT: ord('a'), curses.KEY_RIGHT: ord('d')}
+BOT_KEYS = b"wasdwasdg"
+
+
+async def connect(args: argparse.Namespace) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+def play(stdscr, args: argparse.Namespace) -> str:
+    """
+    Interactive client: keys go straight to the server, frames are painted as they arrive.
+    """
+    curses.curs_set(0)
+    stdscr.keypad(True)
+    stdscr.timeout(20)
+    init_colors()
+    if args.unix:
+        sock = socket.socket(socket.AF_UNIX)
+        sock.connect(args.unix)
+    else:
+        sock = socket.create_connection((args.host, args.port))
+    sock.setblocking(False)
+    pending = b""
+    try:
+        while True:
+            key = stdscr.getch()
+            if key != -1:
+                key = ARROWS.get(key, key)
+                if 0 <= key < 256:
+                    sock.sendall(bytes([key]))
+            try:
+                data = sock.recv(65536)
+            except BlockingIOError:
+                continue
+            if not data:
+                return "Disconnected."
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                message = json.loads(line)
+                for y, x, text, pair in message["runs"]:
+                    if y >= MAP_H + 5 or x >= MAP_W:
+                        continue
+                    try:
+                        stdscr.addstr(y, x, text, curses.color_pair(pair))
+                    except curses.error:
+                        pass  # writing the bottom-right cell raises but still draws
+                stdscr.refresh()
+                if "over" in message:
+                    return message["over"]
+    finally:
+        sock.close()
+
+
+async def bot(args: argparse.Namespace, rng: random.Random, until: float, latencies: List[float]) -> int:
+    """
+    Scripted player: send a key, wait for its frame, repeat.  Returns the turns played.
+    """
+    reader, writer = await connect(args)
+    turns = 0
+    try:
+        await reader.readline()  # the full first frame
+        while time.perf_counter() < until:
+            sent = time.perf_counter()
+            writer.write(bytes([rng.choice(BOT_KEYS)]))
+            line = await reader.readline()
+            if not line:
+                break
+            latencies.append(time.perf_counter() - sent)
+            turns += 1
+            if b'"over"' in line:
+                break
+    finally:
+        writer.close()
+    return turns
+
+
+async def swarm(args: argparse.Namespace) -> None:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    until = start + args.seconds
+    bots = [bot(args, random.Random(i), until, latencies) for i in range(args.bots)]
+    results = await asyncio.gather(*bots, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    turns = sum(r for r in results if isinstance(r, int))
+    failed = [r for r in results if not isinstance(r, int)]
+    print(f"{args.bots} bots, {elapsed:.1f} s: {turns} turns ({turns / elapsed:.0f}/s), {len(failed)} failed")
+    if latencies:
+        latencies.sort()
+        ms = [t * 1000 for t in latencies]
+        print(f"key -> frame latency ms: median {statistics.median(ms):.2f}  "
+              f"p95 {ms[int(len(ms) * 0.95)]:.2f}  max {ms[-1]:.2f}")
+    if failed:
+        print(f"first failure: {failed[0]!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connect to server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--bots", type=int, default=0, metavar="N", help="run N scripted players instead")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long the bots play")
+    args = parser.parse_args()
+    if args.bots:
+        asyncio.run(swarm(args))
+    else:
+        print(curses.wrapper(play, args))
@@ -0,0 +1,230 @@
+import sys
+import time
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+# Precomputed Bresenham rays.  The cells a line of sight crosses depend only
+# on the offset from its start to its end, so for every offset up to `radius`
+# each way the table keeps the cells strictly between the two ends, as
+# offsets into the map flattened row by row (y * width + x).  Checking a line
+# is then a walk over a tuple that stops at the first wall: no slopes, error
+# terms or bounds to work out per call.  The same rays serve sight (the
+# player's view, enemies spotting the player, light maps) and shots, which
+# also stop at the first thing standing in the way.
+#
+# Walls block what is behind them but are seen themselves, and the start and
+# end cells never block -- the rules Game.line_of_sight always had.
+
+RAY_RADIUS = 16  # offsets up to this far each way are built up front
+
+Ray = Tuple[int, ...]
+
+
+def line_cells(dx: int, dy: int) -> List[Tuple[int, int]]:
+    """
+    The (x, y) offsets strictly between (0, 0) and (dx, dy) on the
+    Bresenham line, in order from the start.
+    """
+    adx, ady = abs(dx), abs(dy)
+    sx = 1 if dx > 0 else -1
+    sy = 1 if dy > 0 else -1
+    x = y = 0
+    cells = []
+    if adx > ady:
+        err = adx // 2
+        while x != dx:
+            if (x, y) != (0, 0):
+                cells.append((x, y))
+            err -= ady
+            if err < 0:
+                y += sy
+                err += adx
+            x += sx
+    else:
+        err = ady // 2
+        while y != dy:
+            if (x, y) != (0, 0):
+                cells.append((x, y))
+            err -= adx
+            if err < 0:
+                x += sx
+                err += ady
+            y += sy
+    return cells
+
+
+class RayTable:
+    def __init__(self, radius: int, width: int):
+        self.radius = radius
+        self.width = width
+        self.rays: Dict[Tuple[int, int], Ray] = {}
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                self.rays[dx, dy] = self._flatten(dx, dy)
+        self._disks: Dict[int, List[Tuple[int, int, int, Ray]]] = {}
+
+    def _flatten(self, dx: int, dy: int) -> Ray:
+        return tuple(y * self.width + x for x, y in line_cells(dx, dy))
+
+    def ray(self, dx: int, dy: int) -> Ray:
+        """
+        Flat offsets of the cells between (0, 0) and (dx, dy).  Offsets past
+        the radius are worked out on first use and kept.
+        """
+        ray = self.rays.get((dx, dy))
+        if ray is None:
+            ray = self.rays[dx, dy] = self._flatten(dx, dy)
+        return ray
+
+    def disk(self, r: int) -> List[Tuple[int, int, int, Ray]]:
+        """
+        (dx, dy, flat offset, ray) for every cell within `r` of the centre.
+        """
+        disk = self._disks.get(r)
+        if disk is None:
+            disk = self._disks[r] = [(dx, dy, dy * self.width + dx, self.ray(dx, dy))
+                                     for dy in range(-r, r + 1) for dx in range(-r, r + 1)
+                                     if dx * dx + dy * dy <= r * r]
+        return disk
+
+    def clear(self, walls: Sequence[bool], origin: int, dx: int, dy: int) -> bool:
+        """
+        Whether nothing in `walls` (a flat per-cell sequence) blocks the line
+        from flat cell `origin` to the cell (dx, dy) away.
+        """
+        for d in self.ray(dx, dy):
+            if walls[origin + d]:
+                return False
+        return True
+
+    def trace(self, walls: Sequence[bool], stops, origin: int, dx: int, dy: int) -> Tuple[int, bool]:
+        """
+        Follow a shot from `origin` to the cell (dx, dy) away.  Returns the
+        flat cell it stops in and whether that is a wall: the first wall or
+        cell in `stops` on the way, otherwise the target cell.
+        """
+        for d in self.ray(dx, dy):
+            cell = origin + d
+            if walls[cell]:
+                return cell, True
+            if cell in stops:
+                return cell, False
+        return origin + dy * self.width + dx, False
+
+    def visible(self, walls: Sequence[bool], height: int, x: int, y: int, r: int) -> List[int]:
+        """
+        Flat cells within `r` of (x, y) with a clear line from it.
+        """
+        width = self.width
+        origin = y * width + x
+        seen = []
+        if r <= x < width - r and r <= y < height - r:
+            # the whole disk is on the map: no bounds to check
+            for dx, dy, offset, ray in self.disk(r):
+                for d in ray:
+                    if walls[origin + d]:
+                        break
+                else:
+                    seen.append(origin + offset)
+            return seen
+        for dx, dy, offset, ray in self.disk(r):
+            if not (0 <= x + dx < width and 0 <= y + dy < height):
+                continue
+            for d in ray:
+                if walls[origin + d]:
+                    break
+            else:
+                seen.append(origin + offset)
+        return seen
+
+
+@lru_cache(maxsize=None)
+def ray_table(width: int, radius: int = RAY_RADIUS) -> RayTable:
+    """
+    The shared table for maps `width` cells wide.
+    """
+    return RayTable(radius, width)
+
+
+def _old_line_of_sight(grid: List[List[str]], x1: int, y1: int, x2: int, y2: int) -> bool:
+    # Game.line_of_sight before the tables, for the benchmark
+    dx = abs(x2-x1)
+    dy = abs(y2-y1)
+    x = x1
+    y = y1
+    sx = 1 if x2>x1 else -1
+    sy = 1 if y2>y1 else -1
+    if dx>dy:
+        err = dx//2
+        while x != x2:
+            if grid[y][x] == '#' and (x,y) != (x1,y1) and (x,y) != (x2,y2):
+                return False
+            err -= dy
+            if err < 0:
+                y += sy
+                err += dx
+            x += sx
+    else:
+        err = dy//2
+        while y != y2:
+            if grid[y][x] == '#' and (x,y) != (x1,y1) and (x,y) != (x2,y2):
+                return False
+            err -= dx
+            if err < 0:
+                x += sx
+                err += dy
+            y += sy
+    return True
+
+
+if __name__ == "__main__":
+    # the old per-call Bresenham against table walks, on the game's map size
+    import numpy as np
+
+    from cavegen import generate_cave
+
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    r = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    rng = np.random.default_rng(1)
+    floor = generate_cave(width, height, rng)
+    grid = np.where(floor, ".", "#").tolist()
+    walls = (~floor).ravel().tolist()
+    start = time.perf_counter()
+    table = RayTable(RAY_RADIUS, width)
+    built = time.perf_counter() - start
+    cells = np.argwhere(floor)
+    # pairs of floor cells up to r apart each way
+    pairs = []
+    while len(pairs) < 20000:
+        y1, x1 = cells[rng.integers(len(cells))].tolist()
+        x2, y2 = x1 + int(rng.integers(-r, r + 1)), y1 + int(rng.integers(-r, r + 1))
+        if 0 <= x2 < width and 0 <= y2 < height and floor[y2, x2]:
+            pairs.append((x1, y1, x2, y2))
+    start = time.perf_counter()
+    old = [_old_line_of_sight(grid, *p) for p in pairs]
+    old_los = (time.perf_counter() - start) / len(pairs)
+    start = time.perf_counter()
+    new = [table.clear(walls, y1 * width + x1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in pairs]
+    new_los = (time.perf_counter() - start) / len(pairs)
+    assert old == new, "tables disagree with the old line of sight"
+    spots = cells[rng.integers(len(cells), size=300)].tolist()
+    start = time.perf_counter()
+    old_fov = []
+    for y, x in spots:
+        seen = set()
+        for dy in range(-r, r + 1):
+            for dx in range(-r, r + 1):
+                if 0 <= x + dx < width and 0 <= y + dy < height and dx * dx + dy * dy <= r * r:
+                    if _old_line_of_sight(grid, x, y, x + dx, y + dy):
+                        seen.add((y + dy) * width + x + dx)
+        old_fov.append(seen)
+    old_view = (time.perf_counter() - start) / len(spots)
+    start = time.perf_counter()
+    new_fov = [set(table.visible(walls, height, x, y, r)) for y, x in spots]
+    new_view = (time.perf_counter() - start) / len(spots)
+    assert old_fov == new_fov, "tables disagree with the old field of view"
+    print(f"{width}x{height} cave, table radius {RAY_RADIUS} built in {built * 1000:.1f} ms "
+          f"({sum(map(len, table.rays.values()))} cells in {len(table.rays)} rays)")
+    print(f"  line of sight:   old {old_los * 1e6:6.2f} us  table {new_los * 1e6:6.2f} us")
+    print(f"  radius {r} view:  old {old_view * 1e6:6.0f} us  table {new_view * 1e6:6.0f} us")
@@ -0,0 +1,136 @@
+import argparse
+import random
+import time
+from collections import deque
+from typing import Callable, Optional
+
+# The clock behind real-time mode (better_game.py --realtime).  The
+# simulation ticks at a fixed rate whatever the frame rate or the player is
+# doing: each tick has a deadline, `period` after the previous one, and
+# due() says how many deadlines have passed.  When the game falls behind --
+# a slow frame, a popup held open -- it runs at most `max_catchup` ticks in a
+# row and skips the rest, so it never spirals trying to catch up.  Ticks that
+# ran after the following deadline count as missed.  The jitter percentiles
+# cover only the last `JITTER_TICKS` ticks, so a long session doesn't keep
+# every tick's lateness; the worst one is tracked over the whole run.
+
+TICK_RATE = 3  # simulation ticks per second
+MAX_FPS = 30  # frames drawn per second at most
+MAX_CATCHUP = 4  # ticks run back to back when behind; older ones are skipped
+JITTER_TICKS = 4096  # recent ticks the jitter percentiles in report() cover
+
+
+class TickClock:
+    def __init__(self, rate: float = TICK_RATE, max_catchup: int = MAX_CATCHUP,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.period = 1.0 / rate
+        self.max_catchup = max_catchup
+        self.clock = clock
+        self.deadline = clock() + self.period
+        self.ticks = 0
+        self.missed = 0  # ran after the next tick was already due
+        self.skipped = 0  # dropped by the catch-up limit
+        self.lateness: deque = deque(maxlen=JITTER_TICKS)  # seconds recent ticks ran after their deadline
+        self.worst = 0.0  # latest any tick has run
+
+    def due(self) -> int:
+        """
+        Ticks to run now.  Counts them as run, so call it once per pass.
+        """
+        now = self.clock()
+        if now < self.deadline:
+            return 0
+        behind = int((now - self.deadline) / self.period) + 1
+        run = min(behind, self.max_catchup)
+        for i in range(run):
+            late = now - (self.deadline + i * self.period)
+            self.lateness.append(late)
+            self.worst = max(self.worst, late)
+            if late >= self.period:
+                self.missed += 1
+        self.ticks += run
+        self.skipped += behind - run
+        self.deadline += behind * self.period
+        return run
+
+    def wait(self) -> float:
+        """
+        Seconds until the next tick is due.
+        """
+        return max(0.0, self.deadline - self.clock())
+
+    def report(self) -> str:
+        if not self.lateness:
+            return "no ticks yet"
+        late = sorted(self.lateness)
+        pick = lambda q: late[min(len(late) - 1, int(q * len(late)))] * 1000
+        return (f"{self.ticks} ticks at {1 / self.period:g}/s, jitter p50 {pick(0.5):.2f} ms "
+                f"p99 {pick(0.99):.2f} ms max {self.worst * 1000:.2f} ms, "
+                f"{self.missed} missed, {self.skipped} skipped")
+
+
+class BotScreen:
+    """
+    Stands in for the terminal in the benchmark: getch() waits out the
+    timeout the loop asked for, and now and then returns a movement key.
+    """
+
+    KEYS = [ord(c) for c in "wasd"]
+
+    def __init__(self, keys_per_second: float, rng: random.Random):
+        self.rng = rng
+        self.key_gap = 1.0 / keys_per_second
+        self.next_key = time.perf_counter() + self.key_gap
+        self.delay: Optional[float] = None
+
+    def timeout(self, ms: int) -> None:
+        self.delay = None if ms < 0 else ms / 1000
+
+    def nodelay(self, flag: bool) -> None:
+        self.delay = 0.0 if flag else None
+
+    def getch(self) -> int:
+        now = time.perf_counter()
+        wake = self.next_key if self.delay is None else min(self.next_key, now + self.delay)
+        if wake > now:
+            time.sleep(wake - now)
+        if time.perf_counter() >= self.next_key:
+            self.next_key += self.key_gap
+            return self.rng.choice(self.KEYS)
+        return -1
+
+
+if __name__ == "__main__":
+    # hold a tick rate on a floor crowded with enemies while frames are built
+    import numpy as np
+
+    from headless import HeadlessGame
+
+    parser = argparse.ArgumentParser(description="Run the real-time loop headless and report how well it keeps time.")
+    parser.add_argument("--rate", type=float, default=30, help="ticks per second")
+    parser.add_argument("--fps", type=float, default=MAX_FPS)
+    parser.add_argument("--enemies", type=int, default=300, help="enemies to add to the floor")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    class BenchGame(HeadlessGame):
+        frames = 0
+
+        def draw(self):
+            self.frame()
+            self.frames += 1
+
+    game = BenchGame(seed=1)
+    game.stdscr = BotScreen(10, random.Random(1))
+    game.player.hp = game.player.max_hp = 10 ** 9  # keep playing, dying is not the point
+    free = np.argwhere(game.walkable)
+    rng = np.random.default_rng(1)
+    taken = {(e.x, e.y) for e in game.enemies} | {(game.player.x, game.player.y)}
+    kinds = game.content.enemies[:1]
+    for y, x in free[rng.permutation(len(free))].tolist():
+        if len(game.enemies) >= args.enemies:
+            break
+        if (x, y) not in taken:
+            game.enemies.append(game.spawn_enemy(kinds, x, y))
+    clock = game.realtime_loop(args.rate, args.fps, seconds=args.seconds)
+    print(f"{len(game.enemies)} enemies, {game.frames / args.seconds:.0f} frames/s: {clock.report()}")
@@ -0,0 +1,238 @@
+import sys
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# What enemies that cannot see the player go by: noise and scent.  Both are
+# fields over the floor holding a number that is higher the fresher (and, for
+# noise, the closer to its source) a trace is, so an enemy follows a trace by
+# stepping to its highest neighbour -- no per-enemy search.
+#
+#   scent  the player stamps the turn number on the cell they stand on each
+#          turn, leaving a trail whose fresh end is the player
+#   noise  a sound floods the walkable cells within `loudness` steps of its
+#          source with turn * NOISE_SCALE - steps, so it can be followed
+#          around walls back to where it was made
+#
+# Nothing decays by rewriting the fields: a trace is simply too old once its
+# turn is more than SCENT_TURNS / NOISE_TURNS ago.  A noise is only queued
+# when it is made and flooded the first time an enemy within earshot reads
+# the field, so footsteps nobody is near to hear cost nothing, and a flood is
+# bounded by the loudness whatever the floor size.  follow() only reads the
+# fields for enemies inside the box around the traces still fresh enough to
+# follow.  The fields carry a one-cell border so
+# neighbours can be read without bounds checks.
+
+SCENT_TURNS = 25  # turns a scent trail can still be followed
+NOISE_TURNS = 6  # turns enemies keep heading for a noise
+NOISE_SCALE = 64  # noise value = turn * NOISE_SCALE - steps; loudness stays below this
+NEVER = np.iinfo(np.int32).min // 2
+FLOOD_CACHE = 1024  # flood shapes kept per floor; fights repeat in the same places
+
+# the 8 neighbours, as offsets
+NEIGHBOURS = np.array([(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)], dtype=np.intp)
+NEIGHBOUR_LIST = [tuple(d) for d in NEIGHBOURS.tolist()]
+
+
+class Senses:
+    def __init__(self, scent_turns: int = SCENT_TURNS, noise_turns: int = NOISE_TURNS):
+        self.scent_turns = scent_turns
+        self.noise_turns = noise_turns
+        self.walkable: Optional[np.ndarray] = None
+
+    def set_terrain(self, walkable: np.ndarray) -> None:
+        height, width = walkable.shape
+        self.walkable = walkable
+        self.scent_field = np.full((height + 2, width + 2), NEVER, dtype=np.int32)
+        self.noise_field = np.full((height + 2, width + 2), NEVER, dtype=np.int32)
+        self.recent: deque = deque()  # (turn, x1, y1, x2, y2) of each trace, oldest first
+        self._floods: dict = {}  # (x, y, loudness) -> (window, -steps or NEVER per cell)
+        self.pending: List[Tuple[int, int, int, int]] = []  # (turn, x, y, loudness) not flooded yet
+        self.last_noise: Optional[Tuple[int, int, int, int]] = None
+
+    def state(self) -> tuple:
+        return self.scent_field.copy(), self.noise_field.copy(), tuple(self.recent), tuple(self.pending), self.last_noise
+
+    def set_state(self, state: tuple) -> None:
+        scent, noise, recent, pending, self.last_noise = state
+        self.scent_field[...] = scent
+        self.noise_field[...] = noise
+        self.recent = deque(recent)
+        self.pending = list(pending)
+
+    def _remember(self, turn: int, x1: int, y1: int, x2: int, y2: int) -> None:
+        recent = self.recent
+        oldest = turn - max(self.scent_turns, self.noise_turns)
+        while recent and recent[0][0] < oldest:
+            recent.popleft()
+        recent.append((turn, x1, y1, x2, y2))
+
+    def scent(self, x: int, y: int, turn: int) -> None:
+        self.scent_field[y + 1, x + 1] = turn
+        self._remember(turn, x, y, x, y)
+
+    def noise(self, x: int, y: int, loudness: int, turn: int) -> None:
+        """
+        A sound at (x, y) heard up to `loudness` steps away over walkable cells.
+        """
+        last = self.last_noise
+        if last is not None and last[:3] == (turn, x, y) and last[3] >= loudness:
+            return  # already made this turn, e.g. by every enemy hitting the player
+        self.last_noise = (turn, x, y, loudness)
+        self.pending.append(self.last_noise)
+        self._remember(turn, x - loudness, y - loudness, x + loudness, y + loudness)
+
+    def _hear(self, turn: int, x1: int, y1: int, x2: int, y2: int) -> None:
+        # flood the queued noises that reach the box of listeners, and drop
+        # the ones too old to follow
+        oldest = turn - self.noise_turns
+        waiting = []
+        for noise in self.pending:
+            made, x, y, loudness = noise
+            if made < oldest:
+                continue
+            reach = loudness + 1  # enemies read their neighbours' cells
+            if x - reach <= x2 and x + reach >= x1 and y - reach <= y2 and y + reach >= y1:
+                self._flood(*noise)
+            else:
+                waiting.append(noise)
+        self.pending = waiting
+
+    def _flood(self, turn: int, x: int, y: int, loudness: int) -> None:
+        key = (x, y, loudness)
+        flood = self._floods.get(key)
+        if flood is None:
+            if len(self._floods) >= FLOOD_CACHE:
+                self._floods.clear()
+            flood = self._floods[key] = self._spread(x, y, loudness)
+        (y1, y2, x1, x2), steps = flood
+        window = self.noise_field[y1 + 1:y2 + 1, x1 + 1:x2 + 1]
+        np.maximum(window, steps + turn * NOISE_SCALE, out=window)
+
+    def _spread(self, x: int, y: int, loudness: int) -> Tuple[Tuple[int, int, int, int], np.ndarray]:
+        # breadth-first over walkable cells within the window around (x, y):
+        # -steps where the sound reaches, NEVER where it does not
+        height, width = self.walkable.shape
+        x1, y1 = max(0, x - loudness), max(0, y - loudness)
+        x2, y2 = min(width, x + loudness + 1), min(height, y + loudness + 1)
+        allowed = self.walkable[y1:y2, x1:x2].copy()  # open cells the sound has not reached yet
+        allowed[y - y1, x - x1] = False
+        value = np.full(allowed.shape, NEVER, dtype=np.int32)
+        value[y - y1, x - x1] = 0
+        # the cells reached last step, bordered so the 8-neighbour spread is
+        # two 3-wide ORs, along rows and then down columns
+        front = np.zeros((y2 - y1 + 2, x2 - x1 + 2), dtype=bool)
+        front[y - y1 + 1, x - x1 + 1] = True
+        for steps in range(1, loudness + 1):
+            rows = front[:, :-2] | front[:, 1:-1]
+            rows |= front[:, 2:]
+            grown = rows[:-2] | rows[1:-1]
+            grown |= rows[2:]
+            grown &= allowed
+            if not grown.any():
+                break
+            allowed &= ~grown
+            value[grown] = -steps
+            front[1:-1, 1:-1] = grown
+        return (y1, y2, x1, x2), value
+
+    def _area(self, turn: int) -> Optional[Tuple[int, int, int, int]]:
+        # the box around every trace that can still be followed, or None
+        oldest = turn - max(self.scent_turns, self.noise_turns)
+        recent = self.recent
+        while recent and recent[0][0] < oldest:
+            recent.popleft()
+        if not recent:
+            return None
+        return (min(r[1] for r in recent), min(r[2] for r in recent),
+                max(r[3] for r in recent), max(r[4] for r in recent))
+
+    def _climb(self, field: np.ndarray, xs: np.ndarray, ys: np.ndarray, oldest: int) -> Tuple[np.ndarray, np.ndarray]:
+        # index of the highest neighbour and whether it beats the enemy's own cell
+        nbrs = field[ys[None, :] + 1 + NEIGHBOURS[:, 1:2], xs[None, :] + 1 + NEIGHBOURS[:, 0:1]]
+        best = nbrs.argmax(axis=0)
+        top = nbrs[best, np.arange(len(xs))]
+        return best, (top > field[ys + 1, xs + 1]) & (top > oldest)
+
+    def follow(self, xs: np.ndarray, ys: np.ndarray, turn: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Steps for enemies at (xs, ys) following the freshest trace near
+        them, noise before scent, and a mask of those that have one.
+        """
+        dxs = np.zeros(len(xs), dtype=np.intp)
+        dys = np.zeros(len(xs), dtype=np.intp)
+        lead = np.zeros(len(xs), dtype=bool)
+        area = self._area(turn)
+        if area is None:
+            return dxs, dys, lead
+        x1, y1, x2, y2 = area
+        near = np.flatnonzero((xs >= x1 - 1) & (xs <= x2 + 1) & (ys >= y1 - 1) & (ys <= y2 + 1))
+        if not len(near):
+            return dxs, dys, lead
+        nxs, nys = xs[near], ys[near]
+        if self.pending:
+            self._hear(turn, int(nxs.min()), int(nys.min()), int(nxs.max()), int(nys.max()))
+        step, on_noise = self._climb(self.noise_field, nxs, nys, (turn - self.noise_turns - 1) * NOISE_SCALE)
+        scent_step, on_scent = self._climb(self.scent_field, nxs, nys, turn - self.scent_turns - 1)
+        step = np.where(on_noise, step, scent_step)
+        found = on_noise | on_scent
+        lead[near] = found
+        dxs[near] = np.where(found, NEIGHBOURS[step, 0], 0)
+        dys[near] = np.where(found, NEIGHBOURS[step, 1], 0)
+        return dxs, dys, lead
+
+    def follow_one(self, x: int, y: int, turn: int) -> Optional[Tuple[int, int]]:
+        """
+        follow() for a single enemy: its step, or None without a trace.
+        """
+        if self.pending:
+            self._hear(turn, x, y, x, y)
+        for field, oldest in ((self.noise_field, (turn - self.noise_turns - 1) * NOISE_SCALE),
+                              (self.scent_field, turn - self.scent_turns - 1)):
+            around = field[y:y + 3, x:x + 3].tolist()
+            best, top = None, max(around[1][1], oldest)
+            for dx, dy in NEIGHBOUR_LIST:
+                if around[1 + dy][1 + dx] > top:
+                    best, top = (dx, dy), around[1 + dy][1 + dx]
+            if best is not None:
+                return best
+        return None
+
+
+if __name__ == "__main__":
+    # per-turn cost on a big cave: the player walks and fights, enemies follow
+    from cavegen import generate_cave
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rng = np.random.default_rng(1)
+    floor = generate_cave(size, size, rng)
+    cells = np.argwhere(floor)
+    ys, xs = cells[rng.choice(len(cells), count)].T.astype(np.intp)
+    senses = Senses()
+    senses.set_terrain(floor)
+    # the player wanders: a random walk over walkable cells
+    y, x = cells[rng.integers(len(cells))].tolist()
+    walk = []
+    for _ in range(500):
+        dx, dy = NEIGHBOUR_LIST[rng.integers(8)]
+        if floor[y + dy, x + dx]:
+            x, y = x + dx, y + dy
+        walk.append((y, x))
+    traced = followed = 0.0
+    leads = 0
+    for turn, (y, x) in enumerate(walk, 1):
+        start = time.perf_counter()
+        senses.scent(x, y, turn)
+        senses.noise(x, y, 3, turn)  # footsteps
+        if turn % 5 == 0:
+            senses.noise(x, y, 10, turn)  # a fight
+        traced += time.perf_counter() - start
+        start = time.perf_counter()
+        dxs, dys, lead = senses.follow(xs, ys, turn)
+        followed += time.perf_counter() - start
+        leads += int(lead.sum())
+    print(f"{size}x{size} cave, {count} enemies: traces {traced / len(walk) * 1e6:.0f} us, "
+          f"follow {followed / len(walk) * 1e6:.0f} us per turn ({leads / len(walk):.1f} enemies on a trace)")
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from headless import HeadlessGame
+from spectate import Row, diff_rows
+
+# Protocol: the client sends raw key bytes (one byte per key, curses codes
+# for arrows are not sent -- thin clients map arrows to w/a/s/d).  The server
+# sends newline-delimited JSON frame diffs:
+#   {"t": turn, "runs": [[y, x, text, pair], ...], "over": "message"}
+# "runs" only covers cells that changed since the last frame the client got,
+# split wherever the colour pair changes.  "over" is sent once, at game over.
+#
+# A turn that changes floor builds a whole new map, and on the event loop that
+# would stall every other session until it finished, so those turns run on a
+# worker thread; every other turn is quicker run in place than handed over.
+# Each session's lock keeps its frames from being built while one of its turns
+# is still running.
+
+KEY_QUEUE = 32  # keys buffered per session before the reader waits
+BACKLOG = 1024  # pending connections, so a swarm can connect at once
+SEND_TIMEOUT = 5.0  # seconds a client may take to accept a frame before it is dropped
+FLOOR_THREADS = 2  # threads running floor-changing turns off the event loop
+
+
+class Session:
+    """
+    One connected player: a HeadlessGame, the keys waiting for it and the
+    frame the client last received.
+    """
+
+    def __init__(self, server: "Server", number: int, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.server = server
+        self.number = number
+        self.reader = reader
+        self.writer = writer
+        self.game = HeadlessGame(seed=server.seed + number)
+        self.keys: asyncio.Queue = asyncio.Queue(KEY_QUEUE)
+        self.dirty = asyncio.Event()
+        self.busy = asyncio.Lock()  # held while a turn runs or a frame is built
+        self.sent: Optional[List[Row]] = None
+        self.closed = False
+
+    async def run(self) -> None:
+        self.dirty.set()  # first frame
+        tasks = [asyncio.ensure_future(c) for c in (self.read_keys(), self.play(), self.send_frames())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.closed = True
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.writer.close()
+
+    async def read_keys(self) -> None:
+        while True:
+            data = await self.reader.read(256)
+            if not data:
+                return
+            for key in data:
+                # blocks when the queue is full, which pushes back on a client
+                # that types faster than its turns run
+                await self.keys.put(key)
+
+    async def play(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.game.over is None:
+            key = await self.keys.get()
+            start = time.perf_counter()
+            async with self.busy:
+                if self.game.changes_floor(key):
+                    await loop.run_in_executor(self.server.floors_pool, self.game.press, key)
+                else:
+                    self.game.press(key)
+            self.dirty.set()  # even a no-op key gets a (possibly empty) frame back
+            self.server.turn_time += time.perf_counter() - start
+            self.server.turns += 1
+            # one turn per key, then let every other session have a go
+            await asyncio.sleep(0)
+        self.dirty.set()
+        await asyncio.Event().wait()  # the sender finishes the session
+
+    async def send_frames(self) -> None:
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            # The frame is built when it is sent, not per turn, so a slow
+            # client gets one diff covering all the turns it missed.
+            async with self.busy:
+                frame = self.game.frame()
+                message = {"t": self.game.turns, "runs": diff_rows(self.sent, frame)}
+                if self.game.over is not None:
+                    message["over"] = self.game.over
+            data = (json.dumps(message, separators=(",", ":")) + "\n").encode()
+            self.writer.write(data)
+            try:
+                await asyncio.wait_for(self.writer.drain(), SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.server.dropped += 1
+                return
+            self.sent = frame
+            self.server.frames += 1
+            self.server.bytes_sent += len(data)
+            if self.game.over is not None:
+                return
+
+
+class Server:
+    def __init__(self, seed: int = 12345):
+        self.seed = seed
+        self.sessions: Dict[int, Session] = {}
+        self.next_number = 0
+        self.peak = 0
+        self.turns = 0
+        self.turn_time = 0.0
+        self.frames = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.floors_pool = ThreadPoolExecutor(FLOOR_THREADS, thread_name_prefix="floors")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        number = self.next_number
+        self.next_number += 1
+        session = Session(self, number, reader, writer)
+        self.sessions[number] = session
+        self.peak = max(self.peak, len(self.sessions))
+        try:
+            await session.run()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            del self.sessions[number]
+
+    async def report(self, every: float) -> None:
+        while True:
+            turns, frames, sent = self.turns, self.frames, self.bytes_sent
+            await asyncio.sleep(every)
+            per_turn = self.turn_time / self.turns * 1000 if self.turns else 0.0
+            print(f"sessions {len(self.sessions):>4} (peak {self.peak})  "
+                  f"turns/s {(self.turns - turns) / every:>7.0f}  "
+                  f"frames/s {(self.frames - frames) / every:>7.0f}  "
+                  f"KiB/s {(self.bytes_sent - sent) / every / 1024:>7.1f}  "
+                  f"ms/turn {per_turn:.2f}  dropped {self.dropped}", flush=True)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = Server(args.seed)
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.unlink(args.unix)
+        listener = await asyncio.start_unix_server(server.handle, path=args.unix, backlog=BACKLOG)
+        where = args.unix
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port, backlog=BACKLOG)
+        where = f"{args.host}:{args.port}"
+    print(f"serving on {where}", flush=True)
+    reporter = asyncio.ensure_future(server.report(args.report))
+    swarm = None
+    if args.swarm:
+        target = ["--unix", args.unix] if args.unix else ["--host", args.host, "--port", str(args.port)]
+        swarm = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "netclient.py"),
+            *target, "--bots", str(args.swarm), "--seconds", str(args.seconds))
+    try:
+        async with listener:
+            if swarm is not None:
+                await swarm.wait()
+                await asyncio.sleep(0.2)
+            else:
+                await listener.serve_forever()
+    finally:
+        reporter.cancel()
+        server.floors_pool.shutdown(wait=False, cancel_futures=True)
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many game sessions in one process.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--seed", type=int, default=12345, help="session n plays seed + n")
+    parser.add_argument("--report", type=float, default=2.0, help="seconds between stats lines")
+    parser.add_argument("--swarm", type=int, default=0, metavar="N",
+                        help="also start N scripted clients and stop when they finish")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long the swarm plays")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("Bye.")
@@ -0,0 +1,106 @@
+import sys
+import time
+from typing import Any, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Snapshots of a running Game for undo and lookahead.  A floor's layout
+# (map rows, rooms, torches, stairs) is never edited in place -- changing
+# floor swaps in new objects -- so a snapshot just keeps references to it and
+# shares it with the game and every other snapshot until the game moves on.
+# Only what a turn can change is copied: the explored mask, the noise and
+# scent fields, the mutable fields of the player and enemies, the item and
+# inventory lists, the messages and the RNG state.  Entity objects are
+# shared too; restore() puts their fields back.  What the player remembers
+# seeing out of view (lastseen.py) is replaced rather than edited each turn,
+# so its arrays are shared the same way, and so are the stored floors of
+# other levels (floors.py), which are never edited once stored.
+
+
+class Snapshot(NamedTuple):
+    level: int
+    turn: int
+    layout: Tuple[Any, ...]  # (map, rooms, torches, stairs, up_stairs), shared
+    explored: np.ndarray
+    senses: Tuple[Any, ...]  # scent and noise fields, see senses.py
+    memory: Tuple[Any, ...]  # remembered things out of view, see lastseen.py
+    floors: Tuple[Any, ...]  # the other levels' stored floors, see floors.py
+    player: Tuple[int, int, int, int, int, int]  # x, y, hp, max_hp, atk, defn
+    enemies: Tuple[Any, ...]  # the Entity objects
+    enemy_state: Tuple[Tuple[int, int, int], ...]  # x, y, hp of each
+    items: Tuple[Tuple[Any, int, int], ...]  # (item, x, y) on the floor
+    inventory: Tuple[Any, ...]
+    equipped: Optional[int]
+    message: str
+    last_combat: str
+    rng_state: Any
+
+
+def take_snapshot(game) -> Snapshot:
+    p = game.player
+    return Snapshot(
+        level=game.level,
+        turn=game.turn,
+        layout=(game.map, game.rooms, game.torches, game.stairs, game.up_stairs),
+        explored=game.explored.copy(),
+        senses=game.senses.state(),
+        memory=game.last_seen.state(),
+        floors=game.floors.state(),
+        player=(p.x, p.y, p.hp, p.max_hp, p.atk, p.defn),
+        enemies=tuple(game.enemies),
+        enemy_state=tuple([(e.x, e.y, e.hp) for e in game.enemies]),
+        items=tuple([(it, it.x, it.y) for it in game.items]),
+        inventory=tuple(game.inventory),
+        equipped=game.equipped,
+        message=game.message,
+        last_combat=game.last_combat,
+        rng_state=game.rng.getstate(),
+    )
+
+
+def restore_snapshot(game, snap: Snapshot) -> None:
+    """
+    Put `game` back the way it was when `snap` was taken.  The visibility
+    mask is left for the next recompute_fov().
+    """
+    same_floor = snap.layout[0] is game.map
+    game.level = snap.level
+    game.turn = snap.turn
+    game.map, game.rooms, game.torches, game.stairs, game.up_stairs = snap.layout
+    if not same_floor:
+        game.set_terrain()
+    game.explored[...] = snap.explored
+    game.senses.set_state(snap.senses)
+    game.last_seen.set_state(snap.memory)  # after set_terrain(), which forgets everything
+    game.floors.set_state(snap.floors)
+    p = game.player
+    p.x, p.y, p.hp, p.max_hp, p.atk, p.defn = snap.player
+    game.enemies = list(snap.enemies)
+    for e, (x, y, hp) in zip(snap.enemies, snap.enemy_state):
+        e.x, e.y, e.hp = x, y, hp
+    game.items = []
+    for it, x, y in snap.items:
+        it.x, it.y = x, y
+        game.items.append(it)
+    game.inventory = list(snap.inventory)
+    game.equipped = snap.equipped
+    game.message = snap.message
+    game.last_combat = snap.last_combat
+    game.rng.setstate(snap.rng_state)
+
+
+if __name__ == "__main__":
+    from headless import HeadlessGame
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    game = HeadlessGame(seed=1)
+    start = time.perf_counter()
+    for _ in range(count):
+        snap = game.snapshot()
+    taken = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for _ in range(count):
+        game.restore(snap)
+    restored = (time.perf_counter() - start) / count
+    print(f"{len(game.enemies)} enemies, {len(game.items)} items: "
+          f"snapshot {taken * 1e6:.1f} us, restore {restored * 1e6:.1f} us")
@@ -0,0 +1,76 @@
+import random
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Cell = Tuple[int, int]
+
+
+class SpawnIndex:
+    """
+    Free floor cells grouped by room.  take() picks a random room that still
+    has space and then a random free cell in it, and removes that cell, all
+    in O(1) with swap-and-pop lists.  Uses the global `random` by default so
+    seeded games stay reproducible.
+    """
+
+    def __init__(self, exclude: Iterable[Cell] = (), rng=random):
+        self.rng = rng
+        self._exclude = set(exclude)  # cells already taken, e.g. by the player or the stairs
+        self._groups: List[List[Cell]] = []
+        self._open: List[int] = []  # groups that still have free cells
+        self._open_at: Dict[int, int] = {}  # group -> index in _open
+        self._free = 0
+
+    def __len__(self) -> int:
+        return self._free
+
+    def add_group(self, cells: Iterable[Cell]) -> int:
+        group = len(self._groups)
+        exclude = self._exclude
+        members = [cell for cell in cells if cell not in exclude]
+        self._groups.append(members)
+        self._free += len(members)
+        if members:
+            self._open_at[group] = len(self._open)
+            self._open.append(group)
+        return group
+
+    def take(self) -> Optional[Cell]:
+        """
+        Return a random free cell and mark it taken, or None when the floor is full.
+        """
+        if not self._open:
+            return None
+        group = self._open[self.rng.randrange(len(self._open))]
+        members = self._groups[group]
+        index = self.rng.randrange(len(members))
+        cell = members[index]
+        members[index] = members[-1]
+        members.pop()
+        self._free -= 1
+        if not members:
+            # the group is full: drop it from the open list the same way
+            at = self._open_at.pop(group)
+            moved = self._open.pop()
+            if moved != group:
+                self._open[at] = moved
+                self._open_at[moved] = at
+        return cell
+
+
+if __name__ == "__main__":
+    # take() should cost the same however many spawns a floor asks for.
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for count in (100, 1000, 10000, 100000):
+        index = SpawnIndex()
+        start = time.perf_counter()
+        for y in range(0, size, 20):
+            index.add_group((x, yy) for yy in range(y, min(size, y + 20)) for x in range(size))
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(count):
+            index.take()
+        took = time.perf_counter() - start
+        print(f"{count:>7} spawns on {size}x{size}: {took / count * 1e6:6.2f} us/spawn "
+              f"(index built in {built * 1000:.0f} ms)")
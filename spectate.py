@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from composer import row_strings
+
+# Spectator feed.  The game publishes each frame once; it is diffed against
+# the previous frame and encoded as ANSI escapes a single time, and the same
+# bytes are written to every viewer, so watching costs one encode per turn
+# however many people are watching.  Viewers are plain telnet/nc clients.
+#
+# Late joiners get the latest keyframe (a full redraw) plus the deltas since
+# it.  A new keyframe is cut every KEYFRAME_EVERY frames, or sooner once the
+# deltas since the last one outgrow it, so joining never replays much.  A
+# viewer that falls more than MAX_BACKLOG bytes behind stops getting deltas
+# and picks up again from the next keyframe.
+
+# One rendered row: its glyphs and a colour pair id per glyph.
+Row = Tuple[str, bytes]
+# (y, x, text, pair): changed cells in one row that share a colour pair.
+Run = Tuple[int, int, str, int]
+
+KEYFRAME_EVERY = 50
+MAX_BACKLOG = 256 * 1024
+
+# telnet: IAC WILL ECHO, IAC WILL SUPPRESS-GO-AHEAD, so the viewer's typing is not echoed
+TELNET_HELLO = b"\xff\xfb\x01\xff\xfb\x03"
+HIDE_CURSOR = b"\x1b[?25l"
+CLEAR = b"\x1b[0m\x1b[2J"
+
+
+def frame_rows(glyphs: np.ndarray, pairs: np.ndarray, lines: Sequence[str], text_pair: int) -> List[Row]:
+    """
+    Turn Game.compose() output and the status lines into rows of (glyphs, pairs).
+    """
+    width = glyphs.shape[1]
+    rows = [(str(text), row_pairs.tobytes()) for text, row_pairs in zip(row_strings(glyphs), pairs)]
+    for line in lines:
+        rows.append((line[:width].ljust(width), bytes([text_pair]) * width))
+    return rows
+
+
+def diff_rows(old: Optional[List[Row]], new: List[Row]) -> List[Run]:
+    """
+    Return runs covering every cell of `new` that differs from `old`, split
+    wherever the colour pair changes.  With no `old` the whole frame is sent.
+    """
+    runs = []
+    for y, (text, pairs) in enumerate(new):
+        if old is not None and y < len(old) and old[y] == (text, pairs):
+            continue
+        old_text, old_pairs = old[y] if old is not None and y < len(old) else ("", b"")
+        x = 0
+        width = len(text)
+        while x < width:
+            if x < len(old_text) and old_text[x] == text[x] and old_pairs[x] == pairs[x]:
+                x += 1
+                continue
+            # extend the run while cells keep changing and keep the same pair
+            end = x + 1
+            while (end < width and pairs[end] == pairs[x]
+                   and not (end < len(old_text) and old_text[end] == text[end] and old_pairs[end] == pairs[end])):
+                end += 1
+            runs.append((y, x, text[x:end], pairs[x]))
+            x = end
+    return runs
+
+
+def sgr_palette(pair_colors: Dict[int, Tuple[int, int]]) -> Dict[int, bytes]:
+    """
+    SGR escapes for curses colour pairs.  curses COLOR_* numbers are the
+    ANSI colour numbers, and -1 is the terminal's default colour.
+    """
+    palette = {}
+    for pair, (fg, bg) in pair_colors.items():
+        codes = ["0", "39" if fg < 0 else str(30 + fg), "49" if bg < 0 else str(40 + bg)]
+        palette[pair] = f"\x1b[{';'.join(codes)}m".encode()
+    return palette
+
+
+def encode_runs(runs: List[Run], palette: Dict[int, bytes]) -> bytes:
+    out = []
+    current = None
+    for y, x, text, pair in runs:
+        out.append(b"\x1b[%d;%dH" % (y + 1, x + 1))
+        if pair != current:
+            out.append(palette.get(pair, b"\x1b[0m"))
+            current = pair
+        out.append(text.encode())
+    return b"".join(out)
+
+
+class Broadcaster:
+    """
+    Serves the feed on a TCP port and/or a Unix socket from a background
+    thread.  publish() is called from the game's thread.
+    """
+
+    def __init__(self, palette: Dict[int, bytes], port: Optional[int] = None,
+                 host: str = "0.0.0.0", unix: Optional[str] = None):
+        self.palette = palette
+        self.port = port
+        self.host = host
+        self.unix = unix
+        self.previous: Optional[List[Row]] = None
+        self.keyframe = b""
+        self.since: List[bytes] = []
+        # sizes are tracked on the game's side, which decides when to cut a keyframe
+        self.keyframe_size = 0
+        self.since_size = 0
+        self.frame_count = 0
+        self.encode_time = 0.0
+        self.bytes_encoded = 0
+        self.bytes_sent = 0
+        self.viewers: Set[asyncio.StreamWriter] = set()
+        self.lagging: Set[asyncio.StreamWriter] = set()
+        self.watching: Set[asyncio.Task] = set()
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "Broadcaster":
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    async def _shutdown(self) -> None:
+        # closing a viewer ends its _watch task; anything else is cancelled
+        for viewer in self.viewers:
+            viewer.close()
+        await asyncio.gather(*self.watching, return_exceptions=True)
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def publish(self, rows: List[Row]) -> None:
+        """
+        Diff and encode one frame, then hand the bytes to the viewer thread.
+        """
+        start = time.perf_counter()
+        delta = encode_runs(diff_rows(self.previous, rows), self.palette)
+        keyframe = None
+        self.frame_count += 1
+        self.since_size += len(delta)
+        if (self.previous is None or self.frame_count % KEYFRAME_EVERY == 0
+                or self.since_size > self.keyframe_size):
+            keyframe = CLEAR + encode_runs(diff_rows(None, rows), self.palette)
+            self.keyframe_size = len(keyframe)
+            self.since_size = 0
+        self.previous = rows
+        self.encode_time += time.perf_counter() - start
+        self.bytes_encoded += len(delta)
+        self.loop.call_soon_threadsafe(self._fan_out, delta, keyframe)
+
+    def _fan_out(self, delta: bytes, keyframe: Optional[bytes]) -> None:
+        if keyframe is not None:
+            self.keyframe = keyframe
+            self.since = []
+        else:
+            self.since.append(delta)
+        for viewer in list(self.viewers):
+            if viewer.is_closing():
+                self.viewers.discard(viewer)
+                continue
+            if viewer in self.lagging:
+                if keyframe is None:
+                    continue
+                self.lagging.discard(viewer)
+                data = keyframe
+            elif viewer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                self.lagging.add(viewer)
+                continue
+            else:
+                data = delta
+            if data:
+                viewer.write(data)
+                self.bytes_sent += len(data)
+
+    async def _watch(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(TELNET_HELLO + HIDE_CURSOR + self.keyframe + b"".join(self.since))
+        self.viewers.add(writer)
+        task = asyncio.current_task()
+        self.watching.add(task)
+        try:
+            # viewers have nothing to say; reading only notices them leaving
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.viewers.discard(writer)
+            self.lagging.discard(writer)
+            self.watching.discard(task)
+            writer.close()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        listeners = []
+        if self.port is not None:
+            listeners.append(self.loop.run_until_complete(
+                asyncio.start_server(self._watch, self.host, self.port, backlog=1024)))
+        if self.unix is not None:
+            if os.path.exists(self.unix):
+                os.unlink(self.unix)
+            listeners.append(self.loop.run_until_complete(
+                asyncio.start_unix_server(self._watch, path=self.unix, backlog=1024)))
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            for listener in listeners:
+                listener.close()
+            if self.unix is not None and os.path.exists(self.unix):
+                os.unlink(self.unix)
+
+    def stats(self) -> str:
+        frames = max(1, self.frame_count)
+        return (f"{self.frame_count} frames, {len(self.viewers)} viewers: "
+                f"{self.encode_time / frames * 1000:.3f} ms and {self.bytes_encoded / frames:.0f} bytes "
+                f"encoded per frame, {self.bytes_sent / 1024:.0f} KiB sent")
+
+
+async def _bench_viewers(path: str, count: int) -> List[int]:
+    # local viewers that just count what they receive
+    received = [0] * count
+
+    async def viewer(i: int) -> None:
+        reader, writer = await asyncio.open_unix_connection(path)
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            received[i] += len(data)
+
+    tasks = [asyncio.ensure_future(viewer(i)) for i in range(count)]
+    try:
+        await asyncio.sleep(3600)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return received
+
+
+if __name__ == "__main__":
+    from better_game import PAIR_COLORS
+    from headless import HeadlessGame
+
+    parser = argparse.ArgumentParser(description="Broadcast a scripted game to spectators.")
+    parser.add_argument("--port", type=int, default=None, help="serve viewers over TCP (telnet host port)")
+    parser.add_argument("--unix", metavar="PATH", help="serve viewers on a Unix socket (nc -U PATH)")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=0.1, help="seconds between turns")
+    parser.add_argument("--viewers", type=int, default=0, metavar="N",
+                        help="benchmark: attach N local viewers and play as fast as possible")
+    args = parser.parse_args()
+
+    if args.viewers:
+        args.unix = args.unix or f"/tmp/spectate-{os.getpid()}.sock"
+        args.delay = 0.0
+    feed = Broadcaster(sgr_palette(PAIR_COLORS), port=args.port, unix=args.unix).start()
+    bench = None
+    if args.viewers:
+        bench = asyncio.run_coroutine_threadsafe(_bench_viewers(args.unix, args.viewers), feed.loop)
+        time.sleep(0.5)
+    game = HeadlessGame(seed=None)
+    rng = random.Random()
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        if game.over is not None:
+            game = HeadlessGame(seed=None)
+        game.press(rng.choice(b"wasd"))
+        feed.publish(game.frame())
+        if args.delay:
+            time.sleep(args.delay)
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)
+    print(feed.stats())
+    print(f"{args.turns / elapsed:.0f} turns/s including the game itself")
+    feed.close()
@@ -0,0 +1,219 @@
+import argparse
+import json
+import multiprocessing
+import random
+import time
+import tracemalloc
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from better_game import CAVE_EVERY, CP_TEXT
+from headless import HeadlessGame
+from spectate import frame_rows
+
+try:
+    import resource
+except ImportError:
+    resource = None  # no peak RSS outside Unix; the tracemalloc numbers still work
+
+# Horde stress mode: how the engine scales with the number of enemies and the
+# size of the floor, far past anything normal play reaches (MAX_ENEMIES is
+# 24).  Each run builds a headless floor of the given size, turns `enemies`
+# loose on random free floor cells, and plays scripted turns -- a seeded walk
+# with waits, the player kept alive and off the stairs -- timing each phase
+# of a turn:
+#
+#   move     the player's step, and the noise and scent it leaves
+#   enemies  every enemy's turn
+#   fov      the field of view
+#   compose  with --render: the map layers, lights and remembered things
+#   rows     with --render: the composed frame and status as screen rows
+#
+# Then a few more turns run under tracemalloc for the most bytes each phase
+# had allocated at once.  Every run is a fresh worker process, so the peak
+# RSS it reports is that run's alone and no cache carries over between runs.
+# The report closes with each phase's time fitted as enemies^a * area^b:
+# an exponent well above what the phase should cost (0 for the player's
+# move, 1 for the enemies) marks a code path that stops scaling.
+#
+#   python3 stress.py --sizes 100x30 316x316 1000x1000 --enemies 1000 10000 100000 --render
+
+SIZES = ("100x30", "316x316", "1000x1000")
+HORDES = (1000, 10000)
+TURNS = 30
+MEMORY_TURNS = 3
+KEYS = [(0, -1), (0, 1), (-1, 0), (1, 0), (0, 0)]  # up, down, left, right, wait
+
+
+class Run(NamedTuple):
+    width: int
+    height: int
+    enemies: int  # on the floor when the turns started; fewer when it has less room
+    layout: str
+    build_s: float  # floor and horde
+    phase_ms: Dict[str, float]  # mean per turn
+    peak_kb: Dict[str, float]  # most allocated at once, over the traced turns
+    rss_mb: Optional[float]  # the worker's peak resident memory
+
+
+def horde_game(width: int, height: int, enemies: int, layout: str = "caves", seed: int = 1) -> HeadlessGame:
+    """
+    A headless game on a `width` x `height` floor with `enemies` more enemies.
+    """
+    game = HeadlessGame(seed, width=width, height=height)
+    if layout == "caves":
+        game.level = CAVE_EVERY
+        game.make_map()
+        game.explored[:] = False
+    game.player.hp = game.player.max_hp = 10 ** 9  # keep playing, dying is not the point
+    taken = np.zeros((height, width), dtype=bool)
+    for thing in game.enemies + game.items + [game.player, game.stairs] + ([game.up_stairs] if game.up_stairs else []):
+        taken[thing.y, thing.x] = True
+    free = np.argwhere(game.walkable & ~taken)
+    rng = np.random.default_rng(seed)
+    kinds = [t for t in game.content.enemies if t.min_level <= game.level]
+    picked = free[rng.choice(len(free), min(enemies, len(free)), replace=False)]
+    game.enemies += [game.spawn_enemy(kinds, x, y) for y, x in picked.tolist()]
+    game.recompute_fov()
+    return game
+
+
+def _phases(game: HeadlessGame, step: Tuple[int, int], render: bool) -> List[tuple]:
+    # one turn split the way take_turn, press and a redraw run it
+    was = (game.player.x, game.player.y)
+
+    def move():
+        game.turn += 1
+        if step != (0, 0):
+            game.move_player(*step)
+        game.leave_traces(was)
+
+    phases = [("move", move), ("enemies", game.enemy_turns), ("fov", game.recompute_fov)]
+    if render:
+        frame = []
+        phases += [("compose", lambda: frame.extend(game.compose())),
+                   ("rows", lambda: frame_rows(frame[0], frame[1], game.status_lines(), CP_TEXT))]
+    return phases
+
+
+def _step(game: HeadlessGame, rng: random.Random) -> Tuple[int, int]:
+    # a random step that keeps off both stairs, so the horde's floor stays put
+    dx, dy = rng.choice(KEYS)
+    x, y = game.player.x + dx, game.player.y + dy
+    for stairs in (game.stairs, game.up_stairs):
+        if stairs is not None and (stairs.x, stairs.y) == (x, y):
+            return 0, 0
+    return dx, dy
+
+
+def run(width: int, height: int, enemies: int, turns: int = TURNS, render: bool = False, layout: str = "caves",
+        seed: int = 1, memory_turns: int = MEMORY_TURNS) -> Run:
+    """
+    Build one horde floor and play `turns` timed turns, then `memory_turns` traced ones.
+    """
+    start = time.perf_counter()
+    game = horde_game(width, height, enemies, layout, seed)
+    build = time.perf_counter() - start
+    count = len(game.enemies)
+    rng = random.Random(seed)
+    spent: Dict[str, float] = {}
+    for _ in range(turns):
+        for name, phase in _phases(game, _step(game, rng), render):
+            start = time.perf_counter()
+            phase()
+            spent[name] = spent.get(name, 0.0) + time.perf_counter() - start
+    peaks: Dict[str, float] = {}
+    if memory_turns:
+        tracemalloc.start()
+        try:
+            for _ in range(memory_turns):
+                for name, phase in _phases(game, _step(game, rng), render):
+                    before = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    result = phase()
+                    peak = tracemalloc.get_traced_memory()[1] - before
+                    del result
+                    peaks[name] = max(peaks.get(name, 0.0), peak / 1024)
+        finally:
+            tracemalloc.stop()
+    rss = None
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+    return Run(width, height, count, layout, build, {k: v / max(1, turns) * 1000 for k, v in spent.items()},
+               peaks, rss)
+
+
+def _run(args: tuple) -> Run:
+    return run(*args)
+
+
+def fit(runs: List[Run], phase: str) -> Dict[str, float]:
+    """
+    Exponents of enemies and area in the phase's time, least squares on
+    logs over the runs; only for what varies between them.
+    """
+    usable = [r for r in runs if r.enemies and r.phase_ms.get(phase, 0) > 0]
+    columns = {"enemies": [r.enemies for r in usable], "area": [r.width * r.height for r in usable]}
+    columns = {k: np.log(v) for k, v in columns.items() if len(set(v)) > 1}
+    if not columns or len(usable) <= len(columns):
+        return {}
+    design = np.column_stack(list(columns.values()) + [np.ones(len(usable))])
+    times = np.log([r.phase_ms[phase] for r in usable])
+    coefficients = np.linalg.lstsq(design, times, rcond=None)[0]
+    return dict(zip(columns, coefficients.tolist()))
+
+
+def report(runs: List[Run]) -> None:
+    phases = list(runs[0].phase_ms)
+    print(f"{'map':>10} {'enemies':>7} {'build s':>7} " + " ".join(f"{p:>8}" for p in phases)
+          + f" {'turn ms':>8} {'worst peak':>18} {'rss MB':>7}")
+    for r in runs:
+        worst = max(r.peak_kb, key=r.peak_kb.get) if r.peak_kb else None
+        peak = f"{r.peak_kb[worst]:.0f} kB {worst}" if worst else "-"
+        rss = f"{r.rss_mb:.0f}" if r.rss_mb is not None else "-"
+        print(f"{r.width:>5}x{r.height:<4} {r.enemies:>7} {r.build_s:>7.2f} "
+              + " ".join(f"{r.phase_ms[p]:>8.2f}" for p in phases)
+              + f" {sum(r.phase_ms.values()):>8.2f} {peak:>18} {rss:>7}")
+    print("time ~ enemies^a * area^b:")
+    for p in phases:
+        exponents = fit(runs, p)
+        if exponents:
+            print(f"  {p:<8} " + "  ".join(f"{k} {v:5.2f}" for k, v in exponents.items()))
+    biggest = max(runs, key=lambda r: (r.enemies * r.width * r.height, r.enemies))
+    slowest = max(biggest.phase_ms, key=biggest.phase_ms.get)
+    share = biggest.phase_ms[slowest] / sum(biggest.phase_ms.values())
+    print(f"largest run: {slowest} takes {share:.0%} of the turn")
+
+
+def _size(text: str) -> Tuple[int, int]:
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play horde floors headless and report how each phase scales.")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), help="map sizes, WIDTHxHEIGHT")
+    parser.add_argument("--enemies", type=int, nargs="+", default=list(HORDES), help="horde sizes")
+    parser.add_argument("--turns", type=int, default=TURNS, help="timed turns per run")
+    parser.add_argument("--render", action="store_true", help="compose a frame every turn too")
+    parser.add_argument("--layout", choices=("caves", "rooms"), default="caves")
+    parser.add_argument("--memory-turns", type=int, default=MEMORY_TURNS, help="turns under tracemalloc (0: none)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the runs to this file")
+    args = parser.parse_args()
+
+    plan = [(*_size(size), count, args.turns, args.render, args.layout, args.seed, args.memory_turns)
+            for size in args.sizes for count in args.enemies]
+    runs = []
+    # one fresh process per run, so peak RSS and caches belong to that run alone
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for result in pool.imap(_run, plan):
+            runs.append(result)
+            print(f"  {result.width}x{result.height}, {result.enemies} enemies: "
+                  f"{sum(result.phase_ms.values()):.2f} ms per turn", flush=True)
+    report(runs)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([r._asdict() for r in runs], f, indent=2)
+            f.write("\n")
@@ -0,0 +1,332 @@
+import argparse
+import base64
+import gzip
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+# Game events.  Everything that happens -- attacks, pickups, equips, spawns,
+# deaths, floor changes, quality changes -- is emitted as a typed event into
+# a ring buffer, which the in-game log view scrolls through.  With a path,
+# events are also batched and handed to a background thread that appends
+# them to a gzipped file, so a turn never waits on the disk.  Each line of
+# the file is one batch of one kind of event, stored by column:
+#
+#   {"kind": "attack", "n": 212, "cols": {"turn": {"dtype": "<i8", "data": "<base64>"},
+#    "attacker": {"values": ["goblin", "You"], "dtype": "<u2", "data": "<base64>"}, ...}}
+#
+# Numbers are the raw bytes of a numpy array; strings are codes into the
+# batch's own `values`.  load_events() turns the columns back into arrays
+# without parsing each value, and `python3 telemetry.py FILE` prints a
+# summary of a run.
+
+RING_SIZE = 1000  # events kept for the log view
+BATCH_SIZE = 4096  # events per batch handed to the writer; bigger batches load faster
+MAX_PENDING = 64  # batches waiting for the writer; beyond this they are dropped
+
+
+class Attack(NamedTuple):
+    turn: int
+    level: int
+    attacker: str
+    defender: str
+    hit_chance: int
+    roll: int  # 1-100, hits when roll <= hit_chance
+    damage: int
+    crit: bool
+
+    def text(self) -> str:
+        if self.roll > self.hit_chance:
+            return f"{self.attacker} missed {self.defender} (rolled {self.roll}, needed {self.hit_chance})"
+        return f"{self.attacker} hit {self.defender} for {self.damage}{' (CRIT)' if self.crit else ''}"
+
+
+class Pickup(NamedTuple):
+    turn: int
+    level: int
+    item: str
+    kind: str
+    x: int
+    y: int
+
+    def text(self) -> str:
+        return f"picked up {self.item}"
+
+
+class Equip(NamedTuple):
+    turn: int
+    level: int
+    item: str
+
+    def text(self) -> str:
+        return f"equipped {self.item}"
+
+
+class Spawn(NamedTuple):
+    turn: int
+    level: int
+    name: str
+    x: int
+    y: int
+
+    def text(self) -> str:
+        return f"{self.name} appeared at {self.x},{self.y}"
+
+
+class Death(NamedTuple):
+    turn: int
+    level: int
+    name: str
+    x: int
+    y: int
+    killer: str
+
+    def text(self) -> str:
+        return f"{self.name} was slain by {self.killer}"
+
+
+class FloorChange(NamedTuple):
+    turn: int
+    level: int  # the floor arrived on
+    previous: int
+    first_visit: bool
+
+    def text(self) -> str:
+        return f"{'entered' if self.first_visit else 'returned to'} floor {self.level} from floor {self.previous}"
+
+
+class Quality(NamedTuple):
+    turn: int
+    level: int
+    quality: int  # features still on (see governor.py)
+    step: str
+    cut: bool
+    turn_ms: float
+    phase: str  # slowest phase of the turn that tipped it
+    phase_ms: float
+    budget_ms: float
+
+    def text(self) -> str:
+        change = f"cut {self.step}" if self.cut else f"restored {self.step}"
+        return (f"quality {self.quality}: {change} (turns {self.turn_ms:g} ms, budget {self.budget_ms:g} ms, "
+                f"slowest {self.phase} {self.phase_ms:g} ms)")
+
+
+class BadFloor(NamedTuple):
+    turn: int
+    level: int
+    attempts: int  # layouts generated, every one failing check_floor
+    problems: int  # in the layout that was kept
+    problem: str  # the first of them
+
+    def text(self) -> str:
+        return f"kept a bad floor after {self.attempts} attempts: {self.problem}"
+
+
+KINDS = {"attack": Attack, "pickup": Pickup, "equip": Equip, "spawn": Spawn, "death": Death, "floor": FloorChange,
+         "quality": Quality, "badfloor": BadFloor}
+KIND_OF = {cls: kind for kind, cls in KINDS.items()}
+
+
+def encode_column(values: list) -> dict:
+    column = np.asarray(values)
+    if column.dtype.kind == "U":
+        names, codes = np.unique(column, return_inverse=True)
+        return {"values": names.tolist(), **encode_column(codes.astype("<u2"))}
+    if column.dtype.kind == "i":
+        column = column.astype("<i4")  # turns, floors, positions and damage all fit
+    return {"dtype": column.dtype.str, "data": base64.b64encode(column.tobytes()).decode("ascii")}
+
+
+def decode_column(column: dict) -> np.ndarray:
+    data = np.frombuffer(base64.b64decode(column["data"]), dtype=column["dtype"])
+    if "values" in column:
+        return np.asarray(column["values"])[data]
+    return data
+
+
+def encode_batch(events: Iterable[NamedTuple]) -> List[str]:
+    """
+    One JSON line per kind of event in the batch, fields stored by column.
+    """
+    by_kind: Dict[type, list] = {}
+    for event in events:
+        by_kind.setdefault(type(event), []).append(event)
+    lines = []
+    for cls, group in by_kind.items():
+        cols = {field: encode_column(list(values)) for field, values in zip(cls._fields, zip(*group))}
+        lines.append(json.dumps({"kind": KIND_OF[cls], "n": len(group), "cols": cols}, separators=(",", ":")) + "\n")
+    return lines
+
+
+class EventLog:
+    """
+    The event bus.  emit() only appends to lists; the file, if any, is
+    written by a daemon thread.  Call close() before exiting so the last
+    batch reaches the disk.
+    """
+
+    def __init__(self, path: Optional[str] = None, ring: int = RING_SIZE, batch: int = BATCH_SIZE,
+                 pending: int = MAX_PENDING):
+        self.ring: deque = deque(maxlen=ring)
+        self.enabled = True  # lookahead rollouts switch this off
+        self.path = path
+        self.written = 0  # events on disk so far
+        self.dropped = 0  # events lost because the writer fell behind
+        self._batch: List[NamedTuple] = []
+        self._batch_size = batch
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if path is not None:
+            self._queue = queue.Queue(pending)
+            self._thread = threading.Thread(target=self._write, daemon=True)
+            self._thread.start()
+
+    def emit(self, event: NamedTuple) -> None:
+        if not self.enabled:
+            return
+        self.ring.append(event)
+        if self._queue is not None:
+            self._batch.append(event)
+            if len(self._batch) >= self._batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        Hand the current batch to the writer without waiting for it.
+        """
+        if self._queue is None or not self._batch:
+            return
+        try:
+            self._queue.put_nowait(self._batch)
+        except queue.Full:
+            self.dropped += len(self._batch)
+        self._batch = []
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._queue = None
+
+    def _write(self) -> None:
+        with gzip.open(self.path, "at", encoding="utf-8", compresslevel=6) as f:
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    return
+                f.writelines(encode_batch(batch))
+                self.written += len(batch)
+
+
+def load_events(path: str) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Every event in an event file as {kind: {field: array}}.
+    """
+    blocks: Dict[str, List[dict]] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            block = json.loads(line)
+            blocks.setdefault(block["kind"], []).append(block["cols"])
+    return {kind: {field: np.concatenate([decode_column(cols[field]) for cols in parts])
+                   for field in KINDS[kind]._fields}
+            for kind, parts in blocks.items()}
+
+
+def summarize(events: Dict[str, Dict[str, np.ndarray]]) -> List[str]:
+    lines = [", ".join(f"{len(cols['turn'])} {kind}" for kind, cols in events.items())]
+    attacks = events.get("attack")
+    if attacks is not None:
+        names, who = np.unique(attacks["attacker"], return_inverse=True)
+        count = np.bincount(who)
+        hits = np.bincount(who, weights=attacks["roll"] <= attacks["hit_chance"])
+        crits = np.bincount(who, weights=attacks["crit"])
+        damage = np.bincount(who, weights=attacks["damage"])
+        lines.append(f"{'attacker':<16} {'attacks':>8} {'hit %':>6} {'crit %':>6} {'dmg/hit':>8}")
+        for i in np.argsort(-count):
+            lines.append(f"{names[i]:<16} {count[i]:>8} {100 * hits[i] / count[i]:>6.1f} "
+                         f"{100 * crits[i] / count[i]:>6.1f} {damage[i] / max(hits[i], 1):>8.2f}")
+    deaths = events.get("death")
+    if deaths is not None:
+        names, count = np.unique(deaths["name"], return_counts=True)
+        order = np.argsort(-count)[:10]
+        lines.append("deaths: " + ", ".join(f"{names[i]} {count[i]}" for i in order))
+    pickups = events.get("pickup")
+    if pickups is not None:
+        names, count = np.unique(pickups["item"], return_counts=True)
+        lines.append("pickups: " + ", ".join(f"{name} {n}" for name, n in zip(names, count)))
+    floors = events.get("floor")
+    if floors is not None:
+        lines.append(f"deepest floor: {floors['level'].max()}")
+    quality = events.get("quality")
+    if quality is not None:
+        lines.append(f"quality changes: {len(quality['turn'])}, lowest {quality['quality'].min()}, "
+                     "cuts " + ", ".join(f"{step} {n}" for step, n in
+                                         zip(*np.unique(quality["step"][quality["cut"]], return_counts=True))))
+    bad = events.get("badfloor")
+    if bad is not None:
+        lines.append(f"bad floors kept: {len(bad['turn'])}, on floors " + ", ".join(map(str, bad["level"].tolist())))
+    return lines
+
+
+def _fake_events(count: int, seed: int = 1) -> List[NamedTuple]:
+    rng = np.random.default_rng(seed)
+    names = ["goblin", "orc", "troll", "You"]
+    out: List[NamedTuple] = []
+    for turn in range(count):
+        r = rng.random()
+        level = 1 + turn // 5000
+        if r < 0.8:
+            chance = int(rng.integers(25, 96))
+            roll = int(rng.integers(1, 101))
+            hit = roll <= chance
+            out.append(Attack(turn, level, names[turn % 4], "You" if turn % 4 != 3 else names[turn % 3], chance, roll,
+                              int(rng.integers(1, 8)) if hit else 0, hit and r < 0.05))
+        elif r < 0.9:
+            out.append(Death(turn, level, names[turn % 3], turn % 100, turn % 30, "You"))
+        elif r < 0.97:
+            out.append(Spawn(turn, level, names[turn % 3], turn % 100, turn % 30))
+        else:
+            out.append(Pickup(turn, level, "Healing Potion", "potion", turn % 100, turn % 30))
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a game event file, or benchmark the event pipeline.")
+    parser.add_argument("path", nargs="?", help="an events file written with better_game.py --events")
+    parser.add_argument("--bench", type=int, metavar="N", help="write and load N synthetic events")
+    args = parser.parse_args()
+
+    if args.bench:
+        events = _fake_events(args.bench)
+        path = os.path.join(tempfile.mkdtemp(), "events.jsonl.gz")
+        log = EventLog(path, pending=0)  # unbounded: measure the writer, not the drop policy
+        start = time.perf_counter()
+        for event in events:
+            log.emit(event)
+        emitted = time.perf_counter() - start
+        log.close()
+        written = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = load_events(path)
+        lines = summarize(loaded)
+        read = time.perf_counter() - start
+        print(f"{args.bench} events: emit {emitted / args.bench * 1e9:.0f} ns each, all on disk after "
+              f"{written:.2f} s ({os.path.getsize(path) / 1e6:.1f} MB, {log.dropped} dropped), "
+              f"load + summarize {read:.2f} s")
+        print("\n".join(lines))
+        os.remove(path)
+    elif args.path:
+        print("\n".join(summarize(load_events(args.path))))
+    else:
+        parser.print_help()
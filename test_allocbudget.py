@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from allocbudget import BUDGET_PATH, check, measure, mismatch
+
+
+def _stored():
+    with open(BUDGET_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _budgets():
+    return _stored()["phases"]
+
+
+@pytest.fixture(scope="module")
+def measured():
+    # one measurement shared by every phase's test; it takes a few seconds
+    differs = mismatch(_stored())
+    if differs:
+        pytest.skip("budgets were measured on " + "; ".join(differs))
+    return measure()
+
+
+@pytest.mark.parametrize("phase", sorted(_budgets()))
+def test_phase_within_budget(measured, phase):
+    budgets = _budgets()
+    assert phase in measured, f"{phase} was not measured"
+    over = check({phase: measured[phase]}, {phase: budgets[phase]})
+    assert not over, "; ".join(over)
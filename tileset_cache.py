@@ -0,0 +1,159 @@
+import hashlib
+import os
+import sys
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+import tcod
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "tilesets")
+
+# Bump when the on-disk cache layout changes so stale entries are ignored.
+CACHE_VERSION = 1
+
+
+def find_tilesheet(filename: str) -> str:
+    """
+    Return the path to a tilesheet, looking in the working directory first
+    and then next to this module.
+    """
+    if os.path.isfile(filename):
+        return filename
+    candidate = os.path.join(BASE_DIR, filename)
+    if os.path.isfile(candidate):
+        return candidate
+    raise FileNotFoundError(
+        f"Tilesheet {filename!r} not found in {os.getcwd()!r} or {BASE_DIR!r}"
+    )
+
+
+def cache_key(data: bytes, columns: int, rows: int, charmap: Sequence[int]) -> str:
+    # The same PNG sliced with a different grid or charmap is a different tileset.
+    digest = hashlib.sha1()
+    digest.update(b"v%d:%dx%d:" % (CACHE_VERSION, columns, rows))
+    digest.update(np.asarray(charmap, dtype=np.int32).tobytes())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def cache_path(path: str, columns: int, rows: int, codepoints: Sequence[int]) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    return os.path.join(CACHE_DIR, cache_key(data, columns, rows, codepoints) + ".npy")
+
+
+def _tileset_from_pixels(pixels: np.ndarray, columns: int, rows: int, codepoints: Sequence[int]) -> tcod.tileset.Tileset:
+    # TCOD_tileset_load decodes the PNG and then hands the pixels to load_raw.
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape[:2]
+    mapping = tcod.ffi.new("int[]", list(codepoints))
+    cdata = tcod.lib.TCOD_tileset_load_raw(
+        width,
+        height,
+        tcod.ffi.from_buffer("struct TCOD_ColorRGBA*", pixels),
+        columns,
+        rows,
+        len(codepoints),
+        mapping,
+    )
+    if not cdata:
+        raise RuntimeError(tcod.ffi.string(tcod.lib.TCOD_get_error()).decode())
+    return tcod.tileset.Tileset._claim(cdata)
+
+
+def _pixels_from_tileset(tileset: tcod.tileset.Tileset, columns: int, rows: int, codepoints: Sequence[int]) -> np.ndarray:
+    # Lay the decoded tiles back out as a sheet.  Tiles come out of tcod with
+    # alpha and key colors already applied, and load_raw leaves them unchanged.
+    height, width = tileset.tile_height, tileset.tile_width
+    pixels = np.zeros((rows * height, columns * width, 4), dtype=np.uint8)
+    for index, codepoint in enumerate(codepoints):
+        if codepoint < 0:
+            continue
+        y, x = divmod(index, columns)
+        pixels[y * height : (y + 1) * height, x * width : (x + 1) * width] = tileset.get_tile(codepoint)
+    return pixels
+
+
+def _save_cached(path: str, pixels: np.ndarray) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so a crashed launch never leaves a truncated cache entry.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, pixels)
+    os.replace(tmp_path, path)
+
+
+def load_tilesheet(
+    filename: str,
+    columns: int,
+    rows: int,
+    charmap: Optional[Sequence[int]] = None,
+    use_cache: bool = True,
+) -> tcod.tileset.Tileset:
+    """
+    Drop-in replacement for tcod.tileset.load_tilesheet.
+
+    The decoded RGBA sheet is cached under .cache/tilesets keyed by the sheet's
+    hash and the charmap, so only the first launch pays for decoding the PNG.
+    """
+    if charmap is None:
+        charmap = tcod.tileset.CHARMAP_CP437
+    path = find_tilesheet(filename)
+    if not use_cache:
+        return tcod.tileset.load_tilesheet(path, columns, rows, charmap)
+
+    # load_tilesheet only assigns as many codepoints as there are tiles.
+    codepoints = [int(c) for c in charmap[: columns * rows]]
+    cached = cache_path(path, columns, rows, codepoints)
+    try:
+        pixels = np.load(cached)
+    except (OSError, ValueError):
+        tileset = tcod.tileset.load_tilesheet(path, columns, rows, codepoints)
+        try:
+            _save_cached(cached, _pixels_from_tileset(tileset, columns, rows, codepoints))
+        except OSError:
+            pass  # A read-only checkout still gets a working tileset.
+        return tileset
+    return _tileset_from_pixels(pixels, columns, rows, codepoints)
+
+
+def benchmark(filename: str, columns: int, rows: int, charmap: Sequence[int], repeat: int = 20) -> None:
+    """
+    Report tileset load time without the cache, on a cold cache and on a warm cache.
+    """
+    path = find_tilesheet(filename)
+    cached = cache_path(path, columns, rows, [int(c) for c in charmap[: columns * rows]])
+
+    def best_of(fn) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    uncached = best_of(lambda: load_tilesheet(filename, columns, rows, charmap, use_cache=False))
+
+    if os.path.exists(cached):
+        os.remove(cached)
+    start = time.perf_counter()
+    load_tilesheet(filename, columns, rows, charmap)
+    cold = (time.perf_counter() - start) * 1000
+
+    warm = best_of(lambda: load_tilesheet(filename, columns, rows, charmap))
+
+    print(f"tilesheet: {path}")
+    print(f"  no cache:   {uncached:8.3f} ms")
+    print(f"  cold cache: {cold:8.3f} ms (decode + write)")
+    print(f"  warm cache: {warm:8.3f} ms")
+
+
+if __name__ == "__main__":
+    benchmark(
+        sys.argv[1] if len(sys.argv) > 1 else "dejavu10x10_gs_tc.png",
+        32,
+        8,
+        tcod.tileset.CHARMAP_TCOD,
+    )
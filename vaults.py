@@ -0,0 +1,243 @@
+import sys
+import time
+from typing import Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Handcrafted vaults stamped into room floors.  A vault is an ASCII template
+# in data/vaults.json, one string per row:
+#
+#   #  wall          .  floor
+#   $  an item       M  a monster      (both on floor)
+#   +  an entrance: floor on the template's edge, where a tunnel joins it
+#      to the nearest room
+#   (space)  left as the generator made it, so vaults need not be rectangles
+#
+# content.py compiles each template once, with everything else in the
+# content bundle, into its distinct orientations (four turns, each also
+# mirrored): a uint8 tile array, a mask of the cells it sets, and the marker
+# cells as offsets.  Stamping is then one masked copy into the floor's tile
+# array -- no per-cell parsing on the generator's path.
+#
+# A shape may only go over solid rock with a one-cell border, which is
+# checked against the floor's tiles rather than the room list, so tunnels and
+# earlier vaults count too.  candidates() first tries a few random spots --
+# cheapest while the floor is mostly rock -- and when they all miss reads
+# every spot that fits off a summed-area table of the carved cells in one
+# pass, so a crowded floor costs one table, not hundreds of misses.
+
+WALL_TILE = ord("#")
+FLOOR_TILE = ord(".")
+ITEM = "$"
+MONSTER = "M"
+DOOR = "+"
+KEEP = " "
+RANDOM_TRIES = 4  # random spots candidates() tries before listing every spot
+LEGEND = {"#": WALL_TILE, ".": FLOOR_TILE, ITEM: FLOOR_TILE, MONSTER: FLOOR_TILE, DOOR: FLOOR_TILE}
+
+# (dx, dy) offsets in a template
+Cell = Tuple[int, int]
+
+
+class Shape(NamedTuple):
+    tiles: np.ndarray  # (h, w) uint8 tile bytes
+    mask: np.ndarray  # (h, w) bool, False where the template keeps the floor's own tile
+    items: Tuple[Cell, ...]
+    monsters: Tuple[Cell, ...]
+    # (dx, dy, out_x, out_y): each entrance and the way out of the vault from it
+    doors: Tuple[Tuple[int, int, int, int], ...]
+
+    @property
+    def width(self) -> int:
+        return self.tiles.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.tiles.shape[0]
+
+
+class Vault(NamedTuple):
+    key: str
+    weight: int
+    min_level: int
+    shapes: Tuple[Shape, ...]  # distinct orientations
+
+
+def parse_rows(rows: Sequence[str]) -> np.ndarray:
+    """
+    A template as a (h, w) array of single characters.  Raises ValueError
+    on ragged rows, unknown characters, or floor the entrances cannot reach.
+    """
+    if not rows or not rows[0]:
+        raise ValueError("empty template")
+    if any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError("rows must all be the same length (pad with spaces)")
+    grid = np.array([list(row) for row in rows])
+    unknown = set(grid.ravel().tolist()) - set(LEGEND) - {KEEP}
+    if unknown:
+        raise ValueError(f"unknown character(s) {''.join(sorted(unknown))!r}")
+    height, width = grid.shape
+    doors = list(zip(*np.nonzero(grid == DOOR)))
+    if not doors:
+        raise ValueError(f"no entrance {DOOR!r}")
+    for y, x in doors:
+        if 0 < x < width - 1 and 0 < y < height - 1:
+            raise ValueError(f"entrance at ({x},{y}) is not on the edge")
+    # everything walkable must be reachable from an entrance, 4-connected like the player moves
+    walkable = (grid != "#") & (grid != KEEP)
+    seen = np.zeros_like(walkable)
+    todo = [(int(y), int(x)) for y, x in doors]
+    for y, x in todo:
+        seen[y, x] = True
+    while todo:
+        y, x = todo.pop()
+        for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+            if 0 <= ny < height and 0 <= nx < width and walkable[ny, nx] and not seen[ny, nx]:
+                seen[ny, nx] = True
+                todo.append((ny, nx))
+    stranded = np.argwhere(walkable & ~seen)
+    if len(stranded):
+        y, x = stranded[0].tolist()
+        raise ValueError(f"({x},{y}) cannot be reached from an entrance")
+    return grid
+
+
+def _offsets(grid: np.ndarray, marker: str) -> Tuple[Cell, ...]:
+    ys, xs = np.nonzero(grid == marker)
+    return tuple(zip(xs.tolist(), ys.tolist()))
+
+
+def compile_shape(grid: np.ndarray) -> Shape:
+    height, width = grid.shape
+    tiles = np.full(grid.shape, WALL_TILE, dtype=np.uint8)
+    for ch, tile in LEGEND.items():
+        tiles[grid == ch] = tile
+    doors = []
+    for x, y in _offsets(grid, DOOR):
+        # the side the entrance is on; corners go out sideways
+        out_x = -1 if x == 0 else 1 if x == width - 1 else 0
+        out_y = 0 if out_x else -1 if y == 0 else 1
+        doors.append((x, y, out_x, out_y))
+    return Shape(tiles, grid != KEEP, _offsets(grid, ITEM), _offsets(grid, MONSTER), tuple(doors))
+
+
+def compile_vault(key: str, rows: Sequence[str], weight: int = 1, min_level: int = 1) -> Vault:
+    grid = parse_rows(rows)
+    shapes = []
+    seen = set()
+    for turns in range(4):
+        turned = np.rot90(grid, turns)
+        for oriented in (turned, np.fliplr(turned)):
+            # symmetric templates repeat orientations; keep one of each
+            signature = (oriented.shape, oriented.tobytes())
+            if signature not in seen:
+                seen.add(signature)
+                shapes.append(compile_shape(np.ascontiguousarray(oriented)))
+    return Vault(key, weight, min_level, tuple(shapes))
+
+
+def fits(tiles: np.ndarray, shape: Shape, x: int, y: int) -> bool:
+    """
+    Whether `shape` can go with its top-left at (x, y): on the map with a
+    one-cell border to spare, and over nothing but wall, so it cuts no room
+    or tunnel and nothing carved so far touches it.
+    """
+    height, width = tiles.shape
+    if x < 1 or y < 1 or x + shape.width + 1 > width or y + shape.height + 1 > height:
+        return False
+    return bool((tiles[y - 1:y + shape.height + 1, x - 1:x + shape.width + 1] == WALL_TILE).all())
+
+
+def carved(tiles: np.ndarray) -> np.ndarray:
+    """
+    Summed-area table of the cells that are not wall, for spots(): entry
+    [y, x] counts the carved cells above and left of (x, y).
+    """
+    height, width = tiles.shape
+    table = np.zeros((height + 1, width + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(tiles != WALL_TILE, axis=0, dtype=np.int32), axis=1, out=table[1:, 1:])
+    return table
+
+
+def spots(table: np.ndarray, shape: Shape) -> np.ndarray:
+    """
+    The top-left (x, y) of every place fits() allows `shape`, as an (n, 2) array.
+    """
+    bh, bw = shape.height + 2, shape.width + 2  # with the one-cell border
+    if bh > table.shape[0] - 1 or bw > table.shape[1] - 1:
+        return np.zeros((0, 2), dtype=np.intp)
+    sums = table[bh:, bw:] - table[:-bh, bw:] - table[bh:, :-bw] + table[:-bh, :-bw]
+    ys, xs = np.nonzero(sums == 0)
+    return np.stack([xs + 1, ys + 1], axis=1)
+
+
+def candidates(tiles: np.ndarray, shape: Shape, rng, tries: int) -> Iterator[Tuple[int, int]]:
+    """
+    Up to `tries` random top-left spots where `shape` fits in `tiles`.
+    Stop iterating before changing `tiles`.
+    """
+    height, width = tiles.shape
+    if shape.width + 2 > width or shape.height + 2 > height:
+        return
+    for _ in range(min(tries, RANDOM_TRIES)):
+        x = rng.randint(1, width - shape.width - 1)
+        y = rng.randint(1, height - shape.height - 1)
+        if fits(tiles, shape, x, y):
+            tries -= 1
+            yield x, y
+    free = spots(carved(tiles), shape)
+    for _ in range(min(tries, len(free))):
+        x, y = free[rng.randrange(len(free))].tolist()
+        yield x, y
+
+
+def stamp(tiles: np.ndarray, shape: Shape, x: int, y: int) -> None:
+    """
+    Write `shape` into `tiles` with its top-left at (x, y), in place.
+    """
+    np.copyto(tiles[y:y + shape.height, x:x + shape.width], shape.tiles, where=shape.mask)
+
+
+def pick(vaults: Sequence[Vault], level: int, rng) -> Optional[Vault]:
+    """
+    A weighted random vault allowed on `level`, or None.
+    """
+    allowed = [v for v in vaults if v.min_level <= level]
+    if not allowed:
+        return None
+    return rng.choices(allowed, weights=[v.weight for v in allowed])[0]
+
+
+if __name__ == "__main__":
+    # filling a floor with vaults: random spots checked one by one with
+    # fits(), against candidates()
+    import random
+
+    from content import load_content
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    vaults = load_content().vaults
+    shapes = [s for v in vaults for s in v.shapes]
+    print(f"{len(vaults)} vaults in {len(shapes)} orientations, up to {count} on {size}x{size}")
+    for name in ("random tries", "candidates()"):
+        rng = random.Random(1)
+        tiles = np.full((size, size), WALL_TILE, dtype=np.uint8)
+        placed = 0
+        start = time.perf_counter()
+        for _ in range(count):
+            shape = rng.choice(shapes)
+            if name == "candidates()":
+                spot = next(candidates(tiles, shape, rng, 20), None)
+            else:
+                spot = None
+                for _ in range(20):
+                    x, y = rng.randint(1, size - shape.width - 1), rng.randint(1, size - shape.height - 1)
+                    if fits(tiles, shape, x, y):
+                        spot = x, y
+                        break
+            if spot is not None:
+                stamp(tiles, shape, *spot)
+                placed += 1
+        spent = time.perf_counter() - start
+        print(f"  {name:<12} {placed:>5} stamped, {spent * 1000:7.2f} ms")